@@ -0,0 +1,856 @@
+"""Concurrent-session load test for trial1.py.
+
+Simulated student, teacher and admin sessions log in through the real login
+form and keep re-rendering their dashboards with Streamlit's AppTest, against
+the database configured by the DB_* environment variables. For each number of
+concurrent sessions it reports per-page latency percentiles, DB statements per
+rerun and page throughput, so the point where latency bends upward is visible.
+
+    python load_test.py --seed 500
+    python load_test.py --sessions 1 5 10 25 50 --duration 30
+
+Teacher sessions all grade the first attempt of the same exam, so they also
+stress concurrent writers: a save that lost the race to another session shows
+up as a teacher_conflict run, which then overwrites with "Keep mine".
+
+AppTest keeps its runtime in process globals, so every session runs in its own
+process. Each process therefore has its own st.cache_data storage; numbers are
+closer to a server with cold caches than to one warmed by other sessions.
+
+Benchmarks measure single optimizations against the same database
+(--seed-semester 10000 gives the 10,000-student marksheet run):
+
+    python load_test.py --seed-semester 20000
+    python load_test.py --bench-semester 1 2 4 8
+    python load_test.py --bench-marksheets 1 2 4 8
+    python load_test.py --seed-results 1000000
+    python load_test.py --bench-results
+    python load_test.py --bench-views
+    python load_test.py --bench-prepared 2000
+    python load_test.py --bench-login --students 200 --sessions 1 8 32
+    python load_test.py --bench-results-layout 200
+    python load_test.py --bench-startup
+    python load_test.py --bench-procedures 0 1 5 20
+"""
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+
+SCRIPT = "trial1.py"
+PASSWORD = "loadtest"
+TEACHER_USERNAME = "lt_teacher"
+COURSE_CODE = "LT101"
+EXAM_TITLE = "Load Test Exam"
+FIRST_ROLL_NUMBER = 900000
+ROLE_MIX = ["student"] * 8 + ["teacher", "admin"]
+
+# Statement Counting
+# Every cursor class in this process counts execute/executemany/callproc calls,
+# so the statements issued by a single rerun are the difference around it.
+# Each statement and commit also sleeps for _round_trip_delay seconds, which
+# simulates a slower network link to the database (see bench_procedures).
+_statements_lock = threading.Lock()
+_statement_total = 0
+_round_trip_delay = 0.0
+
+def _counted(method):
+    def wrapper(self, *args, **kwargs):
+        global _statement_total
+        with _statements_lock:
+            _statement_total += 1
+        if _round_trip_delay:
+            time.sleep(_round_trip_delay)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+def _delayed(method):
+    def wrapper(self, *args, **kwargs):
+        if _round_trip_delay:
+            time.sleep(_round_trip_delay)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+def count_statements():
+    from mysql.connector import connection, cursor
+    classes = [cursor.MySQLCursor, cursor.MySQLCursorPrepared]
+    connections = [connection.MySQLConnection]
+    try:
+        from mysql.connector import connection_cext, cursor_cext
+        classes.extend([cursor_cext.CMySQLCursor, cursor_cext.CMySQLCursorPrepared])
+        connections.append(connection_cext.CMySQLConnection)
+    except ImportError:
+        pass
+    for cls in classes:
+        for name in ("execute", "executemany", "callproc"):
+            setattr(cls, name, _counted(getattr(cls, name)))
+    for cls in connections:
+        cls.commit = _delayed(cls.commit)
+
+# Seeding
+def seed(students):
+    """Create a teacher, a course, an exam and graded attempts for load-test students"""
+    import trial1
+
+    trial1.init_database()
+    trial1.add_teacher(TEACHER_USERNAME, PASSWORD, "Load Test Teacher", "Load Testing")
+    # The trial1 calls write on connections of their own. Committing ends this
+    # connection's read snapshot, so each lookup after a call sees its rows.
+    conn = trial1.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT t.teacher_id FROM TEACHER t
+        JOIN USERS u ON t.user_id = u.user_id
+        WHERE u.username = %s
+    """, (TEACHER_USERNAME,))
+    teacher_id = cursor.fetchone()[0]
+    trial1.add_course(COURSE_CODE, "Load Test Course", teacher_id)
+    conn.commit()
+    cursor.execute("SELECT course_id FROM COURSE WHERE course_code = %s", (COURSE_CODE,))
+    course_id = cursor.fetchone()[0]
+
+    for i in range(students):
+        roll_number = FIRST_ROLL_NUMBER + i
+        trial1.add_student(f"lt_student_{i}", PASSWORD, roll_number, f"Load Student {i}", date(2000, 1, 1))
+        trial1.enroll_student(roll_number, course_id)
+
+    conn.commit()
+    cursor.execute("SELECT exam_id FROM EXAM WHERE course_id = %s AND exam_title = %s", (course_id, EXAM_TITLE))
+    row = cursor.fetchone()
+    if not row:
+        trial1.create_exam(course_id, EXAM_TITLE, 100)
+        conn.commit()
+        cursor.execute("SELECT exam_id FROM EXAM WHERE course_id = %s AND exam_title = %s", (course_id, EXAM_TITLE))
+        row = cursor.fetchone()
+    exam_id = row[0]
+    trial1.create_exam_attempts_for_enrolled(exam_id)
+    conn.commit()
+    cursor.execute("""
+        SELECT attempt_id FROM EXAM_ATTEMPT
+        WHERE exam_id = %s AND score_obtained IS NULL
+    """, (exam_id,))
+    ungraded = [attempt_id for (attempt_id,) in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    for attempt_id in ungraded:
+        trial1.update_exam_attempt_and_result(attempt_id, random.randint(30, 100), 100)
+    print(f"Seeded {students} students, course {COURSE_CODE}, exam #{exam_id}")
+
+# Simulated Sessions
+def widget(widgets, label=None, key_prefix=None, key=None):
+    for w in widgets:
+        if ((label is None or w.label == label)
+                and (key_prefix is None or str(w.key).startswith(key_prefix))
+                and (key is None or w.key == key)):
+            return w
+    return None
+
+def credentials(role, index, students):
+    if role == "student":
+        return f"lt_student_{index % students}", PASSWORD
+    if role == "teacher":
+        return TEACHER_USERNAME, PASSWORD
+    return "admin", "admin123"
+
+def run_session(role, index, students, duration):
+    """Log in as role and re-render its pages until duration elapses.
+
+    Returns a list of (page, seconds, statements) samples and an error count.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    count_statements()
+    samples = []
+    errors = 0
+
+    def timed(page, action):
+        nonlocal errors
+        before = _statement_total
+        started = time.perf_counter()
+        at = action()
+        samples.append((page, time.perf_counter() - started, _statement_total - before))
+        if at.exception:
+            errors += 1
+        return at
+
+    at = AppTest.from_file(SCRIPT, default_timeout=120)
+    timed("login_page", at.run)
+    username, password = credentials(role, index, students)
+    widget(at.selectbox, label="Select Role").set_value(role)
+    at.text_input[0].input(username)
+    at.text_input[1].input(password)
+    timed("login", widget(at.button, label="Login").click().run)
+    if not at.session_state["logged_in"]:
+        return samples, errors + 1
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        timed(f"{role}_dashboard", at.run)
+        if role == "teacher":
+            score = widget(at.number_input, key_prefix="score_")
+            if score is not None:
+                attempt_id = score.key[len("score_"):]
+                score.set_value(float(random.randint(30, 100)))
+                update = widget(at.button, key=f"btn_{attempt_id}")
+                if update is not None:
+                    timed("teacher_grade", update.click().run)
+                else:
+                    # Another session saved this attempt first; overwrite it
+                    timed("teacher_conflict", widget(at.button, key=f"keep_{attempt_id}").click().run)
+    return samples, errors
+
+# Benchmarks
+# main.py keeps its own tables, so the semester benchmark seeds them directly
+# with set-based inserts instead of going through add_student (which hashes a
+# password per student).
+BENCH_SEMESTER = 1
+BENCH_DEPARTMENTS = ["CSE", "ECE", "ME", "CE"]
+BENCH_COURSES = 6
+BENCH_BATCH_SIZE = 5000
+
+def seed_semester(students):
+    """Create students, courses and graded marks of one semester in main.py's tables"""
+    import main
+
+    main.init_database()
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    courses = [f"BENCH{BENCH_SEMESTER}{i:02d}" for i in range(BENCH_COURSES)]
+    cursor.executemany("""
+        INSERT IGNORE INTO courses (course_id, course_name, credits, semester)
+        VALUES (%s, %s, %s, %s)
+    """, [(course_id, f"Bench Course {i}", 3 + i % 2, BENCH_SEMESTER) for i, course_id in enumerate(courses)])
+
+    for start in range(0, students, BENCH_BATCH_SIZE):
+        roll_nos = [f"BENCH{i:07d}" for i in range(start, min(start + BENCH_BATCH_SIZE, students))]
+        cursor.executemany("""
+            INSERT IGNORE INTO students (roll_no, name, semester, department)
+            VALUES (%s, %s, %s, %s)
+        """, [(roll_no, f"Bench Student {roll_no}", BENCH_SEMESTER, BENCH_DEPARTMENTS[i % len(BENCH_DEPARTMENTS)])
+              for i, roll_no in enumerate(roll_nos)])
+        marks = np.random.randint(30, 101, size=len(roll_nos) * len(courses)).astype(float)
+        grades, grade_points = main.lookup_grade(main.DEFAULT_GRADING_SCHEME, marks)
+        pairs = [(roll_no, course_id) for roll_no in roll_nos for course_id in courses]
+        cursor.executemany("""
+            INSERT IGNORE INTO marks (roll_no, course_id, marks, grade, grade_point)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(roll_no, course_id, float(mark), grade, int(grade_point))
+              for (roll_no, course_id), mark, grade, grade_point in zip(pairs, marks, grades, grade_points)])
+        conn.commit()
+    cursor.close()
+    conn.close()
+    print(f"Seeded {students} students with {len(courses)} courses each in semester {BENCH_SEMESTER}")
+
+def bench_semester(worker_counts):
+    """Time semester result generation serially and sharded with each worker count"""
+    import main
+
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM students WHERE semester = %s", (BENCH_SEMESTER,))
+    students = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+
+    print(f"\n== Semester {BENCH_SEMESTER} results, {students} students")
+    print(f"{'mode':<14}{'seconds':>10}{'students/s':>12}{'speedup':>9}")
+    started = time.perf_counter()
+    main.generate_semester_results(BENCH_SEMESTER)
+    baseline = time.perf_counter() - started
+    print(f"{'serial':<14}{baseline:>10.1f}{students / baseline:>12.0f}{1:>9.2f}")
+    for workers in worker_counts:
+        started = time.perf_counter()
+        main.generate_semester_results_sharded(BENCH_SEMESTER, workers)
+        elapsed = time.perf_counter() - started
+        print(f"{f'{workers} workers':<14}{elapsed:>10.1f}{students / elapsed:>12.0f}{baseline / elapsed:>9.2f}")
+
+def bench_marksheets(worker_counts):
+    """Time main.py's marksheet archive of the benchmark semester with each worker count"""
+    import main
+
+    conn = main.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM semester_results WHERE semester = %s", (BENCH_SEMESTER,))
+    published = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+    if not published:
+        # Marksheets are built from published results
+        main.generate_semester_results(BENCH_SEMESTER)
+
+    print(f"\n== Semester {BENCH_SEMESTER} marksheets")
+    print(f"{'workers':<10}{'documents':>11}{'seconds':>10}{'docs/s':>10}{'speedup':>9}")
+    baseline = None
+    for workers in worker_counts:
+        started = time.perf_counter()
+        result = main.generate_marksheets(BENCH_SEMESTER, workers)
+        seconds = time.perf_counter() - started
+        baseline = baseline or seconds
+        print(f"{workers:<10}{result['documents']:>11}{seconds:>10.1f}"
+              f"{result['documents'] / seconds:>10.1f}{baseline / seconds:>9.2f}")
+
+def seed_results(rows):
+    """Add graded exams for every load-test student until about rows results exist"""
+    import trial1
+
+    conn = trial1.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT course_id FROM COURSE WHERE course_code = %s", (COURSE_CODE,))
+    course_id = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM ENROLLMENT WHERE course_id = %s", (course_id,))
+    students = cursor.fetchone()[0]
+    if not students:
+        raise SystemExit("Seed load-test students first (--seed)")
+    cursor.execute("SELECT COUNT(*) FROM EXAM_ATTEMPT WHERE letter_grade IS NOT NULL")
+    missing = rows - cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM EXAM WHERE course_id = %s", (course_id,))
+    first_exam = cursor.fetchone()[0] + 1
+
+    exams = max(-(-missing // students), 0)
+    for n in range(first_exam, first_exam + exams):
+        title = f"{EXAM_TITLE} {n}"
+        trial1.create_exam(course_id, title, 100)
+        conn.commit()
+        cursor.execute("SELECT exam_id FROM EXAM WHERE course_id = %s AND exam_title = %s", (course_id, title))
+        exam_id = cursor.fetchone()[0]
+        trial1.create_exam_attempts_for_enrolled(exam_id)
+        conn.commit()
+        cursor.execute("""
+            UPDATE EXAM_ATTEMPT SET score_obtained = FLOOR(30 + RAND() * 71)
+            WHERE exam_id = %s
+        """, (exam_id,))
+        trial1.regrade_exam(cursor, exam_id, 'absolute')
+        conn.commit()
+    cursor.close()
+    conn.close()
+    print(f"Added {exams} exams for {students} students")
+
+def elapsed(action):
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+def measure(action, repeat=3):
+    """Best wall time of action over repeat runs, then its peak traced memory.
+
+    Returns (seconds, peak_bytes, result of the traced run).
+    """
+    seconds = min(elapsed(action) for _ in range(repeat))
+    tracemalloc.start()
+    try:
+        result = action()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak, result
+
+def bench_results():
+    """Compare the results cube's columnar fetch with dict rows wrapped in a DataFrame"""
+    import pandas as pd
+    import trial1
+
+    def dict_rows():
+        conn = trial1.get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(trial1.RESULTS_CUBE_QUERY)
+        frame = pd.DataFrame(cursor.fetchall())
+        cursor.close()
+        conn.close()
+        return frame
+
+    def columnar():
+        conn = trial1.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            return trial1.fetch_results_frame(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+
+    print(f"\n{'fetch':<12}{'rows':>10}{'seconds':>10}{'peak MB':>10}{'frame MB':>10}")
+    for name, action in [("dict rows", dict_rows), ("columnar", columnar)]:
+        seconds, peak, frame = measure(action)
+        size = frame.memory_usage(deep=True).sum()
+        print(f"{name:<12}{len(frame):>10}{seconds:>10.2f}{peak / 2**20:>10.0f}{size / 2**20:>10.0f}")
+
+def recorded_statements(action):
+    """Run action and return the (sql, params, dictionary) calls it made to execute_prepared"""
+    import trial1
+
+    statements = []
+    original = trial1.execute_prepared
+
+    def recording(conn, sql, params=(), dictionary=False):
+        statements.append((sql, params, dictionary))
+        return original(conn, sql, params, dictionary)
+
+    trial1.execute_prepared = recording
+    try:
+        action()
+    finally:
+        trial1.execute_prepared = original
+    return statements
+
+def bench_views():
+    """Compare the Arrow table views with dict rows converted to Arrow through pandas"""
+    import pandas as pd
+    import pyarrow as pa
+    import trial1
+
+    print(f"\n{'view':<14}{'fetch':<12}{'rows':>10}{'seconds':>10}{'peak MB':>10}{'table MB':>10}")
+    for name, view in [("all results", trial1.get_all_results), ("all students", trial1.get_all_students)]:
+        (sql, params, _), = recorded_statements(view)
+
+        def via_dicts():
+            # What st.dataframe does with a DataFrame before sending it
+            conn = trial1.get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(sql, params)
+            table = pa.Table.from_pandas(pd.DataFrame(cursor.fetchall()), preserve_index=False)
+            cursor.close()
+            conn.close()
+            return table
+
+        for fetch, action in [("dict rows", via_dicts), ("arrow", view)]:
+            seconds, peak, table = measure(action)
+            print(f"{name:<14}{fetch:<12}{table.num_rows:>10}{seconds:>10.2f}"
+                  f"{peak / 2**20:>10.0f}{table.nbytes / 2**20:>10.0f}")
+
+def bench_prepared(runs):
+    """Time the hot queries as cached prepared statements and as plain text queries"""
+    import trial1
+
+    conn = trial1.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT e.exam_id, ea.attempt_id FROM EXAM e
+        JOIN COURSE c ON e.course_id = c.course_id
+        JOIN EXAM_ATTEMPT ea ON ea.exam_id = e.exam_id
+        WHERE c.course_code = %s AND e.exam_title = %s
+        LIMIT 1
+    """, (COURSE_CODE, EXAM_TITLE))
+    exam_id, attempt_id = cursor.fetchone()
+    cursor.close()
+    conn.close()
+
+    def hot_paths():
+        trial1.get_exam_attempts(exam_id)
+        trial1.get_student_exam_attempts(FIRST_ROLL_NUMBER)
+        trial1.authenticate(TEACHER_USERNAME, PASSWORD, "teacher")
+        trial1.update_exam_attempt_and_result(attempt_id, 75, 100)
+
+    statements = recorded_statements(hot_paths)
+    counters_before = dict(trial1.STATEMENT_COUNTERS)
+
+    # Replayed writes run in one transaction that is rolled back at the end
+    conn = trial1.get_db_connection()
+
+    def plain(sql, params, dictionary):
+        cursor = conn.cursor(dictionary=dictionary)
+        cursor.execute(sql, params)
+        if cursor.with_rows:
+            cursor.fetchall()
+        cursor.close()
+
+    def prepared(sql, params, dictionary):
+        cursor = trial1.execute_prepared(conn, sql, params, dictionary)
+        if cursor.with_rows:
+            cursor.fetchall()
+
+    print(f"\n{'statement':<52}{'plain us':>10}{'prepared us':>13}{'speedup':>9}")
+    try:
+        for sql, params, dictionary in statements:
+            timings = {}
+            for name, execute in [("plain", plain), ("prepared", prepared)]:
+                execute(sql, params, dictionary)  # warm up (prepares once)
+                started = time.perf_counter()
+                for _ in range(runs):
+                    execute(sql, params, dictionary)
+                timings[name] = (time.perf_counter() - started) / runs * 1e6
+            label = " ".join(sql.split())[:50]
+            print(f"{label:<52}{timings['plain']:>10.0f}{timings['prepared']:>13.0f}"
+                  f"{timings['plain'] / timings['prepared']:>9.2f}")
+    finally:
+        conn.rollback()
+        conn.close()
+    prepares = trial1.STATEMENT_COUNTERS['prepared'] - counters_before['prepared']
+    executions = trial1.STATEMENT_COUNTERS['executed'] - counters_before['executed']
+    print(f"prepared {prepares} statements for {executions} executions")
+
+def bench_login(students, concurrency_levels):
+    """Measure login throughput from concurrent threads, with a cold and a warm credential cache"""
+    import trial1
+
+    count_statements()
+    usernames = [f"lt_student_{i}" for i in range(students)]
+    print(f"\n{'threads':>7}  {'scenario':<14}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'stmts/login':>13}{'ok':>6}")
+    for threads in concurrency_levels:
+        trial1.get_credential_cache.clear()
+        for scenario, password in [("cold cache", PASSWORD), ("warm cache", PASSWORD), ("bad password", "wrong")]:
+            latencies = []
+
+            def login(username):
+                started = time.perf_counter()
+                user = trial1.authenticate(username, password, "student")
+                latencies.append(time.perf_counter() - started)
+                return user is not None
+
+            before = _statement_total
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                succeeded = sum(pool.map(login, usernames))
+            elapsed = time.perf_counter() - started
+            p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+            print(f"{threads:>7}  {scenario:<14}{len(usernames) / elapsed:>10.1f}{p50:>9.0f}{p95:>9.0f}"
+                  f"{(_statement_total - before) / len(usernames):>13.2f}{succeeded:>6}")
+
+# The two-table layout results had before they moved onto EXAM_ATTEMPT,
+# rebuilt in a scratch table by --bench-results-layout
+LEGACY_RESULT_TABLE = "EXAM_RESULT_BENCH"
+LEGACY_STUDENT_ATTEMPTS_QUERY = f"""
+    SELECT ea.attempt_id, e.exam_title, c.course_code, c.course_name,
+           ea.score_obtained, e.total_marks, er.letter_grade, er.status
+    FROM EXAM_ATTEMPT ea
+    JOIN EXAM e ON ea.exam_id = e.exam_id
+    JOIN COURSE c ON e.course_id = c.course_id
+    LEFT JOIN {LEGACY_RESULT_TABLE} er ON ea.attempt_id = er.attempt_id
+    WHERE ea.roll_number = %s
+    ORDER BY ea.attempt_id DESC
+"""
+LEGACY_ALL_RESULTS_QUERY = f"""
+    SELECT s.roll_number, s.name, c.course_code, c.course_name,
+           e.exam_title, ea.score_obtained, e.total_marks,
+           er.letter_grade, er.status
+    FROM {LEGACY_RESULT_TABLE} er
+    JOIN EXAM_ATTEMPT ea ON er.attempt_id = ea.attempt_id
+    JOIN STUDENT s ON ea.roll_number = s.roll_number
+    JOIN EXAM e ON ea.exam_id = e.exam_id
+    JOIN COURSE c ON e.course_id = c.course_id
+    ORDER BY s.roll_number, c.course_code
+"""
+
+def bench_results_layout(runs):
+    """Time result reads and score writes with results on EXAM_ATTEMPT and in a separate table"""
+    import trial1
+
+    conn = trial1.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {LEGACY_RESULT_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {LEGACY_RESULT_TABLE} (
+            result_id INT AUTO_INCREMENT PRIMARY KEY,
+            attempt_id INT UNIQUE NOT NULL,
+            letter_grade VARCHAR(2) NOT NULL,
+            status VARCHAR(10) NOT NULL,
+            FOREIGN KEY (attempt_id) REFERENCES EXAM_ATTEMPT(attempt_id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO {LEGACY_RESULT_TABLE} (attempt_id, letter_grade, status)
+        SELECT attempt_id, letter_grade, status FROM EXAM_ATTEMPT
+        WHERE letter_grade IS NOT NULL
+    """)
+    conn.commit()
+    cursor.execute("""
+        SELECT ea.attempt_id, e.course_id, e.total_marks FROM EXAM_ATTEMPT ea
+        JOIN EXAM e ON ea.exam_id = e.exam_id
+        WHERE ea.roll_number = %s
+        LIMIT 1
+    """, (FIRST_ROLL_NUMBER,))
+    attempt_id, course_id, total_marks = cursor.fetchone()
+    cursor.close()
+    letter_grade, status = trial1.calculate_grades(75, total_marks, trial1.get_grading_scheme(course_id))
+
+    # The statements update_exam_attempt_and_result writes for an absolutely
+    # graded score, in one transaction that is rolled back at the end
+    def two_table_write():
+        trial1.execute_prepared(conn, """
+            UPDATE EXAM_ATTEMPT SET score_obtained = %s, version = version + 1
+            WHERE attempt_id = %s
+        """, (75, attempt_id))
+        trial1.execute_prepared(conn, f"""
+            INSERT INTO {LEGACY_RESULT_TABLE} (attempt_id, letter_grade, status)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE letter_grade = VALUES(letter_grade), status = VALUES(status)
+        """, (attempt_id, letter_grade, status))
+
+    def folded_write():
+        trial1.execute_prepared(conn, """
+            UPDATE EXAM_ATTEMPT
+            SET score_obtained = %s, letter_grade = %s, status = %s, version = version + 1
+            WHERE attempt_id = %s
+        """, (75, letter_grade, status, attempt_id))
+
+    cases = [
+        ("student attempts", runs,
+         lambda: trial1.fetch_frame(LEGACY_STUDENT_ATTEMPTS_QUERY, (FIRST_ROLL_NUMBER,),
+                                    trial1.STUDENT_EXAM_ATTEMPTS_FRAME_DTYPES),
+         lambda: trial1.get_student_exam_attempts(FIRST_ROLL_NUMBER)),
+        ("all results", 3,
+         lambda: trial1.fetch_table(LEGACY_ALL_RESULTS_QUERY, trial1.ALL_RESULTS_SCHEMA),
+         trial1.get_all_results),
+        ("score update", runs, two_table_write, folded_write),
+    ]
+    print(f"\n{'operation':<20}{'two-table ms':>14}{'folded ms':>11}{'speedup':>9}")
+    try:
+        for name, repeat, two_table, folded in cases:
+            timings = []
+            for action in (two_table, folded):
+                action()  # warm up
+                timings.append(np.median([elapsed(action) for _ in range(repeat)]) * 1000)
+            print(f"{name:<20}{timings[0]:>14.2f}{timings[1]:>11.2f}{timings[0] / timings[1]:>9.2f}")
+    finally:
+        conn.rollback()
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {LEGACY_RESULT_TABLE}")
+        cursor.close()
+        conn.close()
+
+# Account creation as it was before the stored procedures: existence checks,
+# inserts and the change log entry as separate statements
+PROCEDURE_BENCH_ROLL_NUMBER = 800000
+
+def multi_statement_add_student(username, password, roll_number, name, date_of_birth):
+    import trial1
+
+    conn = trial1.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT user_id FROM USERS WHERE username = %s", (username,))
+        if cursor.fetchone():
+            return False
+        cursor.execute("SELECT roll_number FROM STUDENT WHERE roll_number = %s", (roll_number,))
+        if cursor.fetchone():
+            return False
+        cursor.execute("""
+            INSERT INTO USERS (username, password_hash, full_name, role)
+            VALUES (%s, %s, %s, 'student')
+        """, (username, trial1.hash_password(password), name))
+        cursor.execute("""
+            INSERT INTO STUDENT (roll_number, user_id, name, date_of_birth)
+            VALUES (%s, %s, %s, %s)
+        """, (roll_number, cursor.lastrowid, name, date_of_birth))
+        trial1.record_change(cursor, 'student', roll_number, 'insert')
+        conn.commit()
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+def multi_statement_add_course(course_code, course_name, teacher_id):
+    import trial1
+
+    conn = trial1.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT course_id FROM COURSE WHERE course_code = %s", (course_code,))
+        if cursor.fetchone():
+            return False
+        cursor.execute("""
+            INSERT INTO COURSE (course_code, course_name, teacher_id)
+            VALUES (%s, %s, %s)
+        """, (course_code, course_name, teacher_id))
+        trial1.record_change(cursor, 'course', cursor.lastrowid, 'insert')
+        conn.commit()
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+def bench_procedures(delays_ms, runs):
+    """Time add_student and add_course through the stored procedures and as separate
+    statements, with each statement and commit delayed by every simulated round trip"""
+    global _round_trip_delay
+    import trial1
+
+    count_statements()
+    accounts = iter(range(PROCEDURE_BENCH_ROLL_NUMBER, PROCEDURE_BENCH_ROLL_NUMBER + 1_000_000))
+
+    def add_student(add):
+        def action():
+            roll_number = next(accounts)
+            return add(f"lt_rtt_{roll_number}", PASSWORD, roll_number, f"RTT Student {roll_number}", date(2000, 1, 1))
+        return action
+
+    def add_course(add):
+        def action():
+            number = next(accounts)
+            return add(f"RTT{number}", f"RTT Course {number}", None)
+        return action
+
+    cases = [
+        ("add_student", add_student(multi_statement_add_student), add_student(trial1.add_student)),
+        ("add_course", add_course(multi_statement_add_course), add_course(trial1.add_course)),
+    ]
+    print(f"\n{'operation':<14}{'RTT ms':>8}{'statements ms':>15}{'procedure ms':>14}"
+          f"{'stmts':>7}{'calls':>7}{'speedup':>9}")
+    try:
+        for delay_ms in delays_ms:
+            _round_trip_delay = delay_ms / 1000
+            for name, multi_statement, procedure in cases:
+                timings, statements = [], []
+                for action in (multi_statement, procedure):
+                    before = _statement_total
+                    timings.append(np.median([elapsed(action) for _ in range(runs)]) * 1000)
+                    statements.append((_statement_total - before) / runs)
+                print(f"{name:<14}{delay_ms:>8g}{timings[0]:>15.1f}{timings[1]:>14.1f}"
+                      f"{statements[0]:>7.1f}{statements[1]:>7.1f}{timings[0] / timings[1]:>9.2f}")
+    finally:
+        _round_trip_delay = 0.0
+        conn = trial1.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM USERS WHERE username LIKE %s", ("lt_rtt_%",))
+        cursor.execute("DELETE FROM COURSE WHERE course_code LIKE %s", ("RTT%",))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+def startup_timings(role):
+    """In a fresh process, time importing Streamlit, the first render and logging in as role.
+
+    Returns (import, login page, dashboard) seconds and whether the login worked.
+    """
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter() - started
+
+    at = AppTest.from_file(SCRIPT, default_timeout=120)
+    first_render = elapsed(at.run)
+    username, password = credentials(role, 0, 1)
+    widget(at.selectbox, label="Select Role").set_value(role)
+    at.text_input[0].input(username)
+    at.text_input[1].input(password)
+    dashboard = elapsed(widget(at.button, label="Login").click().run)
+    return imported, first_render, dashboard, bool(at.session_state["logged_in"]) and not at.exception
+
+def bench_startup(runs):
+    """Time a cold worker from process start to each role's first dashboard render"""
+    context = multiprocessing.get_context("spawn")
+    print(f"\n{'role':<10}{'process s':>11}{'import s':>10}{'login page s':>14}{'dashboard s':>13}{'total s':>9}{'ok':>5}")
+    for role in ["student", "teacher", "admin"]:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            with context.Pool(1) as pool:
+                # The pool's process starts before the task is sent, so the
+                # interpreter and load_test import are counted in "process"
+                imported, first_render, dashboard, ok = pool.apply(startup_timings, (role,))
+                total = time.perf_counter() - started
+            timings.append((total - imported - first_render - dashboard, imported, first_render, dashboard, total, ok))
+        process, imported, first_render, dashboard, total = np.median([timing[:5] for timing in timings], axis=0)
+        succeeded = sum(timing[5] for timing in timings)
+        print(f"{role:<10}{process:>11.2f}{imported:>10.2f}{first_render:>14.2f}{dashboard:>13.2f}"
+              f"{total:>9.2f}{succeeded:>5}")
+
+# Reporting
+def run_level(sessions, students, duration):
+    roles = [ROLE_MIX[i % len(ROLE_MIX)] for i in range(sessions)]
+    context = multiprocessing.get_context("spawn")
+    started = time.perf_counter()
+    with context.Pool(sessions) as pool:
+        outcomes = pool.starmap(run_session, [(role, i, students, duration) for i, role in enumerate(roles)])
+    elapsed = time.perf_counter() - started
+
+    pages = {}
+    errors = 0
+    for samples, session_errors in outcomes:
+        errors += session_errors
+        for page, seconds, statements in samples:
+            pages.setdefault(page, []).append((seconds, statements))
+
+    renders = sum(len(runs) for runs in pages.values())
+    print(f"\n== {sessions} sessions: {renders} reruns in {elapsed:.1f}s, "
+          f"{renders / elapsed:.1f} reruns/s, {errors} errors")
+    print(f"{'page':<20}{'runs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'stmts/run':>11}")
+    for page, runs in sorted(pages.items()):
+        seconds = np.array([run[0] for run in runs]) * 1000
+        statements = np.mean([run[1] for run in runs])
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+        print(f"{page:<20}{len(runs):>6}{p50:>10.0f}{p95:>10.0f}{p99:>10.0f}{statements:>11.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seed", type=int, metavar="STUDENTS",
+                        help="create load-test users and data for this many students, then exit")
+    parser.add_argument("--students", type=int, default=100,
+                        help="number of seeded students sessions log in as")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25],
+                        help="concurrency levels to run, in order")
+    parser.add_argument("--duration", type=float, default=20,
+                        help="seconds each session keeps rerunning its pages")
+    parser.add_argument("--seed-semester", type=int, metavar="STUDENTS",
+                        help="create main.py students, courses and marks for the semester benchmark, then exit")
+    parser.add_argument("--bench-semester", type=int, nargs="+", metavar="WORKERS",
+                        help="time main.py semester results serially and with these worker counts, then exit")
+    parser.add_argument("--bench-marksheets", type=int, nargs="+", metavar="WORKERS",
+                        help="time main.py marksheet generation for the seeded semester with these worker "
+                             "counts, then exit")
+    parser.add_argument("--seed-results", type=int, metavar="ROWS",
+                        help="add graded exams for the seeded students until about ROWS results exist, then exit")
+    parser.add_argument("--bench-results", action="store_true",
+                        help="compare time and peak memory of the columnar results fetch, then exit")
+    parser.add_argument("--bench-views", action="store_true",
+                        help="compare time and peak memory of the Arrow table views, then exit")
+    parser.add_argument("--bench-prepared", type=int, metavar="RUNS",
+                        help="time the hot queries RUNS times each, prepared and plain, then exit")
+    parser.add_argument("--bench-login", action="store_true",
+                        help="measure authenticate throughput for --students users at each --sessions "
+                             "thread count, then exit")
+    parser.add_argument("--bench-results-layout", type=int, metavar="RUNS",
+                        help="time result reads and score writes RUNS times on EXAM_ATTEMPT and on the "
+                             "old two-table layout, then exit")
+    parser.add_argument("--bench-startup", type=int, nargs="?", const=3, metavar="RUNS",
+                        help="time fresh processes from start to each role's first dashboard render, "
+                             "median of RUNS (default 3), then exit")
+    parser.add_argument("--bench-procedures", type=float, nargs="+", metavar="RTT_MS",
+                        help="time account creation through stored procedures and as separate statements "
+                             "with each simulated round-trip delay, then exit")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+        return
+    if args.seed_semester:
+        seed_semester(args.seed_semester)
+        return
+    if args.bench_semester:
+        bench_semester(args.bench_semester)
+        return
+    if args.bench_marksheets:
+        bench_marksheets(args.bench_marksheets)
+        return
+    if args.seed_results:
+        seed_results(args.seed_results)
+        return
+    if args.bench_results:
+        bench_results()
+        return
+    if args.bench_views:
+        bench_views()
+        return
+    if args.bench_prepared:
+        bench_prepared(args.bench_prepared)
+        return
+    if args.bench_login:
+        bench_login(args.students, args.sessions)
+        return
+    if args.bench_results_layout:
+        bench_results_layout(args.bench_results_layout)
+        return
+    if args.bench_startup:
+        bench_startup(args.bench_startup)
+        return
+    if args.bench_procedures:
+        bench_procedures(args.bench_procedures, runs=20)
+        return
+    for sessions in args.sessions:
+        run_level(sessions, args.students, args.duration)
+
+if __name__ == "__main__":
+    main()
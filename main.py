@@ -1,48 +1,116 @@
 import streamlit as st
 import mysql.connector
 from mysql.connector import Error
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import collections
+import contextlib
+import contextvars
 import hashlib
+import hmac
+import importlib
+import importlib.util
+import itertools
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+# Lazy Imports
+# pandas and fpdf are only needed once a table view or a marksheet is rendered,
+# so they are loaded on first attribute access instead of on every cold start.
+def lazy_import(name):
+    """Return the named module, deferring its execution until first use"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+pd = lazy_import('pandas')
+fpdf = lazy_import('fpdf')
+
 # Database Configuration
 import os
 
-# Try to get from Streamlit secrets first, then environment variables, then defaults
-try:
-    DB_CONFIG = {
-        'host': st.secrets.get('DB_HOST', os.getenv('DB_HOST', 'interchange.proxy.rlwy.net')),
-        'user': st.secrets.get('DB_USER', os.getenv('DB_USER', 'root')),
-        'password': st.secrets.get('DB_PASSWORD', os.getenv('DB_PASSWORD', 'IvFcKTyXyPvwjFTXPyEasdaHdDvhKoaM')),
-        'database': st.secrets.get('DB_NAME', os.getenv('DB_NAME', 'railway')),
-        'port': int(st.secrets.get('DB_PORT', os.getenv('DB_PORT', 49523)))
-    }
-except:
-    DB_CONFIG = {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'user': os.getenv('DB_USER', 'root'),
-        'password': os.getenv('DB_PASSWORD', 'root'),
-        'database': os.getenv('DB_NAME', 'exam_management'),
-        'port': int(os.getenv('DB_PORT', 3306))
-    }
+# Secrets are read on the first connection of the process, not at import time.
+@st.cache_resource(show_spinner=False)
+def get_db_config():
+    # Try to get from Streamlit secrets first, then environment variables, then defaults
+    try:
+        return {
+            'host': st.secrets.get('DB_HOST', os.getenv('DB_HOST', 'interchange.proxy.rlwy.net')),
+            'user': st.secrets.get('DB_USER', os.getenv('DB_USER', 'root')),
+            'password': st.secrets.get('DB_PASSWORD', os.getenv('DB_PASSWORD', 'IvFcKTyXyPvwjFTXPyEasdaHdDvhKoaM')),
+            'database': st.secrets.get('DB_NAME', os.getenv('DB_NAME', 'railway')),
+            'port': int(st.secrets.get('DB_PORT', os.getenv('DB_PORT', 49523)))
+        }
+    except:
+        return {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'user': os.getenv('DB_USER', 'root'),
+            'password': os.getenv('DB_PASSWORD', 'root'),
+            'database': os.getenv('DB_NAME', 'exam_management'),
+            'port': int(os.getenv('DB_PORT', 3306))
+        }
 
 # Grading System based on the provided document
-def calculate_grade(marks):
+# A grading scheme is stored as data: bands of (min_marks, grade, grade_point).
+# Schemes are compiled once into sorted threshold arrays so a grade is found by
+# binary search, for a single mark or a whole array at once.
+DEFAULT_GRADE_BANDS = [
+    (90, 'O', 10),
+    (80, 'A+', 9),
+    (70, 'A', 8),
+    (60, 'B+', 7),
+    (50, 'B', 6),
+    (40, 'C', 5),
+    (0, 'F', 0),
+]
+
+def compile_grading_scheme(bands):
+    """Compile (min_marks, grade, grade_point) bands into lookup arrays"""
+    ordered = sorted(bands, key=lambda band: float(band[0]))
+    return {
+        'bands': ordered[::-1],
+        'cutoffs': np.array([float(band[0]) for band in ordered]),
+        'grades': np.array([band[1] for band in ordered], dtype=object),
+        'grade_points': np.array([int(band[2]) for band in ordered], dtype=object),
+    }
+
+def lookup_grade(scheme, marks):
+    """Return (grade, grade_point) for marks, or arrays of them for an array"""
+    band = np.maximum(np.searchsorted(scheme['cutoffs'], marks, side='right') - 1, 0)
+    return scheme['grades'][band], scheme['grade_points'][band]
+
+def grade_band_problem(bands):
+    """Why bands cannot be saved as a scheme, or None if they can.
+
+    lookup_grade puts anything below the lowest cutoff into the lowest band,
+    so the bands must start at 0 for every score to land in the right one.
+    """
+    cutoffs = [float(band[0]) for band in bands]
+    if not cutoffs:
+        return "A scheme needs at least one band"
+    if len(set(cutoffs)) != len(cutoffs):
+        return "Each band needs a unique minimum mark"
+    if min(cutoffs) != 0:
+        return "The lowest band must start at 0 marks"
+    return None
+
+DEFAULT_GRADING_SCHEME = compile_grading_scheme(DEFAULT_GRADE_BANDS)
+
+def calculate_grade(marks, scheme=DEFAULT_GRADING_SCHEME):
     """Calculate grade based on marks according to the grading system"""
-    if marks >= 90:
-        return 'O', 10
-    elif marks >= 80:
-        return 'A+', 9
-    elif marks >= 70:
-        return 'A', 8
-    elif marks >= 60:
-        return 'B+', 7
-    elif marks >= 50:
-        return 'B', 6
-    elif marks >= 40:
-        return 'C', 5
-    else:
-        return 'F', 0
+    return lookup_grade(scheme, float(marks))
 
 def calculate_sgpa(grades_credits):
     """Calculate SGPA from grades and credits"""
@@ -53,19 +121,229 @@ def calculate_sgpa(grades_credits):
     return round(weighted_sum / total_credits, 2)
 
 # Database Connection
-def get_db_connection():
+def open_db_connection():
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = mysql.connector.connect(**get_db_config())
         return conn
     except Error as e:
         st.error(f"Database connection error: {e}")
         return None
 
+def get_db_connection():
+    unit = _active_unit.get()
+    if unit is not None:
+        return unit.get_connection()
+    return open_db_connection()
+
+# Unit of Work
+# A Streamlit rerun runs inside one unit of work: the data-access functions it
+# calls share one connection and one transaction, committed when the rerun
+# ends and rolled back if it raises. commit() and close() on the shared
+# connection are left to the unit; rollback() fails the whole unit, so
+# nothing it wrote is committed, later writes included.
+_active_unit = contextvars.ContextVar('active_unit', default=None)
+
+class UnitConnection:
+    """The unit's connection as handed to data-access functions"""
+    def __init__(self, connection, unit):
+        self.connection = connection
+        self.unit = unit
+    
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+    
+    def commit(self):
+        pass  # committed by the unit of work
+    
+    def rollback(self):
+        # Writes made earlier in the unit are gone, so the unit must not
+        # commit later ones or run their callbacks either
+        self.connection.rollback()
+        self.unit.failed = True
+    
+    def close(self):
+        pass  # closed by the unit of work
+
+class UnitOfWork:
+    def __init__(self):
+        self.connection = None
+        self.after_commit = []
+        self.failed = False
+    
+    def get_connection(self):
+        if self.connection is None:
+            conn = open_db_connection()
+            if conn:
+                self.connection = UnitConnection(conn, self)
+        return self.connection
+    
+    def commit(self):
+        if self.connection is None:
+            return
+        if self.failed:
+            self.connection.connection.rollback()
+            self.after_commit.clear()
+            st.error("Changes were not saved because part of this action failed.")
+            return
+        try:
+            self.connection.connection.commit()
+        except Error as e:
+            st.error(f"Error saving changes: {e}")
+            return
+        for callback in self.after_commit:
+            callback()
+
+@contextlib.contextmanager
+def unit_of_work():
+    """Share one connection and transaction between the calls made inside"""
+    if _active_unit.get() is not None:
+        yield _active_unit.get()  # nested units join the outer one
+        return
+    unit = UnitOfWork()
+    token = _active_unit.set(unit)
+    try:
+        yield unit
+    except Exception:
+        raise  # closing without a commit rolls the unit back
+    except BaseException:
+        unit.commit()  # st.rerun() and st.stop() end the script normally
+        raise
+    else:
+        unit.commit()
+    finally:
+        _active_unit.reset(token)
+        if unit.connection is not None:
+            unit.connection.connection.close()
+
+@contextlib.contextmanager
+def outside_unit_of_work():
+    """Let the calls made inside use and commit connections of their own"""
+    token = _active_unit.set(None)
+    try:
+        yield
+    finally:
+        _active_unit.reset(token)
+
+def on_commit(callback):
+    """Run callback once the current writes are committed"""
+    unit = _active_unit.get()
+    if unit is None or unit.connection is None:
+        callback()
+    else:
+        unit.after_commit.append(callback)
+
+# Arrow Fetching
+# Display-only tables skip pandas entirely: each fetchmany batch becomes an
+# Arrow record batch that st.dataframe serializes without another conversion.
+FETCH_BATCH_SIZE = 10000
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+def fetch_arrow(cursor, schema, batch_size=FETCH_BATCH_SIZE):
+    """Build a pyarrow Table from an executed tuple cursor, one record batch per fetch"""
+    batches = []
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batches.append(pa.RecordBatch.from_arrays(
+            [pa.array(values).cast(field.type) for field, values in zip(schema, zip(*rows))],
+            schema=schema
+        ))
+    return pa.Table.from_batches(batches, schema=schema).unify_dictionaries()
+
 # Password hashing
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# Passwords are stored as salted PBKDF2-SHA256 hashes in the form
+# pbkdf2_sha256$iterations$salt$digest. Plain SHA-256 digests from before are
+# still accepted and replaced with a PBKDF2 hash on the next successful login.
+PASSWORD_SCHEME = 'pbkdf2_sha256'
+PASSWORD_ITERATIONS = int(os.getenv('PASSWORD_ITERATIONS', 600000))
+
+def hash_password(password, iterations=PASSWORD_ITERATIONS):
+    salt = os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), iterations).hex()
+    return f"{PASSWORD_SCHEME}${iterations}${salt}${digest}"
+
+def verify_password(password, stored_hash):
+    if stored_hash.startswith(PASSWORD_SCHEME + '$'):
+        _, iterations, salt, digest = stored_hash.split('$')
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), int(iterations)).hex()
+    else:
+        digest = stored_hash
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(candidate, digest)
+
+def password_needs_rehash(stored_hash):
+    return not stored_hash.startswith(f"{PASSWORD_SCHEME}${PASSWORD_ITERATIONS}$")
+
+# Stored procedure for adding a student: the user account and student record
+# are inserted under one savepoint of the caller's transaction with one round
+# trip, and duplicates are reported through a status row instead of an
+# exception. The caller commits. Procedures are tagged with PROCEDURE_VERSION
+# and recreated when it changes.
+PROCEDURE_VERSION = '3'
+
+STORED_PROCEDURES = {
+    'sp_add_student': """
+        CREATE PROCEDURE sp_add_student(
+            IN p_roll_no VARCHAR(20), IN p_name VARCHAR(100), IN p_semester INT,
+            IN p_department VARCHAR(50), IN p_password VARCHAR(255)
+        )
+        COMMENT '{version}'
+        BEGIN
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                RESIGNAL;
+            END;
+            DECLARE EXIT HANDLER FOR 1062
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                SELECT 'duplicate_roll_no' AS status;
+            END;
+            SAVEPOINT sp_status_procedure;
+            INSERT INTO users (username, password, role, name)
+            VALUES (p_roll_no, p_password, 'student', p_name);
+            INSERT INTO students (roll_no, name, semester, department, user_id)
+            VALUES (p_roll_no, p_name, p_semester, p_department, LAST_INSERT_ID());
+            INSERT INTO change_log (entity, entity_key, operation)
+            VALUES ('student', p_roll_no, 'insert');
+            RELEASE SAVEPOINT sp_status_procedure;
+            SELECT 'ok' AS status;
+        END
+    """,
+}
+
+def call_status_procedure(cursor, name, args):
+    """Call a stored procedure and return the status it selects"""
+    cursor.callproc(name, args)
+    status = None
+    for result in cursor.stored_results():
+        row = result.fetchone()
+        if row and status is None:
+            status = row[0]
+    return status
+
+def ensure_index(cursor, table, index_name, columns):
+    """Create a secondary index unless it already exists"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index_name))
+    if not cursor.fetchone():
+        cursor.execute(f"CREATE INDEX {index_name} ON {table} ({columns})")
+
+def ensure_column(cursor, table, column, definition):
+    """Add a column unless it already exists"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    if not cursor.fetchone():
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
 # Initialize Database
+@outside_unit_of_work()
 def init_database():
     conn = get_db_connection()
     if conn:
@@ -124,6 +402,7 @@ def init_database():
                 marks DECIMAL(5,2),
                 grade VARCHAR(2),
                 grade_point INT,
+                version INT NOT NULL DEFAULT 1,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 FOREIGN KEY (roll_no) REFERENCES students(roll_no),
                 FOREIGN KEY (course_id) REFERENCES courses(course_id),
@@ -144,6 +423,92 @@ def init_database():
             )
         """)
         
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS grading_schemes (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                course_id VARCHAR(20) UNIQUE,
+                FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS grading_bands (
+                scheme_id INT NOT NULL,
+                min_marks DECIMAL(5,2) NOT NULL,
+                grade VARCHAR(2) NOT NULL,
+                grade_point INT NOT NULL,
+                PRIMARY KEY (scheme_id, min_marks),
+                FOREIGN KEY (scheme_id) REFERENCES grading_schemes(id) ON DELETE CASCADE
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS regrade_checkpoints (
+                job_name VARCHAR(50) PRIMARY KEY,
+                last_id INT NOT NULL,
+                rows_done INT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                entity VARCHAR(30) NOT NULL,
+                entity_key VARCHAR(100) NOT NULL,
+                operation VARCHAR(20) NOT NULL,
+                payload JSON,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                job_type VARCHAR(50) NOT NULL,
+                params TEXT NOT NULL,
+                active_key VARCHAR(255) UNIQUE,
+                status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+                progress FLOAT NOT NULL DEFAULT 0,
+                message VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP NULL,
+                finished_at TIMESTAMP NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Marks edits are compare-and-set on a per-row version
+        ensure_column(cursor, 'marks', 'version', 'INT NOT NULL DEFAULT 1')
+        
+        # Covering index for the login lookup
+        ensure_index(cursor, 'users', 'idx_users_login', 'username, role, password, name')
+        
+        # Indexes for type-ahead search
+        ensure_index(cursor, 'students', 'idx_students_name', 'name')
+        ensure_index(cursor, 'courses', 'idx_courses_name', 'course_name')
+        
+        # Insert default grading scheme if not exists
+        cursor.execute("SELECT id FROM grading_schemes WHERE course_id IS NULL")
+        if not cursor.fetchone():
+            cursor.execute("INSERT INTO grading_schemes (course_id) VALUES (NULL)")
+            scheme_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO grading_bands (scheme_id, min_marks, grade, grade_point)
+                VALUES (%s, %s, %s, %s)
+            """, [(scheme_id, *band) for band in DEFAULT_GRADE_BANDS])
+        
+        # Create missing or outdated stored procedures
+        cursor.execute("""
+            SELECT ROUTINE_NAME, ROUTINE_COMMENT FROM information_schema.ROUTINES
+            WHERE ROUTINE_SCHEMA = DATABASE() AND ROUTINE_TYPE = 'PROCEDURE'
+        """)
+        existing = dict(cursor.fetchall())
+        for name, ddl in STORED_PROCEDURES.items():
+            if existing.get(name) != PROCEDURE_VERSION:
+                cursor.execute(f"DROP PROCEDURE IF EXISTS {name}")
+                cursor.execute(ddl.replace('{version}', PROCEDURE_VERSION))
+        
         # Insert default admin if not exists
         cursor.execute("SELECT * FROM users WHERE username = 'admin'")
         if not cursor.fetchone():
@@ -156,21 +521,250 @@ def init_database():
         conn.commit()
         cursor.close()
         conn.close()
+        return True
 
-# Authentication
-def authenticate(username, password, role):
+# Schema setup runs once per server process instead of on every rerun. A failed
+# attempt raises so it is not cached and the next rerun tries again.
+@st.cache_resource(show_spinner=False)
+def ensure_database():
+    if not init_database():
+        raise RuntimeError("Database initialization failed")
+    return True
+
+# Change Feed
+# Writes append a row to change_log on the same cursor, and so in the same
+# transaction, as the change itself. Derived data can then be refreshed
+# incrementally by reading the changes after the last sequence it processed.
+def record_change(cursor, entity, entity_key, operation, payload=None):
+    cursor.execute("""
+        INSERT INTO change_log (entity, entity_key, operation, payload)
+        VALUES (%s, %s, %s, %s)
+    """, (entity, str(entity_key), operation,
+          json.dumps(payload, default=str) if payload is not None else None))
+
+def get_changes_after(change_id, limit=1000, entities=None):
+    """Changes with a sequence number above change_id, oldest first.
+
+    Sequence numbers are allocated at insert time, so a slow concurrent
+    transaction can commit a lower number after a higher one has been read;
+    consumers that must not miss a change should re-read a small overlap.
+    """
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        entity_filter = ""
+        params = [change_id]
+        if entities:
+            entity_filter = f"AND entity IN ({', '.join(['%s'] * len(entities))})"
+            params.extend(entities)
+        cursor.execute(f"""
+            SELECT id, entity, entity_key, operation, payload, changed_at
+            FROM change_log
+            WHERE id > %s {entity_filter}
+            ORDER BY id
+            LIMIT %s
+        """, (*params, limit))
+        changes = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        for change in changes:
+            if change['payload'] is not None:
+                change['payload'] = json.loads(change['payload'])
+        return changes
+    return []
+
+def get_latest_change_id():
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM change_log")
+        latest = cursor.fetchone()[0]
+        cursor.close()
+        conn.close()
+        return latest
+    return 0
+
+# Grading Scheme Functions
+@st.cache_data(ttl=600, show_spinner=False)
+def load_grading_schemes():
+    """Load and compile every grading scheme, keyed by course_id (None is the default)"""
+    conn = mysql.connector.connect(**get_db_config())
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT gs.course_id, gb.min_marks, gb.grade, gb.grade_point
+            FROM grading_schemes gs
+            JOIN grading_bands gb ON gs.id = gb.scheme_id
+        """)
+        bands = {}
+        for course_id, min_marks, grade, grade_point in cursor.fetchall():
+            bands.setdefault(course_id, []).append((min_marks, grade, grade_point))
+        return {course_id: compile_grading_scheme(course_bands)
+                for course_id, course_bands in bands.items()}
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_grading_scheme(course_id=None):
+    """Compiled grading scheme for a course, falling back to the default scheme"""
+    try:
+        schemes = load_grading_schemes()
+    except Error as e:
+        st.error(f"Error loading grading schemes: {e}")
+        return DEFAULT_GRADING_SCHEME
+    return schemes.get(course_id) or schemes.get(None) or DEFAULT_GRADING_SCHEME
+
+def save_grading_scheme(course_id, bands):
+    """Replace the bands of a course's scheme (course_id None saves the default)"""
+    problem = grade_band_problem(bands)
+    if problem:
+        st.error(problem)
+        return False
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM grading_schemes WHERE course_id <=> %s", (course_id,))
+            row = cursor.fetchone()
+            if row:
+                scheme_id = row[0]
+                cursor.execute("DELETE FROM grading_bands WHERE scheme_id = %s", (scheme_id,))
+            else:
+                cursor.execute("INSERT INTO grading_schemes (course_id) VALUES (%s)", (course_id,))
+                scheme_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO grading_bands (scheme_id, min_marks, grade, grade_point)
+                VALUES (%s, %s, %s, %s)
+            """, [(scheme_id, float(min_marks), grade, int(grade_point))
+                  for min_marks, grade, grade_point in bands])
+            record_change(cursor, 'grading_scheme', course_id, 'update')
+            conn.commit()
+            cursor.close()
+            conn.close()
+            on_commit(load_grading_schemes.clear)
+            return True
+        except Error as e:
+            st.error(f"Error saving grading scheme: {e}")
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return False
+    return False
+
+def delete_grading_scheme(course_id):
+    """Remove a course's own scheme so it falls back to the default"""
     conn = get_db_connection()
     if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM grading_schemes WHERE course_id = %s", (course_id,))
+            record_change(cursor, 'grading_scheme', course_id, 'delete')
+            conn.commit()
+            cursor.close()
+            conn.close()
+            on_commit(load_grading_schemes.clear)
+            return True
+        except Error as e:
+            st.error(f"Error deleting grading scheme: {e}")
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return False
+    return False
+
+# Authentication
+# Logins read credentials through a bounded, process-wide cache keyed by
+# username, so repeat logins and failed retries do not query users; unknown
+# usernames are cached as well. Entries expire after LOGIN_CACHE_TTL seconds
+# and are dropped when the user is added or its hash is upgraded. Password
+# hashing runs in a small thread pool so a login surge queues for CPU.
+LOGIN_CACHE_SIZE = int(os.getenv('LOGIN_CACHE_SIZE', 10000))
+LOGIN_CACHE_TTL = int(os.getenv('LOGIN_CACHE_TTL', 300))
+PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', os.cpu_count() or 2))
+
+class CredentialCache:
+    MISSING = object()
+    
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, username):
+        """Cached users row (None for an unknown user), or MISSING"""
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is None or entry[0] < time.monotonic():
+                return self.MISSING
+            self.entries.move_to_end(username)
+            return entry[1]
+    
+    def put(self, username, user):
+        with self.lock:
+            self.entries[username] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, username):
+        with self.lock:
+            self.entries.pop(username, None)
+
+@st.cache_resource(show_spinner=False)
+def get_credential_cache():
+    return CredentialCache(LOGIN_CACHE_SIZE, LOGIN_CACHE_TTL)
+
+@st.cache_resource(show_spinner=False)
+def get_password_executor():
+    return ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix='password')
+
+def forget_credentials(username):
+    """Drop a user's cached credentials once the current writes commit"""
+    on_commit(lambda: get_credential_cache().invalidate(username))
+
+def authenticate(username, password, role):
+    cache = get_credential_cache()
+    user = cache.get(username)
+    if user is CredentialCache.MISSING:
+        conn = get_db_connection()
+        if not conn:
+            return None
         cursor = conn.cursor(dictionary=True)
-        hashed_pass = hash_password(password)
+        # idx_users_login covers the lookup, so no clustered row is read
         cursor.execute("""
-            SELECT * FROM users WHERE username = %s AND password = %s AND role = %s
-        """, (username, hashed_pass, role))
+            SELECT id, username, password, role, name
+            FROM users FORCE INDEX (idx_users_login) WHERE username = %s
+        """, (username,))
         user = cursor.fetchone()
         cursor.close()
         conn.close()
-        return user
-    return None
+        cache.put(username, user)
+    
+    if user is None or user['role'] != role:
+        return None
+    if not get_password_executor().submit(verify_password, password, user['password']).result():
+        return None
+    if password_needs_rehash(user['password']):
+        upgrade_password_hash(user['id'], username, password)
+    return {key: value for key, value in user.items() if key != 'password'}
+
+@outside_unit_of_work()
+def upgrade_password_hash(user_id, username, password):
+    """Store a current PBKDF2 hash for a user who logged in with an old one"""
+    password_hash = get_password_executor().submit(hash_password, password).result()
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s", (password_hash, user_id))
+            conn.commit()
+            forget_credentials(username)
+        except Error:
+            conn.rollback()  # the old hash keeps working; retried on the next login
+        finally:
+            cursor.close()
+            conn.close()
 
 # Student Functions
 def get_student_details(roll_no):
@@ -237,7 +831,8 @@ def get_course_students(course_id):
         cursor = conn.cursor(dictionary=True)
         cursor.execute("""
             SELECT s.roll_no, s.name, s.semester, s.department, 
-                   COALESCE(m.marks, 0) as marks, m.grade, m.grade_point
+                   COALESCE(m.marks, 0) as marks, m.grade, m.grade_point,
+                   COALESCE(m.version, 0) as version
             FROM enrollments e
             JOIN students s ON e.roll_no = s.roll_no
             LEFT JOIN marks m ON e.roll_no = m.roll_no AND e.course_id = m.course_id
@@ -250,42 +845,211 @@ def get_course_students(course_id):
         return students
     return []
 
-def update_student_marks(roll_no, course_id, marks):
-    grade, grade_point = calculate_grade(marks)
+def update_student_marks(roll_no, course_id, marks, expected_version=None):
+    """Enter or change a student's marks for a course.
+
+    With expected_version (0 when no marks were entered yet) the marks are only
+    written if they are still at that version, so an edit never overwrites one
+    saved after it was loaded; a conflict is reported and False returned.
+    """
+    grade, grade_point = calculate_grade(marks, get_grading_scheme(course_id))
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO marks (roll_no, course_id, marks, grade, grade_point)
-            VALUES (%s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE marks = %s, grade = %s, grade_point = %s
-        """, (roll_no, course_id, marks, grade, grade_point, marks, grade, grade_point))
+        if expected_version is None:
+            cursor.execute("""
+                INSERT INTO marks (roll_no, course_id, marks, grade, grade_point)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE marks = %s, grade = %s, grade_point = %s, version = version + 1
+            """, (roll_no, course_id, marks, grade, grade_point, marks, grade, grade_point))
+        elif expected_version == 0:
+            # Leaves an existing row unchanged, which reports no affected rows
+            cursor.execute("""
+                INSERT INTO marks (roll_no, course_id, marks, grade, grade_point)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = id
+            """, (roll_no, course_id, marks, grade, grade_point))
+        else:
+            cursor.execute("""
+                UPDATE marks SET marks = %s, grade = %s, grade_point = %s, version = version + 1
+                WHERE roll_no = %s AND course_id = %s AND version = %s
+            """, (marks, grade, grade_point, roll_no, course_id, expected_version))
+        if cursor.rowcount == 0:
+            cursor.close()
+            conn.close()
+            st.warning("These marks were changed by someone else since you loaded them.")
+            return False
+        record_change(cursor, 'marks', f"{roll_no}/{course_id}", 'upsert',
+                      {'roll_no': roll_no, 'course_id': course_id, 'marks': marks})
         conn.commit()
+        on_commit(fetch_rank_list.clear)
         cursor.close()
         conn.close()
         return True
     return False
 
-# Admin Functions
-def add_student(roll_no, name, semester, department, password):
+@outside_unit_of_work()
+def save_course_marks(course_id, edits):
+    """Save several marks edits of one course, each compare-and-set on its version.
+
+    edits holds (roll_no, marks, expected_version) tuples, with version 0 for
+    marks not entered yet. The current versions are checked in one locking
+    read and every edit that still matches is written in one statement. The
+    save commits on a connection of its own, outside the rerun's unit of work,
+    so the row locks are released as soon as it returns. Returns the roll
+    numbers that had changed and were left alone.
+    """
+    if not edits:
+        return []
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(edits))
+        cursor.execute(f"""
+            SELECT roll_no, version FROM marks
+            WHERE course_id = %s AND roll_no IN ({placeholders})
+            FOR UPDATE
+        """, (course_id, *[roll_no for roll_no, _, _ in edits]))
+        versions = dict(cursor.fetchall())
+        conflicts = [roll_no for roll_no, _, version in edits if versions.get(roll_no, 0) != version]
+        saved = [(roll_no, marks) for roll_no, marks, version in edits if versions.get(roll_no, 0) == version]
+        if saved:
+            grades, grade_points = lookup_grade(get_grading_scheme(course_id),
+                                                np.array([marks for _, marks in saved], dtype=float))
+            cursor.execute(f"""
+                INSERT INTO marks (roll_no, course_id, marks, grade, grade_point)
+                VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(saved))}
+                ON DUPLICATE KEY UPDATE marks = VALUES(marks), grade = VALUES(grade),
+                    grade_point = VALUES(grade_point), version = version + 1
+            """, [value for (roll_no, marks), grade, grade_point in zip(saved, grades, grade_points)
+                  for value in (roll_no, course_id, marks, grade, grade_point)])
+            for roll_no, marks in saved:
+                record_change(cursor, 'marks', f"{roll_no}/{course_id}", 'upsert',
+                              {'roll_no': roll_no, 'course_id': course_id, 'marks': marks})
+            conn.commit()
+            on_commit(fetch_rank_list.clear)
+        cursor.close()
+        conn.close()
+        return conflicts
+    return None
+
+REGRADE_CHUNK_SIZE = 1000
+
+def run_bulk_regrade(chunk_size=REGRADE_CHUNK_SIZE, restart=False, on_progress=None):
+    """Recompute grade and grade_point for every mark, walking marks in id chunks.
+
+    Each chunk is graded as an array, written with one batched upsert and
+    committed together with a checkpoint, so an interrupted run resumes after
+    the last committed chunk. on_progress is called after every chunk with
+    (rows_done, total_rows, rows_per_sec, eta_seconds). Returns a summary dict,
+    or None on error.
+    """
+    job_name = 'marks'
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor()
         try:
-            # Create user account
-            hashed_pass = hash_password(password)
+            if restart:
+                cursor.execute("DELETE FROM regrade_checkpoints WHERE job_name = %s", (job_name,))
             cursor.execute("""
-                INSERT INTO users (username, password, role, name)
-                VALUES (%s, %s, 'student', %s)
-            """, (roll_no, hashed_pass, name))
-            user_id = cursor.lastrowid
+                SELECT last_id, rows_done FROM regrade_checkpoints WHERE job_name = %s
+            """, (job_name,))
+            checkpoint = cursor.fetchone()
+            last_id, rows_done = checkpoint if checkpoint else (0, 0)
             
-            # Create student record
             cursor.execute("""
-                INSERT INTO students (roll_no, name, semester, department, user_id)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (roll_no, name, semester, department, user_id))
+                SELECT COUNT(*) FROM marks WHERE id > %s AND marks IS NOT NULL
+            """, (last_id,))
+            total_rows = rows_done + cursor.fetchone()[0]
+            
+            started = time.perf_counter()
+            processed = 0
+            while True:
+                cursor.execute("""
+                    SELECT id, roll_no, course_id, marks
+                    FROM marks
+                    WHERE id > %s AND marks IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (last_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                
+                marks = np.array([row[3] for row in rows], dtype=float)
+                course_ids = np.array([row[2] for row in rows], dtype=object)
+                grades = np.empty(len(rows), dtype=object)
+                grade_points = np.empty(len(rows), dtype=object)
+                for course_id in set(course_ids):
+                    in_course = course_ids == course_id
+                    grades[in_course], grade_points[in_course] = lookup_grade(
+                        get_grading_scheme(course_id), marks[in_course]
+                    )
+                
+                cursor.executemany("""
+                    INSERT INTO marks (id, roll_no, course_id, marks, grade, grade_point)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE grade = VALUES(grade), grade_point = VALUES(grade_point)
+                """, [(row[0], row[1], row[2], row[3], grade, grade_point)
+                      for row, grade, grade_point in zip(rows, grades, grade_points)])
+                
+                last_id = rows[-1][0]
+                rows_done += len(rows)
+                processed += len(rows)
+                cursor.execute("""
+                    INSERT INTO regrade_checkpoints (job_name, last_id, rows_done)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE last_id = VALUES(last_id), rows_done = VALUES(rows_done)
+                """, (job_name, last_id, rows_done))
+                record_change(cursor, 'marks', f"{rows[0][0]}-{last_id}", 'regrade',
+                              {'first_id': rows[0][0], 'last_id': last_id})
+                conn.commit()
+                
+                elapsed = time.perf_counter() - started
+                rows_per_sec = processed / elapsed if elapsed > 0 else 0.0
+                eta_seconds = (total_rows - rows_done) / rows_per_sec if rows_per_sec else 0.0
+                if on_progress:
+                    on_progress(rows_done, total_rows, rows_per_sec, eta_seconds)
+            
+            cursor.execute("DELETE FROM regrade_checkpoints WHERE job_name = %s", (job_name,))
+            conn.commit()
+            cursor.close()
+            conn.close()
+            on_commit(fetch_rank_list.clear)
+            
+            elapsed = time.perf_counter() - started
+            return {
+                'rows': processed,
+                'seconds': round(elapsed, 2),
+                'rows_per_sec': round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+        except Error as e:
+            st.error(f"Error regrading marks: {e}")
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return None
+    return None
+
+# Admin Functions
+def add_student(roll_no, name, semester, department, password):
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            # Create user account and student record in one call
+            hashed_pass = hash_password(password)
+            status = call_status_procedure(cursor, 'sp_add_student', (
+                roll_no, name, semester, department, hashed_pass
+            ))
+            if status != 'ok':
+                # The procedure already rolled back to its savepoint
+                cursor.close()
+                conn.close()
+                st.error("Roll number already exists!")
+                return False
             conn.commit()
+            forget_credentials(roll_no)
             cursor.close()
             conn.close()
             return True
@@ -307,7 +1071,9 @@ def add_teacher(username, name, password):
                 INSERT INTO users (username, password, role, name)
                 VALUES (%s, %s, 'teacher', %s)
             """, (username, hashed_pass, name))
+            record_change(cursor, 'teacher', cursor.lastrowid, 'insert')
             conn.commit()
+            forget_credentials(username)
             cursor.close()
             conn.close()
             return True
@@ -328,6 +1094,7 @@ def add_course(course_id, course_name, credits, semester, teacher_id):
                 INSERT INTO courses (course_id, course_name, credits, semester, teacher_id)
                 VALUES (%s, %s, %s, %s, %s)
             """, (course_id, course_name, credits, semester, teacher_id))
+            record_change(cursor, 'course', course_id, 'insert')
             conn.commit()
             cursor.close()
             conn.close()
@@ -349,6 +1116,8 @@ def enroll_student(roll_no, course_id):
                 INSERT INTO enrollments (roll_no, course_id)
                 VALUES (%s, %s)
             """, (roll_no, course_id))
+            record_change(cursor, 'enrollment', cursor.lastrowid, 'insert',
+                          {'roll_no': roll_no, 'course_id': course_id})
             conn.commit()
             cursor.close()
             conn.close()
@@ -372,16 +1141,24 @@ def get_all_teachers():
         return teachers
     return []
 
+STUDENTS_SCHEMA = pa.schema([
+    ('roll_no', pa.string()),
+    ('name', pa.string()),
+    ('semester', pa.int8()),
+    ('department', CATEGORY),
+    ('user_id', pa.int32()),
+])
+
 def get_all_students():
     conn = get_db_connection()
     if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM students ORDER BY roll_no")
-        students = cursor.fetchall()
+        cursor = conn.cursor()
+        cursor.execute("SELECT roll_no, name, semester, department, user_id FROM students ORDER BY roll_no")
+        students = fetch_arrow(cursor, STUDENTS_SCHEMA)
         cursor.close()
         conn.close()
         return students
-    return []
+    return STUDENTS_SCHEMA.empty_table()
 
 def get_all_courses():
     conn = get_db_connection()
@@ -399,7 +1176,81 @@ def get_all_courses():
         return courses
     return []
 
-def generate_semester_results(semester):
+SEMESTER_COMMIT_BATCH = 200
+SEMESTER_SHARD_SIZE = 500
+
+# Search Functions
+# Type-ahead search only ever loads the top matches for a typed prefix, using
+# index range scans, instead of every student or course on each rerun.
+SEARCH_LIMIT = 20
+
+def like_prefix(text):
+    """LIKE pattern matching values that start with text"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def search_students(query, limit=SEARCH_LIMIT):
+    """Students whose roll number or name starts with query"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        where, params = "", []
+        if query:
+            where = "WHERE roll_no LIKE %s OR name LIKE %s"
+            params = [like_prefix(query), like_prefix(query)]
+        cursor.execute(f"""
+            SELECT roll_no, name FROM students
+            {where}
+            ORDER BY roll_no
+            LIMIT %s
+        """, (*params, limit))
+        students = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return students
+    return []
+
+def search_courses(query, limit=SEARCH_LIMIT):
+    """Courses whose id or name starts with query"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        where, params = "", []
+        if query:
+            where = "WHERE course_id LIKE %s OR course_name LIKE %s"
+            params = [like_prefix(query), like_prefix(query)]
+        cursor.execute(f"""
+            SELECT course_id, course_name FROM courses
+            {where}
+            ORDER BY course_id
+            LIMIT %s
+        """, (*params, limit))
+        courses = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return courses
+    return []
+
+def search_picker(label, search, format_option, key, placeholder=""):
+    """Type-ahead selectbox returning the chosen match, or None when nothing matches"""
+    query = st.text_input(f"Search {label}", key=f"{key}_query", placeholder=placeholder)
+    matches = search(query.strip())
+    if not matches:
+        st.caption(f"No matching {label.lower()}s")
+        return None
+    options = {format_option(match): match for match in matches}
+    selected = st.selectbox(f"Select {label}", list(options.keys()), key=f"{key}_select")
+    return options[selected]
+
+def generate_semester_results(semester, on_progress=None, workers=1):
+    """Compute SGPA/CGPA for every student of a semester.
+
+    Commits every SEMESTER_COMMIT_BATCH students so no transaction stays open
+    for the whole run; on_progress is called with (students_done, total).
+    With workers > 1 the students are split into shards that are processed in
+    a pool of worker processes instead.
+    """
+    if workers > 1:
+        return generate_semester_results_sharded(semester, workers, on_progress)
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor(dictionary=True)
@@ -411,7 +1262,7 @@ def generate_semester_results(semester):
         """, (semester,))
         students = cursor.fetchall()
         
-        for student in students:
+        for done, student in enumerate(students, start=1):
             roll_no = student['roll_no']
             # Get all marks for this student in this semester
             cursor.execute("""
@@ -440,19 +1291,599 @@ def generate_semester_results(semester):
                     VALUES (%s, %s, %s, %s)
                     ON DUPLICATE KEY UPDATE sgpa = %s, cgpa = %s
                 """, (roll_no, semester, sgpa, cgpa, sgpa, cgpa))
+            
+            if done % SEMESTER_COMMIT_BATCH == 0:
+                conn.commit()
+                if on_progress:
+                    on_progress(done, len(students))
         
         conn.commit()
+        on_commit(fetch_rank_list.clear)
         cursor.close()
         conn.close()
         return True
     return False
 
+def importable_self():
+    """This file as an importable module, so its functions can be sent to worker processes"""
+    return importlib.import_module(os.path.splitext(os.path.basename(__file__))[0])
+
+def plan_semester_shards(cursor, semester, shard_size=SEMESTER_SHARD_SIZE):
+    """Split a semester's students into (department, first_roll_no, last_roll_no) shards"""
+    cursor.execute("""
+        SELECT department, roll_no FROM students
+        WHERE semester = %s
+        ORDER BY department, roll_no
+    """, (semester,))
+    shards = []
+    for _, group in itertools.groupby(cursor.fetchall(), key=lambda row: row[0].casefold()):
+        group = list(group)
+        for start in range(0, len(group), shard_size):
+            chunk = group[start:start + shard_size]
+            shards.append((chunk[0][0], chunk[0][1], chunk[-1][1]))
+    return shards
+
+def compute_semester_shard(semester, department, first_roll_no, last_roll_no):
+    """Compute and store SGPA/CGPA for one shard on its own connection.
+
+    Runs in a worker process. Reads the shard's marks and earlier SGPAs in two
+    queries and writes its results with one batched upsert. Returns
+    ((department, first_roll_no, last_roll_no), students_with_results).
+    """
+    shard_filter = """
+        s.semester = %s AND s.department = %s AND s.roll_no BETWEEN %s AND %s
+    """
+    shard_params = (semester, department, first_roll_no, last_roll_no)
+    conn = mysql.connector.connect(**get_db_config())
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT m.roll_no, m.grade_point, c.credits
+            FROM marks m
+            JOIN courses c ON m.course_id = c.course_id
+            JOIN students s ON m.roll_no = s.roll_no
+            WHERE c.semester = %s AND {shard_filter}
+        """, (semester, *shard_params))
+        grades_credits = {}
+        for roll_no, grade_point, credits in cursor.fetchall():
+            grades_credits.setdefault(roll_no, []).append((grade_point, credits))
+        
+        # CGPA (average of all semester SGPAs up to current semester)
+        cursor.execute(f"""
+            SELECT sr.roll_no, AVG(sr.sgpa)
+            FROM semester_results sr
+            JOIN students s ON sr.roll_no = s.roll_no
+            WHERE sr.semester <= %s AND {shard_filter}
+            GROUP BY sr.roll_no
+        """, (semester, *shard_params))
+        previous_cgpa = dict(cursor.fetchall())
+        
+        results = []
+        for roll_no in sorted(grades_credits):
+            sgpa = calculate_sgpa(grades_credits[roll_no])
+            cgpa = previous_cgpa.get(roll_no) or sgpa
+            results.append((roll_no, semester, sgpa, cgpa))
+        if results:
+            cursor.executemany("""
+                INSERT INTO semester_results (roll_no, semester, sgpa, cgpa)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE sgpa = VALUES(sgpa), cgpa = VALUES(cgpa)
+            """, results)
+        conn.commit()
+        return (department, first_roll_no, last_roll_no), len(results)
+    finally:
+        cursor.close()
+        conn.close()
+
+def generate_semester_results_sharded(semester, workers, on_progress=None):
+    """Generate semester results by department/roll-range shards in a process pool.
+
+    Shard outcomes are merged in shard order, so the summary does not depend on
+    which worker finished first. Raises RuntimeError naming the failed shards
+    if any shard fails; the others stay committed and a rerun is idempotent.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return False
+    cursor = conn.cursor()
+    shards = plan_semester_shards(cursor, semester)
+    cursor.close()
+    conn.close()
+    
+    module = importable_self()
+    outcomes = []
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(module.compute_semester_shard, semester, *shard): shard for shard in shards}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                outcomes.append(future.result())
+            except Exception:
+                failed.append(futures[future])
+            if on_progress:
+                on_progress(done, len(shards))
+    
+    on_commit(fetch_rank_list.clear)
+    if failed:
+        failed.sort()
+        raise RuntimeError(f"{len(failed)} of {len(shards)} shards failed, first: {failed[0]}")
+    outcomes.sort()
+    return {
+        'shards': [shard for shard, _ in outcomes],
+        'students': sum(count for _, count in outcomes),
+    }
+
+# Marksheets
+# A semester's marksheets are built from two set-based queries, rendered to PDF
+# in chunks by a process pool, and streamed into a zip archive in roll number
+# order as chunks complete.
+MARKSHEET_DIR = os.getenv('MARKSHEET_DIR', 'marksheets')
+MARKSHEET_CHUNK_SIZE = 250
+MARKSHEET_COLUMNS = [
+    ("Course", 'course_id', 25),
+    ("Course Name", 'course_name', 70),
+    ("Credits", 'credits', 20),
+    ("Marks", 'marks', 25),
+    ("Grade", 'grade', 20),
+    ("Grade Point", 'grade_point', 30),
+]
+
+def marksheet_path(semester):
+    return os.path.join(MARKSHEET_DIR, f"semester_{semester}_marksheets.zip")
+
+def fetch_marksheet_data(cursor, semester):
+    """Every student with a published result for the semester, with their course marks"""
+    cursor.execute("""
+        SELECT s.roll_no, s.name, s.department, sr.sgpa, sr.cgpa
+        FROM semester_results sr
+        JOIN students s ON sr.roll_no = s.roll_no
+        WHERE sr.semester = %s
+        ORDER BY s.roll_no
+    """, (semester,))
+    students = cursor.fetchall()
+    cursor.execute("""
+        SELECT m.roll_no, c.course_id, c.course_name, c.credits, m.marks, m.grade, m.grade_point
+        FROM marks m
+        JOIN courses c ON m.course_id = c.course_id
+        JOIN semester_results sr ON sr.roll_no = m.roll_no AND sr.semester = c.semester
+        WHERE c.semester = %s
+        ORDER BY m.roll_no, c.course_id
+    """, (semester,))
+    courses = {
+        roll_no: list(rows)
+        for roll_no, rows in itertools.groupby(cursor.fetchall(), key=lambda row: row['roll_no'])
+    }
+    for student in students:
+        student['courses'] = courses.get(student['roll_no'], [])
+    return students
+
+def pdf_text(value):
+    """Text for the PDF core fonts, which only cover Latin-1"""
+    return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+def render_marksheet(student, semester):
+    pdf = fpdf.FPDF()
+    pdf.add_page()
+    pdf.set_font('Helvetica', 'B', 16)
+    pdf.cell(0, 10, "Exam Result Management System", align='C', new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('Helvetica', '', 12)
+    pdf.cell(0, 8, f"Marksheet - Semester {semester}", align='C', new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(4)
+    for label, key in (("Roll No", 'roll_no'), ("Name", 'name'), ("Department", 'department')):
+        pdf.cell(0, 7, pdf_text(f"{label}: {student[key]}"), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(4)
+    pdf.set_font('Helvetica', 'B', 10)
+    for label, _, width in MARKSHEET_COLUMNS:
+        pdf.cell(width, 7, label, border=1)
+    pdf.ln()
+    pdf.set_font('Helvetica', '', 10)
+    for course in student['courses']:
+        for _, key, width in MARKSHEET_COLUMNS:
+            pdf.cell(width, 7, pdf_text('-' if course[key] is None else course[key]), border=1)
+        pdf.ln()
+    pdf.ln(4)
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(0, 8, f"SGPA: {student['sgpa']}    CGPA: {student['cgpa']}", new_x='LMARGIN', new_y='NEXT')
+    return bytes(pdf.output())
+
+def render_marksheet_chunk(semester, students):
+    """Render one chunk in a worker process as (file name, PDF bytes) pairs"""
+    return [
+        (f"{student['roll_no']}.pdf", render_marksheet(student, semester))
+        for student in students
+    ]
+
+def generate_marksheets(semester, workers=1, on_progress=None):
+    """Write a zip of PDF marksheets for every student with a semester result.
+
+    The archive is written beside its final path and renamed when complete, so
+    a download never sees a partial file. Returns the document count, path and
+    documents per second.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return False
+    cursor = conn.cursor(dictionary=True)
+    students = fetch_marksheet_data(cursor, semester)
+    cursor.close()
+    conn.close()
+    if not students:
+        raise RuntimeError(f"No published results for Semester {semester}")
+    
+    chunks = [students[i:i + MARKSHEET_CHUNK_SIZE] for i in range(0, len(students), MARKSHEET_CHUNK_SIZE)]
+    os.makedirs(MARKSHEET_DIR, exist_ok=True)
+    path = marksheet_path(semester)
+    module = importable_self()
+    started = time.perf_counter()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        with zipfile.ZipFile(path + '.part', 'w', zipfile.ZIP_STORED) as archive:
+            for documents in pool.map(module.render_marksheet_chunk, itertools.repeat(semester), chunks):
+                for name, data in documents:
+                    archive.writestr(name, data)
+                done += len(documents)
+                if on_progress:
+                    docs_per_sec = done / (time.perf_counter() - started)
+                    on_progress(done, len(students), docs_per_sec, (len(students) - done) / docs_per_sec)
+    os.replace(path + '.part', path)
+    elapsed = time.perf_counter() - started
+    return {'documents': done, 'path': path, 'docs_per_sec': done / elapsed}
+
+# Ranking Functions
+# Merit lists are computed with window functions and cached until results are
+# regenerated or marks change, so repeated views of a published semester do not
+# re-run the ranking query.
+MERIT_LIST_SCHEMA = pa.schema([
+    ('roll_no', pa.string()),
+    ('name', pa.string()),
+    ('department', CATEGORY),
+    ('sgpa', pa.decimal128(4, 2)),
+    ('cgpa', pa.decimal128(4, 2)),
+    ('result_date', pa.timestamp('s')),
+    ('merit_rank', pa.int32()),
+    ('department_rank', pa.int32()),
+    ('percentile', pa.float64()),
+])
+
+COURSE_RANK_SCHEMA = pa.schema([
+    ('roll_no', pa.string()),
+    ('name', pa.string()),
+    ('department', CATEGORY),
+    ('marks', pa.decimal128(5, 2)),
+    ('grade', CATEGORY),
+    ('grade_point', pa.int8()),
+    ('course_rank', pa.int32()),
+    ('percentile', pa.float64()),
+])
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_rank_list(query, params, _schema):
+    """Run a ranking query into a pyarrow Table; errors are raised so failures are never cached"""
+    conn = mysql.connector.connect(**get_db_config())
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return fetch_arrow(cursor, _schema)
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_semester_merit_list(semester, department=None, top_n=None):
+    """Semester merit list by SGPA, optionally within a single department"""
+    try:
+        return fetch_rank_list("""
+            SELECT * FROM (
+                SELECT s.roll_no, s.name, s.department, sr.sgpa, sr.cgpa, sr.result_date,
+                       DENSE_RANK() OVER (ORDER BY sr.sgpa DESC) AS merit_rank,
+                       DENSE_RANK() OVER (PARTITION BY s.department ORDER BY sr.sgpa DESC) AS department_rank,
+                       ROUND(100 * PERCENT_RANK() OVER (ORDER BY sr.sgpa), 2) AS percentile
+                FROM semester_results sr
+                JOIN students s ON sr.roll_no = s.roll_no
+                WHERE sr.semester = %s AND (%s IS NULL OR s.department = %s)
+            ) ranked
+            WHERE %s IS NULL OR merit_rank <= %s
+            ORDER BY merit_rank, roll_no
+        """, (semester, department, department, top_n, top_n), MERIT_LIST_SCHEMA)
+    except Error as e:
+        st.error(f"Error fetching merit list: {e}")
+        return MERIT_LIST_SCHEMA.empty_table()
+
+def get_course_rank_list(course_id, top_n=None):
+    """Rank students of a course by marks with dense rank and percentile"""
+    try:
+        return fetch_rank_list("""
+            SELECT * FROM (
+                SELECT s.roll_no, s.name, s.department, m.marks, m.grade, m.grade_point,
+                       DENSE_RANK() OVER (ORDER BY m.marks DESC) AS course_rank,
+                       ROUND(100 * PERCENT_RANK() OVER (ORDER BY m.marks), 2) AS percentile
+                FROM marks m
+                JOIN students s ON m.roll_no = s.roll_no
+                WHERE m.course_id = %s AND m.marks IS NOT NULL
+            ) ranked
+            WHERE %s IS NULL OR course_rank <= %s
+            ORDER BY course_rank, roll_no
+        """, (course_id, top_n, top_n), COURSE_RANK_SCHEMA)
+    except Error as e:
+        st.error(f"Error fetching course rank list: {e}")
+        return COURSE_RANK_SCHEMA.empty_table()
+
+# Background Jobs
+# Long admin operations run in a process-wide thread pool instead of the
+# Streamlit session. Each job is persisted in the jobs table; active_key is set
+# while a job is queued or running so an identical job is not started twice.
+# The process that queued a job keeps its updated_at fresh until it ends, so
+# only jobs of a process that is gone (e.g. a restarted server) go stale.
+JOB_WORKERS = 2
+JOB_STALE_SECONDS = 600
+JOB_HEARTBEAT_SECONDS = 60
+
+@st.cache_resource
+def get_job_executor():
+    """Thread pool shared by every session of this server process"""
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+
+@st.cache_resource
+def get_owned_jobs():
+    """Ids of the jobs this process has queued or is running"""
+    owned = {'jobs': set(), 'lock': threading.Lock()}
+    threading.Thread(target=send_job_heartbeats, args=(owned,), daemon=True, name='job-heartbeat').start()
+    return owned
+
+def send_job_heartbeats(owned):
+    """Touch the owned jobs every JOB_HEARTBEAT_SECONDS, also while they wait or report no progress"""
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with owned['lock']:
+            job_ids = sorted(owned['jobs'])
+        if not job_ids:
+            continue
+        conn = get_db_connection()
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"""
+                    UPDATE jobs SET updated_at = NOW()
+                    WHERE id IN ({', '.join(['%s'] * len(job_ids))}) AND active_key IS NOT NULL
+                """, job_ids)
+                conn.commit()
+            except Error:
+                conn.rollback()
+            cursor.close()
+            conn.close()
+
+def update_job(job_id, status=None, progress=None, message=None):
+    """Record a job's status or progress; False if it had already ended (or on error)"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE jobs
+                SET status = COALESCE(%s, status),
+                    progress = COALESCE(%s, progress),
+                    message = COALESCE(%s, message),
+                    started_at = IF(%s = 'running', NOW(), started_at),
+                    finished_at = IF(%s IN ('done', 'failed'), NOW(), finished_at),
+                    active_key = IF(%s IN ('done', 'failed'), NULL, active_key),
+                    updated_at = NOW()
+                WHERE id = %s AND status NOT IN ('done', 'failed')
+            """, (status, progress, message, status, status, status, job_id))
+            conn.commit()
+            updated = cursor.rowcount > 0
+        except Error:
+            conn.rollback()
+            updated = False
+        cursor.close()
+        conn.close()
+        return updated
+    return False
+
+def run_job(job_id, job_type, params):
+    """Execute a queued job in a worker thread and record its outcome"""
+    try:
+        if not update_job(job_id, status='running'):
+            return  # released as stale while it waited; not run twice
+        
+        def report_progress(done, total, rows_per_sec=None, eta_seconds=None):
+            message = f"{done}/{total}"
+            if rows_per_sec is not None:
+                message += f" | {rows_per_sec:.0f} rows/sec | ETA {eta_seconds:.0f}s"
+            update_job(job_id, progress=done / total if total else 1.0, message=message)
+        
+        started = time.perf_counter()
+        try:
+            result = JOB_HANDLERS[job_type](**params, on_progress=report_progress)
+        except Exception as e:
+            update_job(job_id, status='failed', message=str(e)[:255])
+            return
+        elapsed = time.perf_counter() - started
+        if result:
+            update_job(job_id, status='done', progress=1.0, message=f"Finished in {elapsed:.1f}s")
+        else:
+            update_job(job_id, status='failed', message="Job reported failure")
+    finally:
+        owned = get_owned_jobs()
+        with owned['lock']:
+            owned['jobs'].discard(job_id)
+
+@outside_unit_of_work()
+def submit_job(job_type, **params):
+    """Queue a background job.
+
+    Returns (job_id, created); when an identical job is already queued or
+    running its id is returned with created False. Returns None on error.
+    """
+    params_json = json.dumps(params, sort_keys=True)
+    dedup_params = {name: params[name] for name in JOB_DEDUP_PARAMS.get(job_type, params)}
+    active_key = f"{job_type}:{json.dumps(dedup_params, sort_keys=True)}"
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            # Release jobs whose process stopped sending heartbeats (e.g. the server restarted)
+            cursor.execute("""
+                UPDATE jobs SET status = 'failed', active_key = NULL, message = 'Stale job abandoned'
+                WHERE active_key = %s AND updated_at < NOW() - INTERVAL %s SECOND
+            """, (active_key, JOB_STALE_SECONDS))
+            try:
+                cursor.execute("""
+                    INSERT INTO jobs (job_type, params, active_key)
+                    VALUES (%s, %s, %s)
+                """, (job_type, params_json, active_key))
+                job_id, created = cursor.lastrowid, True
+            except mysql.connector.IntegrityError:
+                cursor.execute("SELECT id FROM jobs WHERE active_key = %s", (active_key,))
+                job_id, created = cursor.fetchone()[0], False
+            conn.commit()
+            cursor.close()
+            conn.close()
+        except Error as e:
+            st.error(f"Error submitting job: {e}")
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return None
+        if created:
+            owned = get_owned_jobs()
+            with owned['lock']:
+                owned['jobs'].add(job_id)
+            get_job_executor().submit(run_job, job_id, job_type, params)
+        return job_id, created
+    return None
+
+def get_recent_jobs(limit=10):
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, job_type, params, status, ROUND(progress * 100) AS progress_pct, message,
+                   created_at, TIMESTAMPDIFF(SECOND, started_at, COALESCE(finished_at, NOW())) AS duration_s
+            FROM jobs
+            ORDER BY id DESC
+            LIMIT %s
+        """, (limit,))
+        jobs = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return jobs
+    return []
+
+@st.fragment(run_every=3)
+def show_job_panel():
+    """Job list that refreshes itself without rerunning the whole page"""
+    jobs = get_recent_jobs()
+    if not jobs:
+        st.caption("No background jobs yet.")
+        return
+    for job in jobs:
+        if job['status'] in ('queued', 'running'):
+            st.progress(job['progress_pct'] / 100, text=f"#{job['id']} {job['job_type']} {job['params']} ({job['status']})")
+    st.dataframe(pd.DataFrame(jobs), use_container_width=True)
+
+def report_submitted_job(submitted, label):
+    if submitted is None:
+        st.error(f"Failed to start {label}")
+    elif submitted[1]:
+        st.success(f"{label} started as job #{submitted[0]}")
+    else:
+        st.info(f"{label} is already running as job #{submitted[0]}")
+
+JOB_HANDLERS = {
+    'semester_results': generate_semester_results,
+    'regrade': run_bulk_regrade,
+    'marksheets': generate_marksheets,
+}
+
+# Parameters that identify a job for de-duplication (default: all of them)
+JOB_DEDUP_PARAMS = {
+    'semester_results': ('semester',),
+    'marksheets': ('semester',),
+    # One regrade at a time: they share the checkpoint row
+    'regrade': (),
+}
+
+# Spreadsheet Marks Entry
+# A course roster can be exported as a CSV template that carries each row's
+# marks version. The filled file is diffed against the current marks column by
+# column, and only rows whose marks changed are saved in one batch through
+# save_course_marks, so rows changed by someone else since the export are
+# skipped rather than overwritten.
+MARKS_TEMPLATE_COLUMNS = ['roll_no', 'name', 'marks', 'version']
+
+def marks_template_csv(students):
+    """Roster CSV to fill in; marks not entered yet are left blank"""
+    frame = pd.DataFrame(students, columns=MARKS_TEMPLATE_COLUMNS)
+    frame['marks'] = frame['marks'].astype(float).where(frame['version'] > 0)
+    return frame.to_csv(index=False)
+
+def diff_marks_sheet(course_id, students, sheet_file):
+    """Compare a filled marks template with the current roster.
+
+    Returns (changes, problems). changes has one row per changed mark with
+    the current and new marks, the new grade and grade point, and whether the
+    row changed since the template was exported (stale). problems lists sheet
+    rows that cannot be applied. Blank marks are left unchanged. Raises
+    ValueError if the file is not a marks template.
+    """
+    sheet = pd.read_csv(sheet_file, dtype=str, keep_default_na=False)
+    missing = {'roll_no', 'marks', 'version'} - set(sheet.columns)
+    if missing:
+        raise ValueError(f"missing column(s) {', '.join(sorted(missing))}")
+    sheet['roll_no'] = sheet['roll_no'].str.strip()
+    sheet['new_marks'] = pd.to_numeric(sheet['marks'].str.strip(), errors='coerce').round(2)
+    sheet['sheet_version'] = pd.to_numeric(sheet['version'].str.strip(), errors='coerce')
+    
+    current = pd.DataFrame(students, columns=['roll_no', 'name', 'marks', 'version'])
+    current['marks'] = current['marks'].astype(float).where(current['version'] > 0)
+    
+    problem = pd.Series(None, index=sheet.index, dtype=object)
+    blank = sheet['marks'].str.strip() == ''
+    problem[~sheet['roll_no'].isin(current['roll_no'])] = "not enrolled in this course"
+    problem[problem.isna() & sheet['roll_no'].duplicated(keep=False)] = "duplicate roll number"
+    problem[problem.isna() & ~blank & ~sheet['new_marks'].between(0, 100)] = "marks must be 0-100"
+    problem[problem.isna() & ~blank & (sheet['sheet_version'] != sheet['sheet_version'].round())] = "invalid version"
+    problems = sheet.loc[problem.notna(), ['roll_no', 'marks']].assign(problem=problem.dropna())
+    
+    merged = current.merge(sheet.loc[problem.isna() & ~blank, ['roll_no', 'new_marks', 'sheet_version']],
+                           on='roll_no')
+    changes = merged[(merged['version'] == 0) | (merged['new_marks'] != merged['marks'])].copy()
+    changes['stale'] = changes['sheet_version'] != changes['version']
+    changes['new_grade'], changes['new_grade_point'] = lookup_grade(
+        get_grading_scheme(course_id), changes['new_marks'].to_numpy()
+    )
+    return changes, problems
+
+# Concurrent Grading
+# Marks edits are saved with compare-and-set on marks.version instead of
+# locks. Each editor keeps the version and marks its edit started from; when
+# the row has been saved by someone else since, an untouched field follows the
+# new marks and an edited one is shown as a conflict to keep or discard.
+def marks_edit_base(student):
+    """(version, marks) that this session's edit of a student's marks started from"""
+    base_key = f"marks_base_{student['roll_no']}"
+    base = st.session_state.get(base_key)
+    if base and base[0] != student['version']:
+        edited = st.session_state.get(f"marks_{student['roll_no']}")
+        if edited is None or edited == float(base[1] or 0):
+            base = None
+            discard_marks_edit(student['roll_no'])
+    if base is None:
+        base = st.session_state[base_key] = (student['version'], student['marks'])
+    return base
+
+def discard_marks_edit(roll_no):
+    for key in (f"marks_base_{roll_no}", f"marks_{roll_no}"):
+        st.session_state.pop(key, None)
+
 # Streamlit UI
 def main():
     st.set_page_config(page_title="Exam Result Management System", layout="wide")
     
     # Initialize database
-    init_database()
+    try:
+        ensure_database()
+    except RuntimeError:
+        pass  # init_database has already shown the error
     
     # Session state
     if 'logged_in' not in st.session_state:
@@ -583,8 +2014,12 @@ def main():
                     st.write(f"Total Students: {len(students)}")
                     
                     # Display and update marks
+                    edits = []
                     for student in students:
-                        with st.expander(f"{student['roll_no']} - {student['name']}"):
+                        roll_no = student['roll_no']
+                        base_version, base_marks = marks_edit_base(student)
+                        conflict = student['version'] != base_version
+                        with st.expander(f"{roll_no} - {student['name']}", expanded=conflict):
                             col1, col2, col3 = st.columns([2, 2, 1])
                             
                             with col1:
@@ -596,24 +2031,95 @@ def main():
                                 st.write(f"**Current Marks:** {current_marks}")
                                 if student['grade']:
                                     st.write(f"**Grade:** {student['grade']} (GP: {student['grade_point']})")
+                                if conflict:
+                                    st.warning("Saved by someone else while you were editing")
                             
                             with col3:
                                 new_marks = st.number_input(
                                     "Update Marks",
                                     min_value=0.0,
                                     max_value=100.0,
-                                    value=float(current_marks),
-                                    key=f"marks_{student['roll_no']}"
+                                    value=float(base_marks or 0),
+                                    key=f"marks_{roll_no}"
                                 )
+                                if new_marks != float(base_marks or 0):
+                                    edits.append((roll_no, new_marks, base_version))
                                 
-                                if st.button("Update", key=f"btn_{student['roll_no']}"):
-                                    if update_student_marks(student['roll_no'], course_id, new_marks):
+                                if conflict:
+                                    if st.button("Keep mine", key=f"keep_{roll_no}"):
+                                        if update_student_marks(roll_no, course_id, new_marks, student['version']):
+                                            discard_marks_edit(roll_no)
+                                            st.rerun()
+                                    if st.button("Use theirs", key=f"theirs_{roll_no}"):
+                                        discard_marks_edit(roll_no)
+                                        st.rerun()
+                                elif st.button("Update", key=f"btn_{roll_no}"):
+                                    if update_student_marks(roll_no, course_id, new_marks, base_version):
+                                        discard_marks_edit(roll_no)
                                         st.success("Marks updated successfully!")
                                         st.rerun()
                                     else:
                                         st.error("Failed to update marks")
+                    
+                    if st.button("Save all changes", key=f"save_all_{course_id}", disabled=not edits):
+                        conflicts = save_course_marks(course_id, edits)
+                        if conflicts is not None:
+                            for roll_no, _, _ in edits:
+                                if roll_no not in conflicts:
+                                    discard_marks_edit(roll_no)
+                            if conflicts:
+                                st.warning(f"Saved {len(edits) - len(conflicts)} marks; {len(conflicts)} had been changed by someone else and were left for you to review.")
+                            else:
+                                st.rerun()
+                    
+                    st.markdown("#### 📄 Spreadsheet Entry")
+                    st.download_button(
+                        "Download marks template", marks_template_csv(students),
+                        file_name=f"marks_{course_id}.csv", mime="text/csv", key=f"marks_template_{course_id}"
+                    )
+                    sheet_file = st.file_uploader("Upload filled template", type=["csv"],
+                                                  key=f"marks_sheet_{course_id}")
+                    if sheet_file is not None:
+                        try:
+                            changes, problems = diff_marks_sheet(course_id, students, sheet_file)
+                        except ValueError as e:
+                            st.error(f"Could not read the marks sheet: {e}")
+                        else:
+                            if not problems.empty:
+                                st.warning(f"{len(problems)} row(s) will be ignored:")
+                                st.dataframe(problems, use_container_width=True, hide_index=True)
+                            stale = changes[changes['stale']]
+                            if not stale.empty:
+                                st.warning(f"{len(stale)} row(s) were changed since this template was downloaded "
+                                           "and will be skipped; download a fresh template to edit them.")
+                            ready = changes[~changes['stale']]
+                            if ready.empty:
+                                st.info("No marks to change in this sheet.")
+                            else:
+                                st.write(f"**{len(ready)} change(s) to apply:**")
+                                st.dataframe(
+                                    ready[['roll_no', 'name', 'marks', 'new_marks', 'new_grade', 'new_grade_point']],
+                                    use_container_width=True, hide_index=True
+                                )
+                                if st.button("Apply changes", key=f"apply_sheet_{course_id}"):
+                                    conflicts = save_course_marks(course_id, list(zip(
+                                        ready['roll_no'].tolist(), ready['new_marks'].tolist(),
+                                        ready['version'].tolist()
+                                    )))
+                                    if conflicts:
+                                        st.warning(f"Saved {len(ready) - len(conflicts)} marks; {len(conflicts)} had been changed by someone else and were skipped.")
+                                    elif conflicts is not None:
+                                        st.rerun()
                 else:
                     st.info("No students enrolled in this course.")
+                
+                st.markdown("---")
+                st.subheader("🏆 Course Rank List")
+                rank_list = get_course_rank_list(course_id)
+                if rank_list.num_rows:
+                    st.dataframe(rank_list, use_container_width=True)
+                else:
+                    st.info("No marks entered yet.")
         else:
             st.info("You are not assigned to any courses yet.")
     
@@ -633,7 +2139,7 @@ def main():
         
         st.markdown("---")
         
-        tabs = st.tabs(["➕ Add Data", "👥 View Students", "📚 View Courses", "📊 Generate Results"])
+        tabs = st.tabs(["➕ Add Data", "👥 View Students", "📚 View Courses", "📊 Generate Results", "🎚️ Grading Schemes"])
         
         # Add Data Tab
         with tabs[0]:
@@ -706,36 +2212,35 @@ def main():
             
             with add_tab[3]:
                 st.subheader("Enroll Student in Course")
-                students = get_all_students()
-                courses = get_all_courses()
+                col1, col2 = st.columns(2)
+                with col1:
+                    enroll_student_match = search_picker(
+                        "Student", search_students,
+                        lambda s: f"{s['roll_no']} - {s['name']}",
+                        key="enroll_student",
+                        placeholder="Roll number or name prefix"
+                    )
                 
-                if students and courses:
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        student_options = {f"{s['roll_no']} - {s['name']}": s['roll_no'] for s in students}
-                        selected_student = st.selectbox("Select Student", list(student_options.keys()))
-                        enroll_roll_no = student_options[selected_student]
-                    
-                    with col2:
-                        course_options = {f"{c['course_id']} - {c['course_name']}": c['course_id'] for c in courses}
-                        selected_course = st.selectbox("Select Course", list(course_options.keys()))
-                        enroll_course_id = course_options[selected_course]
-                    
-                    if st.button("Enroll Student"):
-                        if enroll_student(enroll_roll_no, enroll_course_id):
-                            st.success("Student enrolled successfully!")
-                        else:
-                            st.error("Failed to enroll student")
-                else:
-                    st.warning("Please add students and courses first.")
+                with col2:
+                    enroll_course_match = search_picker(
+                        "Course", search_courses,
+                        lambda c: f"{c['course_id']} - {c['course_name']}",
+                        key="enroll_course",
+                        placeholder="Course ID or name prefix"
+                    )
+                
+                if st.button("Enroll Student", disabled=enroll_student_match is None or enroll_course_match is None):
+                    if enroll_student(enroll_student_match['roll_no'], enroll_course_match['course_id']):
+                        st.success("Student enrolled successfully!")
+                    else:
+                        st.error("Failed to enroll student")
         
         # View Students Tab
         with tabs[1]:
             st.subheader("All Students")
             students = get_all_students()
-            if students:
-                df = pd.DataFrame(students)
-                st.dataframe(df, use_container_width=True)
+            if students.num_rows:
+                st.dataframe(students, use_container_width=True)
             else:
                 st.info("No students found.")
         
@@ -752,38 +2257,116 @@ def main():
         # Generate Results Tab
         with tabs[3]:
             st.subheader("Generate Semester Results")
-            result_semester = st.number_input("Select Semester", min_value=1, max_value=8, value=1, key="result_sem")
+            col1, col2 = st.columns(2)
+            with col1:
+                result_semester = st.number_input("Select Semester", min_value=1, max_value=8, value=1, key="result_sem")
+            with col2:
+                result_workers = st.number_input(
+                    "Worker processes", min_value=1, max_value=os.cpu_count() or 1, value=1, key="result_workers"
+                )
             
             if st.button("Generate Results"):
-                if generate_semester_results(result_semester):
-                    st.success(f"Results generated successfully for Semester {result_semester}!")
-                else:
-                    st.error("Failed to generate results")
+                report_submitted_job(
+                    submit_job('semester_results', semester=int(result_semester), workers=int(result_workers)),
+                    f"Result generation for Semester {result_semester}"
+                )
+            
+            st.markdown("#### Background Jobs")
+            show_job_panel()
             
             st.markdown("---")
             st.subheader("View Semester Results")
-            view_semester = st.number_input("Select Semester", min_value=1, max_value=8, value=1, key="view_sem")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                view_semester = st.number_input("Select Semester", min_value=1, max_value=8, value=1, key="view_sem")
+            with col2:
+                view_department = st.text_input("Department (blank for all)", key="view_dept")
+            with col3:
+                view_top_n = st.number_input("Top N (0 for all)", min_value=0, value=0, step=1, key="view_top_n")
             
             if st.button("View Results"):
-                conn = get_db_connection()
-                if conn:
-                    cursor = conn.cursor(dictionary=True)
-                    cursor.execute("""
-                        SELECT s.roll_no, s.name, s.department, sr.sgpa, sr.cgpa, sr.result_date
-                        FROM semester_results sr
-                        JOIN students s ON sr.roll_no = s.roll_no
-                        WHERE sr.semester = %s
-                        ORDER BY sr.sgpa DESC
-                    """, (view_semester,))
-                    results = cursor.fetchall()
-                    cursor.close()
-                    conn.close()
-                    
-                    if results:
-                        df = pd.DataFrame(results)
-                        st.dataframe(df, use_container_width=True)
+                results = get_semester_merit_list(
+                    view_semester,
+                    view_department.strip() or None,
+                    int(view_top_n) or None
+                )
+                
+                if results.num_rows:
+                    st.dataframe(results, use_container_width=True)
+                else:
+                    st.info(f"No results available for Semester {view_semester}")
+            
+            st.markdown("---")
+            st.subheader("Marksheets")
+            col1, col2 = st.columns(2)
+            with col1:
+                marksheet_semester = st.number_input("Select Semester", min_value=1, max_value=8, value=1, key="marksheet_sem")
+            with col2:
+                marksheet_workers = st.number_input(
+                    "Worker processes", min_value=1, max_value=os.cpu_count() or 1, value=1, key="marksheet_workers"
+                )
+            
+            if st.button("Generate Marksheets"):
+                report_submitted_job(
+                    submit_job('marksheets', semester=int(marksheet_semester), workers=int(marksheet_workers)),
+                    f"Marksheets for Semester {marksheet_semester}"
+                )
+            
+            archive_path = marksheet_path(int(marksheet_semester))
+            if os.path.exists(archive_path):
+                with open(archive_path, 'rb') as archive:
+                    st.download_button(
+                        f"Download Semester {marksheet_semester} marksheets",
+                        archive,
+                        file_name=os.path.basename(archive_path),
+                        mime="application/zip"
+                    )
+        
+        # Grading Schemes Tab
+        with tabs[4]:
+            st.subheader("Grading Schemes")
+            courses = get_all_courses()
+            scheme_options = {"Default (all courses)": None}
+            scheme_options.update({f"{c['course_id']} - {c['course_name']}": c['course_id'] for c in courses})
+            selected_scheme = st.selectbox("Scheme for", list(scheme_options.keys()))
+            scheme_course_id = scheme_options[selected_scheme]
+            
+            scheme = get_grading_scheme(scheme_course_id)
+            bands_df = pd.DataFrame(scheme['bands'], columns=['min_marks', 'grade', 'grade_point'])
+            edited_bands = st.data_editor(
+                bands_df,
+                num_rows="dynamic",
+                use_container_width=True,
+                key=f"bands_{scheme_course_id}"
+            )
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Save Scheme"):
+                    bands = [tuple(row) for row in edited_bands.dropna().itertuples(index=False)]
+                    problem = grade_band_problem(bands)
+                    if not problem:
+                        if save_grading_scheme(scheme_course_id, bands):
+                            st.success("Grading scheme saved!")
+                        else:
+                            st.error("Failed to save grading scheme")
                     else:
-                        st.info(f"No results available for Semester {view_semester}")
+                        st.warning(problem)
+            with col2:
+                if scheme_course_id is not None and st.button("Use Default Scheme"):
+                    if delete_grading_scheme(scheme_course_id):
+                        st.success("Course now uses the default scheme")
+            
+            st.markdown("---")
+            st.subheader("Bulk Regrade")
+            st.caption("Recompute every stored grade after a scheme change. "
+                       "An interrupted run resumes from its last checkpoint.")
+            restart_regrade = st.checkbox("Start over instead of resuming")
+            if st.button("Regrade All Marks"):
+                report_submitted_job(submit_job('regrade', restart=restart_regrade), "Bulk regrade")
+            st.caption("Regenerate semester results afterwards to update SGPA/CGPA. "
+                       "Progress is shown under Background Jobs in the Generate Results tab.")
 
 if __name__ == "__main__":
-    main()
+    with unit_of_work():
+        main()
@@ -1,66 +1,683 @@
 import streamlit as st
 import mysql.connector
-from mysql.connector import Error
-import pandas as pd
+from mysql.connector import Error, PoolError, pooling
+import numpy as np
+import pyarrow as pa
+import collections
 import hashlib
+import hmac
+import contextlib
+import contextvars
+import importlib.util
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 
+# Lazy Imports
+# pandas and Parquet support are only needed once a table view, the analytics
+# cube or the term archive is used, so they are loaded on first attribute
+# access instead of on every worker's cold start.
+def lazy_import(name):
+    """Return the named module, deferring its execution until first use"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+pd = lazy_import('pandas')
+pq = lazy_import('pyarrow.parquet')
+
 # Database Configuration
 import os
 
-# Try to get from Streamlit secrets first, then environment variables, then defaults
-try:
-    DB_CONFIG = {
-        'host': st.secrets.get('DB_HOST', os.getenv('DB_HOST', 'maglev.proxy.rlwy.net')),
-        'user': st.secrets.get('DB_USER', os.getenv('DB_USER', 'root')),
-        'password': st.secrets.get('DB_PASSWORD', os.getenv('DB_PASSWORD', 'QDKLFUFZbcSMkpSnmpXVynQJvvEXNHnO')),
-        'database': st.secrets.get('DB_NAME', os.getenv('DB_NAME', 'railway')),
-        'port': int(st.secrets.get('DB_PORT', os.getenv('DB_PORT', 47232)))
-    }
-except:
-    DB_CONFIG = {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'user': os.getenv('DB_USER', 'root'),
-        'password': os.getenv('DB_PASSWORD', 'root'),
-        'database': os.getenv('DB_NAME', 'exam_management'),
-        'port': int(os.getenv('DB_PORT', 3306))
-    }
+# Secrets are read on the first connection of the process, not at import time.
+@st.cache_resource(show_spinner=False)
+def get_db_config():
+    # Try to get from Streamlit secrets first, then environment variables, then defaults
+    try:
+        return {
+            'host': st.secrets.get('DB_HOST', os.getenv('DB_HOST', 'maglev.proxy.rlwy.net')),
+            'user': st.secrets.get('DB_USER', os.getenv('DB_USER', 'root')),
+            'password': st.secrets.get('DB_PASSWORD', os.getenv('DB_PASSWORD', 'QDKLFUFZbcSMkpSnmpXVynQJvvEXNHnO')),
+            'database': st.secrets.get('DB_NAME', os.getenv('DB_NAME', 'railway')),
+            'port': int(st.secrets.get('DB_PORT', os.getenv('DB_PORT', 47232)))
+        }
+    except:
+        return {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'user': os.getenv('DB_USER', 'root'),
+            'password': os.getenv('DB_PASSWORD', 'root'),
+            'database': os.getenv('DB_NAME', 'exam_management'),
+            'port': int(os.getenv('DB_PORT', 3306))
+        }
+
+# Tenants
+# One deployment can host several institutions, each in a database of its own
+# so one college's results day does not load the others. Tenants are listed in
+# a [tenants] table of the Streamlit secrets (or a DB_TENANTS JSON object),
+# mapping a tenant name to the connection settings that differ from the config
+# above, e.g. {"college_a": {"database": "college_a"}}. Without one, that
+# config is the only tenant. The tenant a rerun, job or fan-out worker runs for
+# is held in a context variable, and connections, pools and caches follow it.
+DEFAULT_TENANT = 'default'
+_active_tenant = contextvars.ContextVar('active_tenant', default=None)
+
+@st.cache_resource(show_spinner=False)
+def get_tenant_configs():
+    """Connection config of every tenant; the first one is the home tenant"""
+    base = get_db_config()
+    try:
+        tenants = {name: dict(settings) for name, settings in st.secrets['tenants'].items()}
+    except (KeyError, FileNotFoundError):
+        tenants = json.loads(os.getenv('DB_TENANTS', '{}'))
+    if not tenants:
+        return {DEFAULT_TENANT: base}
+    for name in tenants:
+        # Tenant names become pool names and archive directories
+        if not re.fullmatch(r'[A-Za-z0-9_]{1,40}', name):
+            raise ValueError(f"Invalid tenant name: {name!r}")
+    return {name: {**base, **settings} for name, settings in tenants.items()}
+
+def get_tenants():
+    return list(get_tenant_configs())
+
+def current_tenant():
+    return _active_tenant.get() or get_tenants()[0]
+
+def get_tenant_config():
+    return get_tenant_configs()[current_tenant()]
+
+@contextlib.contextmanager
+def tenant_scope(tenant):
+    """Route the connections and caches used inside to tenant (None: home tenant)"""
+    if tenant is not None and tenant not in get_tenant_configs():
+        raise ValueError(f"Unknown tenant: {tenant}")
+    token = _active_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _active_tenant.reset(token)
+
+def session_tenant():
+    """Tenant of this session's user, or None before login"""
+    tenant = st.session_state.get('tenant')
+    if tenant is not None and tenant not in get_tenant_configs():
+        st.session_state.clear()  # the tenant is no longer configured; log out
+        return None
+    return tenant
 
 # Grading System - Pure Functions
-def calculate_grade(score, total_marks):
+# A grading scheme is stored as data: bands of (min_percentage, letter_grade,
+# is_pass). Schemes are compiled once into sorted threshold arrays so a grade
+# is found by binary search, for a single score or a whole array at once.
+DEFAULT_GRADE_BANDS = [
+    (90, 'A', True),
+    (80, 'B', True),
+    (70, 'C', True),
+    (60, 'D', True),
+    (0, 'F', False),
+]
+
+def compile_grading_scheme(bands):
+    """Compile (min_percentage, letter_grade, is_pass) bands into lookup arrays"""
+    ordered = sorted(bands, key=lambda band: float(band[0]))
+    return {
+        'bands': ordered[::-1],
+        'cutoffs': np.array([float(band[0]) for band in ordered]),
+        'grades': np.array([band[1] for band in ordered], dtype=object),
+        'statuses': np.array(['Pass' if band[2] else 'Fail' for band in ordered], dtype=object),
+    }
+
+def lookup_grade(scheme, percentage):
+    """Return (letter_grade, status) for a percentage, or arrays of them for an array"""
+    band = np.maximum(np.searchsorted(scheme['cutoffs'], percentage, side='right') - 1, 0)
+    return scheme['grades'][band], scheme['statuses'][band]
+
+def grade_band_problem(bands):
+    """Why bands cannot be saved as a scheme, or None if they can.
+
+    lookup_grade puts anything below the lowest cutoff into the lowest band,
+    so the bands must start at 0 for every score to land in the right one.
+    """
+    cutoffs = [float(band[0]) for band in bands]
+    if not cutoffs:
+        return "A scheme needs at least one band"
+    if len(set(cutoffs)) != len(cutoffs):
+        return "Each band needs a unique minimum percentage"
+    if min(cutoffs) != 0:
+        return "The lowest band must start at 0 percent"
+    return None
+
+DEFAULT_GRADING_SCHEME = compile_grading_scheme(DEFAULT_GRADE_BANDS)
+
+def calculate_grade(score, total_marks, scheme=DEFAULT_GRADING_SCHEME):
     """Calculate letter grade based on percentage"""
     if total_marks == 0 or score is None:
-        return 'F'
+        return scheme['grades'][0]
     percentage = (score / total_marks) * 100
-    if percentage >= 90:
-        return 'A'
-    elif percentage >= 80:
-        return 'B'
-    elif percentage >= 70:
-        return 'C'
-    elif percentage >= 60:
-        return 'D'
-    else:
-        return 'F'
+    return lookup_grade(scheme, percentage)[0]
+
+def calculate_grades(scores, total_marks, scheme=DEFAULT_GRADING_SCHEME):
+    """Vectorized calculate_grade returning (letter_grades, statuses) arrays"""
+    scores = np.asarray(scores, dtype=float)
+    total_marks = np.asarray(total_marks, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = np.where(total_marks > 0, scores / total_marks * 100, -np.inf)
+    return lookup_grade(scheme, np.nan_to_num(percentages, nan=-np.inf))
 
 def determine_pass_fail(grade):
     """Determine pass/fail status based on grade"""
     return 'Pass' if grade in ['A', 'B', 'C', 'D'] else 'Fail'
 
+# Relative (curve-based) grading. Cutoffs are ascending lower bounds for
+# D, C, B and A; anything below the first cutoff is an F.
+GRADING_MODES = ['absolute', 'zscore', 'percentile']
+CURVE_GRADES = np.array(['F', 'D', 'C', 'B', 'A'])
+ZSCORE_CUTOFFS = np.array([-1.0, -0.3, 0.3, 1.0])
+PERCENTILE_CUTOFFS = np.array([15.0, 40.0, 70.0, 90.0])
+
+def calculate_curve_grades(scores, mode):
+    """Assign letter grades to an array of scores relative to each other.
+
+    'zscore' bands on standard deviations from the mean; 'percentile' bands on
+    the share of the class scoring at or below each score.
+    """
+    scores = np.asarray(scores, dtype=float)
+    if scores.size == 0:
+        return np.array([], dtype=CURVE_GRADES.dtype)
+    if mode == 'zscore':
+        std = scores.std()
+        z = (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+        return CURVE_GRADES[np.searchsorted(ZSCORE_CUTOFFS, z, side='right')]
+    if mode == 'percentile':
+        ordered = np.sort(scores)
+        percentile = 100.0 * np.searchsorted(ordered, scores, side='right') / scores.size
+        return CURVE_GRADES[np.searchsorted(PERCENTILE_CUTOFFS, percentile, side='left')]
+    raise ValueError(f"Unknown grading mode: {mode}")
+
+def curve_statuses(grades, scheme):
+    """Pass/Fail for curve letter grades, from the scheme's band with the same letter.
+
+    Letters the scheme has no band for take their status from the default scheme.
+    """
+    statuses = dict(zip(DEFAULT_GRADING_SCHEME['grades'], DEFAULT_GRADING_SCHEME['statuses']))
+    statuses.update(zip(scheme['grades'], scheme['statuses']))
+    return [statuses[grade] for grade in grades]
+
 # Database Connection
-def get_db_connection():
+# Connections come from a process-wide pool per tenant that does not reset
+# sessions on return, so server-side prepared statements stay allocated between checkouts.
+# A returned connection rolls back instead, so no read snapshot or lock
+# outlives the call that opened it.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+
+class PooledConnection(pooling.PooledMySQLConnection):
+    def close(self):
+        if self._cnx is None:
+            return
+        try:
+            if self._cnx.in_transaction:
+                self._cnx.rollback()
+        except Error:
+            pass  # a broken connection is reconnected on its next checkout
+        finally:
+            super().close()
+
+class ConnectionPool(pooling.MySQLConnectionPool):
+    def get_connection(self):
+        return PooledConnection(self, super().get_connection()._cnx)
+
+@st.cache_resource(show_spinner=False)
+def get_connection_pool(tenant):
+    return ConnectionPool(
+        pool_name=f'exam_management_{tenant}',
+        pool_size=DB_POOL_SIZE,
+        pool_reset_session=False,
+        **get_tenant_configs()[tenant]
+    )
+
+def open_db_connection():
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        try:
+            conn = get_connection_pool(current_tenant()).get_connection()
+        except PoolError:
+            # Every pooled connection is checked out; fall back to a direct one
+            conn = mysql.connector.connect(**get_tenant_config())
         return conn
     except Error as e:
         st.error(f"Database connection error: {e}")
         return None
 
+def get_db_connection():
+    unit = _active_unit.get()
+    if unit is not None:
+        return unit.get_connection()
+    return open_db_connection()
+
+# Unit of Work
+# A Streamlit rerun runs inside one unit of work: the data-access functions it
+# calls share one connection and one transaction, which is committed when the
+# rerun ends (also on st.rerun/st.stop) and rolled back if it raises. Inside a
+# unit, commit() and close() on the shared connection are deferred to the unit,
+# while rollback() fails the whole unit: nothing it wrote is committed, later
+# writes included, so a multi-step action either lands completely or not at
+# all. A rerun that reaches into a second
+# tenant (a login) gets one connection per tenant. Job threads do not inherit
+# the unit.
+_active_unit = contextvars.ContextVar('active_unit', default=None)
+
+class UnitConnection:
+    """The unit's connection as handed to data-access functions"""
+    def __init__(self, connection, unit):
+        self.connection = connection
+        self.unit = unit
+    
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+    
+    def commit(self):
+        pass  # committed by the unit of work
+    
+    def rollback(self):
+        # Writes made earlier in the unit are gone, so the unit must not
+        # commit later ones or run their callbacks either
+        self.connection.rollback()
+        self.unit.failed = True
+    
+    def close(self):
+        pass  # closed by the unit of work
+
+class UnitOfWork:
+    def __init__(self):
+        self.connections = {}
+        self.after_commit = []
+        self.failed = False
+    
+    def get_connection(self):
+        # Opened on first use per tenant, so reruns that never query never
+        # check out one
+        tenant = current_tenant()
+        if tenant not in self.connections:
+            conn = open_db_connection()
+            if not conn:
+                return None
+            self.connections[tenant] = UnitConnection(conn, self)
+        return self.connections[tenant]
+    
+    def commit(self):
+        if not self.connections:
+            return
+        if self.failed:
+            for conn in self.connections.values():
+                conn.connection.rollback()
+            self.after_commit.clear()
+            st.error("Changes were not saved because part of this action failed.")
+            return
+        try:
+            for conn in self.connections.values():
+                conn.connection.commit()
+        except Error as e:
+            st.error(f"Error saving changes: {e}")
+            return
+        for callback in self.after_commit:
+            callback()
+    
+    def close(self):
+        for conn in self.connections.values():
+            conn.connection.close()
+
+@contextlib.contextmanager
+def unit_of_work():
+    """Share one connection and transaction between the calls made inside"""
+    if _active_unit.get() is not None:
+        yield _active_unit.get()  # nested units join the outer one
+        return
+    unit = UnitOfWork()
+    token = _active_unit.set(unit)
+    try:
+        yield unit
+    except Exception:
+        raise  # closing without a commit rolls the unit back
+    except BaseException:
+        unit.commit()  # st.rerun() and st.stop() end the script normally
+        raise
+    else:
+        unit.commit()
+    finally:
+        _active_unit.reset(token)
+        unit.close()
+
+@contextlib.contextmanager
+def outside_unit_of_work():
+    """Let the calls made inside use and commit connections of their own"""
+    token = _active_unit.set(None)
+    try:
+        yield
+    finally:
+        _active_unit.reset(token)
+
+def on_commit(callback):
+    """Run callback once the current writes are committed"""
+    unit = _active_unit.get()
+    if unit is None or not unit.connections:
+        callback()
+    else:
+        unit.after_commit.append(callback)
+
+# Prepared Statements
+# Hot queries run as server-side prepared statements with binary result rows.
+# Each connection caches one prepared cursor per statement, keyed by the SQL
+# with whitespace normalized, so a statement is parsed once per connection.
+STATEMENT_COUNTERS = {'prepared': 0, 'executed': 0}
+_statement_counters_lock = threading.Lock()
+
+def execute_prepared(conn, sql, params=(), dictionary=False):
+    """Execute sql as a cached prepared statement on conn.
+
+    The returned cursor belongs to the cache: read all of its rows and do not
+    close it.
+    """
+    if isinstance(conn, UnitConnection):
+        conn = conn.connection
+    cnx = conn._cnx if isinstance(conn, pooling.PooledMySQLConnection) else conn
+    cache = cnx.__dict__.setdefault('statement_cache', {})
+    key = (' '.join(sql.split()), dictionary)
+    entry = cache.get(key)
+    prepared = entry is None or entry[0] != cnx.connection_id
+    if prepared:
+        # The server forgets statements when the connection reconnects
+        entry = cache[key] = (cnx.connection_id, sql, cnx.cursor(prepared=True, dictionary=dictionary))
+    with _statement_counters_lock:
+        STATEMENT_COUNTERS['prepared'] += prepared
+        STATEMENT_COUNTERS['executed'] += 1
+    _, statement, cursor = entry
+    # Executing the cached string object lets the cursor skip re-preparing
+    cursor.execute(statement, params)
+    return cursor
+
+# Columnar Fetching
+# Large readers can skip the dict-per-row cursor: rows are read from a tuple
+# cursor in batches and packed straight into typed column arrays. Columns
+# marked 'category' keep each distinct value once plus an int32 code per row.
+FETCH_BATCH_SIZE = 10000
+
+def fetch_columns(cursor, dtypes, batch_size=FETCH_BATCH_SIZE):
+    """Build a DataFrame column by column from an executed tuple cursor.
+
+    dtypes maps column names to a NumPy dtype or 'category'; other columns are
+    kept as objects. Integer columns must not contain NULLs.
+    """
+    columns = [column[0] for column in cursor.description]
+    chunks = {name: [] for name in columns}
+    categories = {name: {} for name in columns if dtypes.get(name) == 'category'}
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for name, values in zip(columns, zip(*rows)):
+            if name in categories:
+                lookup = categories[name]
+                chunks[name].append(np.fromiter(
+                    (-1 if value is None else lookup.setdefault(value, len(lookup)) for value in values),
+                    dtype=np.int32, count=len(values)
+                ))
+            else:
+                chunks[name].append(np.array(values, dtype=dtypes.get(name, object)))
+    
+    data = {}
+    for name in columns:
+        if name in categories:
+            codes = np.concatenate(chunks[name]) if chunks[name] else np.array([], dtype=np.int32)
+            data[name] = pd.Categorical.from_codes(codes, categories=list(categories[name]))
+        elif chunks[name]:
+            data[name] = np.concatenate(chunks[name])
+        else:
+            data[name] = np.array([], dtype=dtypes.get(name, object))
+    return pd.DataFrame(data, columns=columns)
+
+def fetch_frame(query, params=(), dtypes=None, label="data"):
+    """Run a read query and return its rows as a compact DataFrame"""
+    conn = get_db_connection()
+    if conn:
+        try:
+            return fetch_columns(execute_prepared(conn, query, params), dtypes or {})
+        except Error as e:
+            st.error(f"Error fetching {label}: {e}")
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    return pd.DataFrame()
+
+# Display-only tables skip pandas entirely: each fetchmany batch becomes an
+# Arrow record batch that st.dataframe serializes without another conversion.
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+def fetch_arrow(cursor, schema, batch_size=FETCH_BATCH_SIZE):
+    """Build a pyarrow Table from an executed tuple cursor, one record batch per fetch.
+
+    schema lists the query's columns in order; values are cast to its types, so
+    DECIMAL columns may be read as floats and strings as CATEGORY.
+    """
+    batches = []
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batches.append(pa.RecordBatch.from_arrays(
+            [pa.array(values).cast(field.type) for field, values in zip(schema, zip(*rows))],
+            schema=schema
+        ))
+    return pa.Table.from_batches(batches, schema=schema).unify_dictionaries()
+
+def fetch_table(query, schema, params=(), label="data"):
+    """Run a read query and return its rows as a pyarrow Table"""
+    conn = get_db_connection()
+    if conn:
+        try:
+            return fetch_arrow(execute_prepared(conn, query, params), schema)
+        except Error as e:
+            st.error(f"Error fetching {label}: {e}")
+            return schema.empty_table()
+        finally:
+            conn.close()
+    return schema.empty_table()
+
 # Password hashing
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# Passwords are stored as salted PBKDF2-SHA256 hashes in the form
+# pbkdf2_sha256$iterations$salt$digest. Plain SHA-256 digests from before are
+# still accepted and replaced with a PBKDF2 hash on the next successful login.
+PASSWORD_SCHEME = 'pbkdf2_sha256'
+PASSWORD_ITERATIONS = int(os.getenv('PASSWORD_ITERATIONS', 600000))
+
+def hash_password(password, iterations=PASSWORD_ITERATIONS):
+    salt = os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), iterations).hex()
+    return f"{PASSWORD_SCHEME}${iterations}${salt}${digest}"
+
+def verify_password(password, stored_hash):
+    if stored_hash.startswith(PASSWORD_SCHEME + '$'):
+        _, iterations, salt, digest = stored_hash.split('$')
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), int(iterations)).hex()
+    else:
+        digest = stored_hash
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(candidate, digest)
+
+def password_needs_rehash(stored_hash):
+    return not stored_hash.startswith(f"{PASSWORD_SCHEME}${PASSWORD_ITERATIONS}$")
+
+# Stored procedures for admin writes. Each one runs its inserts under a
+# savepoint of the caller's transaction and selects a status row, so a write
+# costs one round trip and uniqueness is enforced by the table constraints
+# instead of pre-check SELECTs. The caller commits, which lets a procedure join
+# a unit of work. Procedures are tagged with PROCEDURE_VERSION and recreated
+# when it changes.
+PROCEDURE_VERSION = '3'
+
+STORED_PROCEDURES = {
+    'sp_add_student': """
+        CREATE PROCEDURE sp_add_student(
+            IN p_username VARCHAR(50), IN p_password_hash VARCHAR(255),
+            IN p_roll_number INT, IN p_name VARCHAR(100), IN p_date_of_birth DATE
+        )
+        COMMENT '{version}'
+        BEGIN
+            DECLARE v_message TEXT;
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                RESIGNAL;
+            END;
+            DECLARE EXIT HANDLER FOR 1062
+            BEGIN
+                GET DIAGNOSTICS CONDITION 1 v_message = MESSAGE_TEXT;
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                SELECT IF(v_message LIKE '%username%', 'duplicate_username', 'duplicate_roll_number') AS status;
+            END;
+            SAVEPOINT sp_status_procedure;
+            INSERT INTO USERS (username, password_hash, full_name, role)
+            VALUES (p_username, p_password_hash, p_name, 'student');
+            INSERT INTO STUDENT (roll_number, user_id, name, date_of_birth)
+            VALUES (p_roll_number, LAST_INSERT_ID(), p_name, p_date_of_birth);
+            INSERT INTO CHANGE_LOG (entity, entity_key, operation)
+            VALUES ('student', p_roll_number, 'insert');
+            RELEASE SAVEPOINT sp_status_procedure;
+            SELECT 'ok' AS status;
+        END
+    """,
+    'sp_add_teacher': """
+        CREATE PROCEDURE sp_add_teacher(
+            IN p_username VARCHAR(50), IN p_password_hash VARCHAR(255),
+            IN p_name VARCHAR(100), IN p_specialization VARCHAR(100)
+        )
+        COMMENT '{version}'
+        BEGIN
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                RESIGNAL;
+            END;
+            DECLARE EXIT HANDLER FOR 1062
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                SELECT 'duplicate_username' AS status;
+            END;
+            SAVEPOINT sp_status_procedure;
+            INSERT INTO USERS (username, password_hash, full_name, role)
+            VALUES (p_username, p_password_hash, p_name, 'teacher');
+            INSERT INTO TEACHER (name, user_id, specialization)
+            VALUES (p_name, LAST_INSERT_ID(), p_specialization);
+            INSERT INTO CHANGE_LOG (entity, entity_key, operation)
+            VALUES ('teacher', LAST_INSERT_ID(), 'insert');
+            RELEASE SAVEPOINT sp_status_procedure;
+            SELECT 'ok' AS status;
+        END
+    """,
+    'sp_add_course': """
+        CREATE PROCEDURE sp_add_course(
+            IN p_course_code VARCHAR(20), IN p_course_name VARCHAR(100), IN p_teacher_id INT
+        )
+        COMMENT '{version}'
+        BEGIN
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                RESIGNAL;
+            END;
+            DECLARE EXIT HANDLER FOR 1062
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                SELECT 'duplicate_course_code' AS status;
+            END;
+            SAVEPOINT sp_status_procedure;
+            INSERT INTO COURSE (course_code, course_name, teacher_id)
+            VALUES (p_course_code, p_course_name, p_teacher_id);
+            INSERT INTO CHANGE_LOG (entity, entity_key, operation)
+            VALUES ('course', LAST_INSERT_ID(), 'insert');
+            RELEASE SAVEPOINT sp_status_procedure;
+            SELECT 'ok' AS status;
+        END
+    """,
+    'sp_enroll_student': """
+        CREATE PROCEDURE sp_enroll_student(IN p_roll_number INT, IN p_course_id INT)
+        COMMENT '{version}'
+        BEGIN
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                RESIGNAL;
+            END;
+            DECLARE EXIT HANDLER FOR 1062
+            BEGIN
+                ROLLBACK TO SAVEPOINT sp_status_procedure;
+                SELECT 'duplicate_enrollment' AS status;
+            END;
+            SAVEPOINT sp_status_procedure;
+            INSERT INTO ENROLLMENT (roll_number, course_id)
+            VALUES (p_roll_number, p_course_id);
+            INSERT INTO CHANGE_LOG (entity, entity_key, operation, payload)
+            VALUES ('enrollment', LAST_INSERT_ID(), 'insert',
+                    JSON_OBJECT('roll_number', p_roll_number, 'course_id', p_course_id));
+            RELEASE SAVEPOINT sp_status_procedure;
+            SELECT 'ok' AS status;
+        END
+    """,
+}
+
+PROCEDURE_STATUS_MESSAGES = {
+    'duplicate_username': "Username already exists!",
+    'duplicate_roll_number': "Roll number already exists!",
+    'duplicate_course_code': "Course code already exists!",
+    'duplicate_enrollment': "Student is already enrolled in this course!",
+}
+
+def call_status_procedure(cursor, name, args):
+    """Call a stored procedure and return the status it selects"""
+    cursor.callproc(name, args)
+    status = None
+    for result in cursor.stored_results():
+        row = result.fetchone()
+        if row and status is None:
+            status = row[0]
+    return status
+
+def report_procedure_status(status):
+    """Show the error for a failed procedure status; True when it succeeded"""
+    if status == 'ok':
+        return True
+    st.error(PROCEDURE_STATUS_MESSAGES.get(status, f"Unexpected status: {status}"))
+    return False
+
+def ensure_index(cursor, table, index_name, columns):
+    """Create a secondary index unless it already exists"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index_name))
+    if not cursor.fetchone():
+        cursor.execute(f"CREATE INDEX {index_name} ON {table} ({columns})")
+
+def ensure_column(cursor, table, column, definition):
+    """Add a column unless it already exists"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    if not cursor.fetchone():
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
 # Initialize Database
+@outside_unit_of_work()
 def init_database():
     conn = get_db_connection()
     if conn:
@@ -117,6 +734,7 @@ def init_database():
                     course_id INT NOT NULL,
                     exam_title VARCHAR(100) NOT NULL,
                     total_marks INT NOT NULL,
+                    term VARCHAR(7) NOT NULL,
                     FOREIGN KEY (course_id) REFERENCES COURSE(course_id) ON DELETE CASCADE
                 )
             """)
@@ -140,21 +758,185 @@ def init_database():
                     exam_id INT NOT NULL,
                     roll_number INT NOT NULL,
                     score_obtained FLOAT,
+                    letter_grade VARCHAR(2),
+                    status VARCHAR(10),
+                    version INT NOT NULL DEFAULT 1,
                     FOREIGN KEY (exam_id) REFERENCES EXAM(exam_id) ON DELETE CASCADE,
                     FOREIGN KEY (roll_number) REFERENCES STUDENT(roll_number) ON DELETE CASCADE
                 )
             """)
             
-            # Create EXAM_RESULT table
+            # Create GRADING_SCHEME table (course_id NULL is the default scheme)
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS EXAM_RESULT (
-                    result_id INT AUTO_INCREMENT PRIMARY KEY,
-                    attempt_id INT UNIQUE NOT NULL,
+                CREATE TABLE IF NOT EXISTS GRADING_SCHEME (
+                    scheme_id INT AUTO_INCREMENT PRIMARY KEY,
+                    course_id INT UNIQUE,
+                    FOREIGN KEY (course_id) REFERENCES COURSE(course_id) ON DELETE CASCADE
+                )
+            """)
+            
+            # Create GRADING_BAND table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS GRADING_BAND (
+                    scheme_id INT NOT NULL,
+                    min_percentage FLOAT NOT NULL,
                     letter_grade VARCHAR(2) NOT NULL,
-                    status VARCHAR(10) NOT NULL,
-                    FOREIGN KEY (attempt_id) REFERENCES EXAM_ATTEMPT(attempt_id) ON DELETE CASCADE
+                    is_pass BOOLEAN NOT NULL,
+                    PRIMARY KEY (scheme_id, min_percentage),
+                    FOREIGN KEY (scheme_id) REFERENCES GRADING_SCHEME(scheme_id) ON DELETE CASCADE
+                )
+            """)
+            
+            # Create EXAM_GRADING table (exams without a row are graded absolutely)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS EXAM_GRADING (
+                    exam_id INT PRIMARY KEY,
+                    grading_mode ENUM('absolute', 'zscore', 'percentile') NOT NULL DEFAULT 'absolute',
+                    FOREIGN KEY (exam_id) REFERENCES EXAM(exam_id) ON DELETE CASCADE
+                )
+            """)
+            
+            # Results are stored on EXAM_ATTEMPT (written with the score, so
+            # readers need no extra join). Databases created with a separate
+            # EXAM_RESULT table have it folded in, and EXAM_RESULT becomes a
+            # compatibility view. The old table is kept as EXAM_RESULT_LEGACY
+            # (not dropped), so the migration can be undone; load_test.py
+            # --bench-results-layout compares the two layouts.
+            ensure_column(cursor, 'EXAM_ATTEMPT', 'letter_grade', 'VARCHAR(2)')
+            ensure_column(cursor, 'EXAM_ATTEMPT', 'status', 'VARCHAR(10)')
+            ensure_index(cursor, 'EXAM_ATTEMPT', 'idx_attempt_exam_grade', 'exam_id, letter_grade')
+            
+            # Score edits are compare-and-set on a per-attempt version
+            ensure_column(cursor, 'EXAM_ATTEMPT', 'version', 'INT NOT NULL DEFAULT 1')
+            cursor.execute("""
+                SELECT TABLE_TYPE FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'EXAM_RESULT'
+            """)
+            result_table = cursor.fetchone()
+            if result_table and result_table[0] == 'BASE TABLE':
+                cursor.execute("""
+                    UPDATE EXAM_ATTEMPT ea
+                    JOIN EXAM_RESULT er ON ea.attempt_id = er.attempt_id
+                    SET ea.letter_grade = er.letter_grade, ea.status = er.status
+                """)
+                cursor.execute("RENAME TABLE EXAM_RESULT TO EXAM_RESULT_LEGACY")
+            cursor.execute("""
+                CREATE OR REPLACE VIEW EXAM_RESULT AS
+                SELECT attempt_id, letter_grade, status
+                FROM EXAM_ATTEMPT
+                WHERE letter_grade IS NOT NULL
+            """)
+            
+            # Create missing or outdated stored procedures
+            cursor.execute("""
+                SELECT ROUTINE_NAME, ROUTINE_COMMENT FROM information_schema.ROUTINES
+                WHERE ROUTINE_SCHEMA = DATABASE() AND ROUTINE_TYPE = 'PROCEDURE'
+            """)
+            existing = dict(cursor.fetchall())
+            for name, ddl in STORED_PROCEDURES.items():
+                if existing.get(name) != PROCEDURE_VERSION:
+                    cursor.execute(f"DROP PROCEDURE IF EXISTS {name}")
+                    cursor.execute(ddl.replace('{version}', PROCEDURE_VERSION))
+            
+            # Create CHANGE_LOG table (append-only feed of data changes)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS CHANGE_LOG (
+                    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    entity VARCHAR(30) NOT NULL,
+                    entity_key VARCHAR(100) NOT NULL,
+                    operation VARCHAR(20) NOT NULL,
+                    payload JSON,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Create JOB table (background jobs)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS JOB (
+                    job_id INT AUTO_INCREMENT PRIMARY KEY,
+                    job_type VARCHAR(50) NOT NULL,
+                    params TEXT NOT NULL,
+                    active_key VARCHAR(255) UNIQUE,
+                    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+                    progress FLOAT NOT NULL DEFAULT 0,
+                    message VARCHAR(255),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP NULL,
+                    finished_at TIMESTAMP NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Create REGRADE_CHECKPOINT table (one row per unfinished regrade job)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS REGRADE_CHECKPOINT (
+                    job_name VARCHAR(50) PRIMARY KEY,
+                    last_attempt_id INT NOT NULL,
+                    rows_done INT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Covering index for the login lookup
+            ensure_index(cursor, 'USERS', 'idx_users_login', 'username, role, password_hash, full_name')
+            
+            # Indexes for type-ahead search
+            ensure_index(cursor, 'STUDENT', 'idx_student_name', 'name')
+            ensure_index(cursor, 'COURSE', 'idx_course_name', 'course_name')
+            
+            # Academic terms (exams created before terms existed join the current one)
+            ensure_column(cursor, 'EXAM', 'term', f"VARCHAR(7) NOT NULL DEFAULT '{academic_term()}'")
+            ensure_index(cursor, 'EXAM', 'idx_exam_term', 'term')
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS TERM_ARCHIVE (
+                    term VARCHAR(7) PRIMARY KEY,
+                    exams INT NOT NULL,
+                    attempts INT NOT NULL,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Scanner score imports and their staging rows
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS SCORE_IMPORT (
+                    import_id INT AUTO_INCREMENT PRIMARY KEY,
+                    course_id INT NOT NULL,
+                    file_name VARCHAR(255) NOT NULL,
+                    total_rows INT,
+                    imported_rows INT,
+                    created_attempts INT,
+                    unmatched_rows INT,
+                    rows_per_sec FLOAT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP NULL,
+                    FOREIGN KEY (course_id) REFERENCES COURSE(course_id) ON DELETE CASCADE
+                )
+            """)
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS SCORE_IMPORT_ROW (
+                    import_id INT NOT NULL,
+                    row_no INT NOT NULL,
+                    exam_ref VARCHAR({IMPORT_REF_LENGTH}) NOT NULL,
+                    roll_ref VARCHAR({IMPORT_REF_LENGTH}) NOT NULL,
+                    score_ref VARCHAR({IMPORT_REF_LENGTH}) NOT NULL,
+                    exam_id INT NULL,
+                    roll_number INT NULL,
+                    score FLOAT NULL,
+                    problem VARCHAR(40) NULL,
+                    PRIMARY KEY (import_id, row_no)
                 )
             """)
+            ensure_index(cursor, 'EXAM_ATTEMPT', 'idx_attempt_exam_student', 'exam_id, roll_number')
+            
+            # Insert default grading scheme if not exists
+            cursor.execute("SELECT scheme_id FROM GRADING_SCHEME WHERE course_id IS NULL")
+            if not cursor.fetchone():
+                cursor.execute("INSERT INTO GRADING_SCHEME (course_id) VALUES (NULL)")
+                scheme_id = cursor.lastrowid
+                cursor.executemany("""
+                    INSERT INTO GRADING_BAND (scheme_id, min_percentage, letter_grade, is_pass)
+                    VALUES (%s, %s, %s, %s)
+                """, [(scheme_id, *band) for band in DEFAULT_GRADE_BANDS])
             
             # Insert default admin if not exists
             cursor.execute("SELECT * FROM USERS WHERE username = 'admin'")
@@ -166,6 +948,7 @@ def init_database():
                 """, (admin_pass,))
             
             conn.commit()
+            return True
         except Error as e:
             st.error(f"Error initializing database: {e}")
             conn.rollback()
@@ -173,25 +956,272 @@ def init_database():
             cursor.close()
             conn.close()
 
-# Authentication
-def authenticate(username, password, role):
+# Schema setup runs once per server process and tenant instead of on every
+# rerun. A failed attempt raises so it is not cached and the next rerun tries
+# again.
+@st.cache_resource(show_spinner=False)
+def ensure_database(tenant):
+    with tenant_scope(tenant):
+        if not init_database():
+            raise RuntimeError("Database initialization failed")
+    return True
+
+# Change Feed
+# Writes append a row to CHANGE_LOG on the same cursor, and so in the same
+# transaction, as the change itself. Derived data can then be refreshed
+# incrementally by reading the changes after the last sequence it processed.
+def record_change(cursor, entity, entity_key, operation, payload=None):
+    cursor.execute("""
+        INSERT INTO CHANGE_LOG (entity, entity_key, operation, payload)
+        VALUES (%s, %s, %s, %s)
+    """, (entity, str(entity_key), operation,
+          json.dumps(payload, default=str) if payload is not None else None))
+
+def get_changes_after(change_id, limit=1000, entities=None):
+    """Changes with a sequence number above change_id, oldest first.
+
+    Sequence numbers are allocated at insert time, so a slow concurrent
+    transaction can commit a lower number after a higher one has been read;
+    consumers that must not miss a change should re-read a small overlap.
+    """
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor(dictionary=True)
         try:
-            hashed_pass = hash_password(password)
+            entity_filter = ""
+            params = [change_id]
+            if entities:
+                entity_filter = f"AND entity IN ({', '.join(['%s'] * len(entities))})"
+                params.extend(entities)
+            cursor.execute(f"""
+                SELECT change_id, entity, entity_key, operation, payload, changed_at
+                FROM CHANGE_LOG
+                WHERE change_id > %s {entity_filter}
+                ORDER BY change_id
+                LIMIT %s
+            """, (*params, limit))
+            changes = cursor.fetchall()
+            for change in changes:
+                if change['payload'] is not None:
+                    change['payload'] = json.loads(change['payload'])
+            return changes
+        except Error as e:
+            st.error(f"Error fetching changes: {e}")
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    return []
+
+def get_latest_change_id():
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM CHANGE_LOG")
+            return cursor.fetchone()[0]
+        except Error as e:
+            st.error(f"Error fetching latest change: {e}")
+            return 0
+        finally:
+            cursor.close()
+            conn.close()
+    return 0
+
+# Grading Scheme Functions
+@st.cache_data(ttl=600, show_spinner=False)
+def load_grading_schemes(tenant):
+    """Load and compile every grading scheme, keyed by course_id (None is the default)"""
+    conn = mysql.connector.connect(**get_tenant_configs()[tenant])
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT gs.course_id, gb.min_percentage, gb.letter_grade, gb.is_pass
+            FROM GRADING_SCHEME gs
+            JOIN GRADING_BAND gb ON gs.scheme_id = gb.scheme_id
+        """)
+        bands = {}
+        for course_id, min_percentage, letter_grade, is_pass in cursor.fetchall():
+            bands.setdefault(course_id, []).append((min_percentage, letter_grade, bool(is_pass)))
+        return {course_id: compile_grading_scheme(course_bands)
+                for course_id, course_bands in bands.items()}
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_grading_scheme(course_id=None):
+    """Compiled grading scheme for a course, falling back to the default scheme"""
+    try:
+        schemes = load_grading_schemes(current_tenant())
+    except Error as e:
+        st.error(f"Error loading grading schemes: {e}")
+        return DEFAULT_GRADING_SCHEME
+    return schemes.get(course_id) or schemes.get(None) or DEFAULT_GRADING_SCHEME
+
+def save_grading_scheme(course_id, bands):
+    """Replace the bands of a course's scheme (course_id None saves the default)"""
+    problem = grade_band_problem(bands)
+    if problem:
+        st.error(problem)
+        return False
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
             cursor.execute("""
-                SELECT * FROM USERS WHERE username = %s AND password_hash = %s AND role = %s
-            """, (username, hashed_pass, role))
-            user = cursor.fetchone()
-            return user
+                SELECT scheme_id FROM GRADING_SCHEME WHERE course_id <=> %s
+            """, (course_id,))
+            row = cursor.fetchone()
+            if row:
+                scheme_id = row[0]
+                cursor.execute("DELETE FROM GRADING_BAND WHERE scheme_id = %s", (scheme_id,))
+            else:
+                cursor.execute("INSERT INTO GRADING_SCHEME (course_id) VALUES (%s)", (course_id,))
+                scheme_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO GRADING_BAND (scheme_id, min_percentage, letter_grade, is_pass)
+                VALUES (%s, %s, %s, %s)
+            """, [(scheme_id, float(min_percentage), letter_grade, bool(is_pass))
+                  for min_percentage, letter_grade, is_pass in bands])
+            record_change(cursor, 'grading_scheme', course_id, 'update')
+            conn.commit()
+            on_commit(load_grading_schemes.clear)
+            return True
+        except Error as e:
+            st.error(f"Error saving grading scheme: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+def delete_grading_scheme(course_id):
+    """Remove a course's own scheme so it falls back to the default"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM GRADING_SCHEME WHERE course_id = %s", (course_id,))
+            record_change(cursor, 'grading_scheme', course_id, 'delete')
+            conn.commit()
+            on_commit(load_grading_schemes.clear)
+            return True
         except Error as e:
-            st.error(f"Authentication error: {e}")
+            st.error(f"Error deleting grading scheme: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+# Authentication
+# Logins read credentials through a bounded cache per tenant keyed by
+# username, so repeat logins and failed retries during a results-day surge do
+# not query USERS; unknown usernames are cached as well. Entries expire after
+# LOGIN_CACHE_TTL seconds and are dropped when the user is added or its hash is
+# upgraded. Password hashing runs in a small thread pool: a surge queues for
+# CPU there instead of every session computing a PBKDF2 hash at once.
+LOGIN_CACHE_SIZE = int(os.getenv('LOGIN_CACHE_SIZE', 10000))
+LOGIN_CACHE_TTL = int(os.getenv('LOGIN_CACHE_TTL', 300))
+PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', os.cpu_count() or 2))
+
+class CredentialCache:
+    MISSING = object()
+    
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, username):
+        """Cached USERS row (None for an unknown user), or MISSING"""
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is None or entry[0] < time.monotonic():
+                return self.MISSING
+            self.entries.move_to_end(username)
+            return entry[1]
+    
+    def put(self, username, user):
+        with self.lock:
+            self.entries[username] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, username):
+        with self.lock:
+            self.entries.pop(username, None)
+
+@st.cache_resource(show_spinner=False)
+def get_credential_cache(tenant):
+    return CredentialCache(LOGIN_CACHE_SIZE, LOGIN_CACHE_TTL)
+
+@st.cache_resource(show_spinner=False)
+def get_password_executor():
+    return ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix='password')
+
+def forget_credentials(username):
+    """Drop a user's cached credentials once the current writes commit"""
+    tenant = current_tenant()
+    on_commit(lambda: get_credential_cache(tenant).invalidate(username))
+
+def authenticate(username, password, role, tenant=None):
+    """Check a login against the users of tenant (None: the home tenant).
+
+    The returned user records its tenant, which the session then runs in.
+    """
+    with tenant_scope(tenant):
+        cache = get_credential_cache(current_tenant())
+        user = cache.get(username)
+        if user is CredentialCache.MISSING:
+            conn = get_db_connection()
+            if not conn:
+                return None
+            try:
+                # idx_users_login covers the lookup, so no clustered row is read
+                cursor = execute_prepared(conn, """
+                    SELECT user_id, username, password_hash, full_name, role
+                    FROM USERS FORCE INDEX (idx_users_login) WHERE username = %s
+                """, (username,), dictionary=True)
+                user = cursor.fetchone()
+            except Error as e:
+                st.error(f"Authentication error: {e}")
+                return None
+            finally:
+                conn.close()
+            cache.put(username, user)
+        
+        if user is None or user['role'] != role:
+            return None
+        password_hash = user['password_hash']
+        if not get_password_executor().submit(verify_password, password, password_hash).result():
             return None
+        if password_needs_rehash(password_hash):
+            upgrade_password_hash(user['user_id'], username, password)
+        user = {key: value for key, value in user.items() if key != 'password_hash'}
+        user['tenant'] = current_tenant()
+        return user
+
+@outside_unit_of_work()
+def upgrade_password_hash(user_id, username, password):
+    """Store a current PBKDF2 hash for a user who logged in with an old one"""
+    password_hash = get_password_executor().submit(hash_password, password).result()
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE USERS SET password_hash = %s WHERE user_id = %s", (password_hash, user_id))
+            conn.commit()
+            forget_credentials(username)
+        except Error:
+            conn.rollback()  # the old hash keeps working; retried on the next login
         finally:
             cursor.close()
             conn.close()
-    return None
 
 # Student Functions
 def get_student_by_user_id(user_id):
@@ -238,33 +1268,28 @@ def get_student_enrollments(roll_number):
             conn.close()
     return []
 
+STUDENT_EXAM_ATTEMPTS_FRAME_DTYPES = {
+    'attempt_id': 'int64',
+    'score_obtained': 'float32',
+    'total_marks': 'float32',
+    'course_code': 'category',
+    'course_name': 'category',
+    'letter_grade': 'category',
+    'status': 'category',
+}
+
 def get_student_exam_attempts(roll_number):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        try:
-            cursor.execute("""
-                SELECT ea.*, e.exam_title, e.total_marks, 
-                       c.course_code, c.course_name,
-                       er.letter_grade, er.status
-                FROM EXAM_ATTEMPT ea
-                JOIN EXAM e ON ea.exam_id = e.exam_id
-                JOIN COURSE c ON e.course_id = c.course_id
-                LEFT JOIN EXAM_RESULT er ON ea.attempt_id = er.attempt_id
-                WHERE ea.roll_number = %s
-                ORDER BY ea.attempt_id DESC
-            """, (roll_number,))
-            attempts = cursor.fetchall()
-            return attempts
-        except Error as e:
-            st.error(f"Error fetching exam attempts: {e}")
-            return []
-        finally:
-            cursor.close()
-            conn.close()
-    return []
+    """Get a student's exam attempts as a compact DataFrame"""
+    return fetch_frame("""
+        SELECT ea.attempt_id, e.exam_title, c.course_code, c.course_name,
+               ea.score_obtained, e.total_marks, ea.letter_grade, ea.status
+        FROM EXAM_ATTEMPT ea
+        JOIN EXAM e ON ea.exam_id = e.exam_id
+        JOIN COURSE c ON e.course_id = c.course_id
+        WHERE ea.roll_number = %s
+        ORDER BY ea.attempt_id DESC
+    """, (roll_number,), STUDENT_EXAM_ATTEMPTS_FRAME_DTYPES, "exam attempts")
 
-# Teacher Functions
 def get_teacher_by_user_id(user_id):
     conn = get_db_connection()
     if conn:
@@ -325,73 +1350,383 @@ def get_course_exams(course_id):
 def get_exam_attempts(exam_id):
     conn = get_db_connection()
     if conn:
-        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("""
-                SELECT ea.*, s.roll_number, s.name, e.total_marks,
-                       er.letter_grade, er.status
+            cursor = execute_prepared(conn, """
+                SELECT ea.*, s.name, e.total_marks
                 FROM EXAM_ATTEMPT ea
                 JOIN STUDENT s ON ea.roll_number = s.roll_number
                 JOIN EXAM e ON ea.exam_id = e.exam_id
-                LEFT JOIN EXAM_RESULT er ON ea.attempt_id = er.attempt_id
                 WHERE ea.exam_id = %s
                 ORDER BY s.name
-            """, (exam_id,))
+            """, (exam_id,), dictionary=True)
             attempts = cursor.fetchall()
             return attempts
         except Error as e:
             st.error(f"Error fetching exam attempts: {e}")
             return []
         finally:
-            cursor.close()
             conn.close()
     return []
 
-def update_exam_attempt_and_result(attempt_id, score, total_marks):
-    """Update exam attempt score and create/update result"""
+def get_exam_grading_mode(exam_id):
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor()
         try:
-            # Update score
-            cursor.execute("""
-                UPDATE EXAM_ATTEMPT 
-                SET score_obtained = %s
-                WHERE attempt_id = %s
-            """, (score, attempt_id))
-            
-            # Calculate grade and status
-            letter_grade = calculate_grade(score, total_marks)
-            status = determine_pass_fail(letter_grade)
-            
-            # Insert or update result
             cursor.execute("""
-                INSERT INTO EXAM_RESULT (attempt_id, letter_grade, status)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    letter_grade = VALUES(letter_grade), status = VALUES(status)
-            """, (attempt_id, letter_grade, status))
-            
-            conn.commit()
-            return True
+                SELECT grading_mode FROM EXAM_GRADING WHERE exam_id = %s
+            """, (exam_id,))
+            row = cursor.fetchone()
+            return row[0] if row else 'absolute'
         except Error as e:
-            st.error(f"Error updating attempt: {e}")
-            conn.rollback()
-            return False
+            st.error(f"Error fetching grading mode: {e}")
+            return 'absolute'
         finally:
             cursor.close()
             conn.close()
-    return False
+    return 'absolute'
 
-def create_exam(course_id, exam_title, total_marks):
+ATTEMPT_UPDATE_BATCH_SIZE = 1000
+
+def stage_attempt_updates(cursor, rows):
+    """Load (attempt_id, score_obtained, letter_grade, status) rows into a temporary table.
+
+    ATTEMPT_UPDATE belongs to the connection's session. Rows are inserted in
+    fixed-size batches so no statement grows with the exam; the caller then
+    applies the table with one UPDATE ... JOIN.
+    """
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS ATTEMPT_UPDATE")
+    cursor.execute("""
+        CREATE TEMPORARY TABLE ATTEMPT_UPDATE (
+            attempt_id INT PRIMARY KEY,
+            score_obtained FLOAT,
+            letter_grade VARCHAR(2),
+            status VARCHAR(10)
+        )
+    """)
+    for start in range(0, len(rows), ATTEMPT_UPDATE_BATCH_SIZE):
+        cursor.executemany("""
+            INSERT INTO ATTEMPT_UPDATE (attempt_id, score_obtained, letter_grade, status)
+            VALUES (%s, %s, %s, %s)
+        """, rows[start:start + ATTEMPT_UPDATE_BATCH_SIZE])
+
+def write_attempt_grades(cursor, results):
+    """Store (attempt_id, letter_grade, status) rows on EXAM_ATTEMPT in one UPDATE"""
+    if not results:
+        return
+    stage_attempt_updates(cursor, [(attempt_id, None, grade, status) for attempt_id, grade, status in results])
+    cursor.execute("""
+        UPDATE EXAM_ATTEMPT ea
+        JOIN ATTEMPT_UPDATE r ON ea.attempt_id = r.attempt_id
+        SET ea.letter_grade = r.letter_grade, ea.status = r.status
+    """)
+
+def regrade_exam(cursor, exam_id, mode):
+    """Recompute the result of every graded attempt of an exam.
+
+    Loads the exam's scores in one query, grades them as an array and writes
+    all results back in one batched update, on the caller's transaction.
+    """
+    cursor.execute("""
+        SELECT ea.attempt_id, ea.score_obtained, e.total_marks, e.course_id
+        FROM EXAM_ATTEMPT ea
+        JOIN EXAM e ON ea.exam_id = e.exam_id
+        WHERE ea.exam_id = %s AND ea.score_obtained IS NOT NULL
+    """, (exam_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+    attempt_ids = [row[0] for row in rows]
+    scores = [row[1] for row in rows]
+    scheme = get_grading_scheme(rows[0][3])
+    if mode == 'absolute':
+        grades, statuses = calculate_grades(scores, rows[0][2], scheme)
+    else:
+        grades = calculate_curve_grades(scores, mode).tolist()
+        statuses = curve_statuses(grades, scheme)
+    write_attempt_grades(cursor, list(zip(attempt_ids, grades, statuses)))
+    return len(rows)
+
+def set_exam_grading_mode(exam_id, mode):
+    """Switch an exam between absolute and curve grading and regrade it"""
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor()
         try:
             cursor.execute("""
-                INSERT INTO EXAM (course_id, exam_title, total_marks)
-                VALUES (%s, %s, %s)
-            """, (course_id, exam_title, total_marks))
+                INSERT INTO EXAM_GRADING (exam_id, grading_mode)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE grading_mode = VALUES(grading_mode)
+            """, (exam_id, mode))
+            regrade_exam(cursor, exam_id, mode)
+            record_change(cursor, 'exam', exam_id, 'regrade', {'grading_mode': mode})
+            conn.commit()
+            on_commit(fetch_rank_list.clear)
+            return True
+        except Error as e:
+            st.error(f"Error setting grading mode: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+def update_exam_attempt_and_result(attempt_id, score, total_marks, expected_version=None):
+    """Update exam attempt score and create/update result.
+
+    With expected_version the score is only written if the attempt is still
+    at that version, so an edit never overwrites one saved after it was
+    loaded; a conflict is reported and False returned.
+    """
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            attempt = execute_prepared(conn, """
+                SELECT ea.exam_id, e.course_id, COALESCE(g.grading_mode, 'absolute')
+                FROM EXAM_ATTEMPT ea
+                JOIN EXAM e ON ea.exam_id = e.exam_id
+                LEFT JOIN EXAM_GRADING g ON ea.exam_id = g.exam_id
+                WHERE ea.attempt_id = %s
+            """, (attempt_id,)).fetchone()
+            if attempt is None:
+                st.warning("This attempt no longer exists (it may have been archived).")
+                return False
+            exam_id, course_id, mode = attempt
+            
+            if mode != 'absolute':
+                updated = execute_prepared(conn, """
+                    UPDATE EXAM_ATTEMPT 
+                    SET score_obtained = %s, version = version + 1
+                    WHERE attempt_id = %s AND version = COALESCE(%s, version)
+                """, (score, attempt_id, expected_version))
+            else:
+                # Calculate grade and status
+                scheme = get_grading_scheme(course_id)
+                letter_grade, status = calculate_grades(score, total_marks, scheme)
+                
+                # Update score and result together
+                updated = execute_prepared(conn, """
+                    UPDATE EXAM_ATTEMPT 
+                    SET score_obtained = %s, letter_grade = %s, status = %s, version = version + 1
+                    WHERE attempt_id = %s AND version = COALESCE(%s, version)
+                """, (score, letter_grade, status, attempt_id, expected_version))
+            if updated.rowcount == 0:
+                st.warning("This score was changed by someone else since you loaded it.")
+                return False
+            if mode != 'absolute':
+                # Curve grades depend on every score, so regrade the whole exam
+                regrade_exam(cursor, exam_id, mode)
+                record_change(cursor, 'exam', exam_id, 'regrade', {'grading_mode': mode})
+            
+            record_change(cursor, 'exam_attempt', attempt_id, 'update',
+                          {'exam_id': exam_id, 'score_obtained': score})
+            conn.commit()
+            on_commit(fetch_rank_list.clear)
+            return True
+        except Error as e:
+            st.error(f"Error updating attempt: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+@outside_unit_of_work()
+def save_attempt_scores(exam_id, edits):
+    """Save several score edits of one exam, each compare-and-set on its version.
+
+    edits holds (attempt_id, score, expected_version) tuples. The current
+    versions are checked in one locking read and every edit that still
+    matches is written in one UPDATE. The save commits on a connection of its
+    own, outside the rerun's unit of work, so the row locks are released as
+    soon as it returns. Returns the attempt_ids that had changed and were
+    left alone, or None on error.
+    """
+    if not edits:
+        return []
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT e.course_id, e.total_marks, COALESCE(g.grading_mode, 'absolute')
+                FROM EXAM e
+                LEFT JOIN EXAM_GRADING g ON e.exam_id = g.exam_id
+                WHERE e.exam_id = %s
+            """, (exam_id,))
+            exam = cursor.fetchone()
+            if exam is None:
+                st.warning("This exam no longer exists (it may have been archived).")
+                return None
+            course_id, total_marks, mode = exam
+            
+            placeholders = ", ".join(["%s"] * len(edits))
+            cursor.execute(f"""
+                SELECT attempt_id, version FROM EXAM_ATTEMPT
+                WHERE exam_id = %s AND attempt_id IN ({placeholders})
+                FOR UPDATE
+            """, (exam_id, *[attempt_id for attempt_id, _, _ in edits]))
+            versions = dict(cursor.fetchall())
+            conflicts = [attempt_id for attempt_id, _, version in edits if versions.get(attempt_id) != version]
+            saved = [(attempt_id, score) for attempt_id, score, version in edits if versions.get(attempt_id) == version]
+            if not saved:
+                return conflicts
+            
+            scores = [score for _, score in saved]
+            if mode == 'absolute':
+                grades, statuses = calculate_grades(scores, total_marks, get_grading_scheme(course_id))
+            else:
+                grades = statuses = [None] * len(saved)
+            stage_attempt_updates(cursor, [(attempt_id, score, grade, status)
+                                           for (attempt_id, score), grade, status in zip(saved, grades, statuses)])
+            cursor.execute("""
+                UPDATE EXAM_ATTEMPT ea
+                JOIN ATTEMPT_UPDATE r ON ea.attempt_id = r.attempt_id
+                SET ea.score_obtained = r.score_obtained, ea.letter_grade = r.letter_grade,
+                    ea.status = r.status, ea.version = ea.version + 1
+            """)
+            if mode != 'absolute':
+                regrade_exam(cursor, exam_id, mode)
+                record_change(cursor, 'exam', exam_id, 'regrade', {'grading_mode': mode})
+            for attempt_id, score in saved:
+                record_change(cursor, 'exam_attempt', attempt_id, 'update',
+                              {'exam_id': exam_id, 'score_obtained': score})
+            conn.commit()
+            on_commit(fetch_rank_list.clear)
+            return conflicts
+        except Error as e:
+            st.error(f"Error saving scores: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+    return None
+
+REGRADE_CHUNK_SIZE = 1000
+
+def run_bulk_regrade(chunk_size=REGRADE_CHUNK_SIZE, restart=False, on_progress=None):
+    """Recompute every attempt's result, walking attempts in attempt_id chunks.
+
+    Each chunk is graded as an array, written with one batched update and
+    committed together with a checkpoint, so an interrupted run resumes after
+    the last committed chunk. on_progress is called after every chunk with
+    (rows_done, total_rows, rows_per_sec, eta_seconds). Curve-graded exams are
+    regraded whole at the end. Returns a summary dict, or None on error.
+    """
+    job_name = 'exam_results'
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            if restart:
+                cursor.execute("DELETE FROM REGRADE_CHECKPOINT WHERE job_name = %s", (job_name,))
+            cursor.execute("""
+                SELECT last_attempt_id, rows_done FROM REGRADE_CHECKPOINT WHERE job_name = %s
+            """, (job_name,))
+            checkpoint = cursor.fetchone()
+            last_attempt_id, rows_done = checkpoint if checkpoint else (0, 0)
+            
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM EXAM_ATTEMPT ea
+                LEFT JOIN EXAM_GRADING g ON ea.exam_id = g.exam_id
+                WHERE ea.attempt_id > %s AND ea.score_obtained IS NOT NULL
+                  AND COALESCE(g.grading_mode, 'absolute') = 'absolute'
+            """, (last_attempt_id,))
+            total_rows = rows_done + cursor.fetchone()[0]
+            
+            started = time.perf_counter()
+            processed = 0
+            while True:
+                cursor.execute("""
+                    SELECT ea.attempt_id, ea.score_obtained, e.total_marks, e.course_id
+                    FROM EXAM_ATTEMPT ea
+                    JOIN EXAM e ON ea.exam_id = e.exam_id
+                    LEFT JOIN EXAM_GRADING g ON ea.exam_id = g.exam_id
+                    WHERE ea.attempt_id > %s AND ea.score_obtained IS NOT NULL
+                      AND COALESCE(g.grading_mode, 'absolute') = 'absolute'
+                    ORDER BY ea.attempt_id
+                    LIMIT %s
+                """, (last_attempt_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                
+                attempt_ids = np.array([row[0] for row in rows])
+                scores = np.array([row[1] for row in rows], dtype=float)
+                totals = np.array([row[2] for row in rows], dtype=float)
+                course_ids = np.array([row[3] for row in rows])
+                grades = np.empty(len(rows), dtype=object)
+                statuses = np.empty(len(rows), dtype=object)
+                for course_id in np.unique(course_ids):
+                    in_course = course_ids == course_id
+                    grades[in_course], statuses[in_course] = calculate_grades(
+                        scores[in_course], totals[in_course], get_grading_scheme(int(course_id))
+                    )
+                
+                write_attempt_grades(cursor, list(zip(attempt_ids.tolist(), grades, statuses)))
+                
+                last_attempt_id = rows[-1][0]
+                rows_done += len(rows)
+                processed += len(rows)
+                cursor.execute("""
+                    INSERT INTO REGRADE_CHECKPOINT (job_name, last_attempt_id, rows_done)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE 
+                        last_attempt_id = VALUES(last_attempt_id), rows_done = VALUES(rows_done)
+                """, (job_name, last_attempt_id, rows_done))
+                record_change(cursor, 'exam_result', f"{rows[0][0]}-{last_attempt_id}", 'regrade',
+                              {'first_attempt_id': rows[0][0], 'last_attempt_id': last_attempt_id})
+                conn.commit()
+                
+                elapsed = time.perf_counter() - started
+                rows_per_sec = processed / elapsed if elapsed > 0 else 0.0
+                eta_seconds = (total_rows - rows_done) / rows_per_sec if rows_per_sec else 0.0
+                if on_progress:
+                    on_progress(rows_done, total_rows, rows_per_sec, eta_seconds)
+            
+            # Curve grades depend on the whole exam, so those exams are regraded as a unit
+            cursor.execute("""
+                SELECT exam_id, grading_mode FROM EXAM_GRADING WHERE grading_mode != 'absolute'
+            """)
+            for exam_id, mode in cursor.fetchall():
+                processed += regrade_exam(cursor, exam_id, mode)
+                record_change(cursor, 'exam', exam_id, 'regrade', {'grading_mode': mode})
+                conn.commit()
+            
+            cursor.execute("DELETE FROM REGRADE_CHECKPOINT WHERE job_name = %s", (job_name,))
+            conn.commit()
+            on_commit(fetch_rank_list.clear)
+            
+            elapsed = time.perf_counter() - started
+            return {
+                'rows': processed,
+                'seconds': round(elapsed, 2),
+                'rows_per_sec': round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+        except Error as e:
+            st.error(f"Error regrading results: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+    return None
+
+def create_exam(course_id, exam_title, total_marks):
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO EXAM (course_id, exam_title, total_marks, term)
+                VALUES (%s, %s, %s, %s)
+            """, (course_id, exam_title, total_marks, academic_term()))
+            record_change(cursor, 'exam', cursor.lastrowid, 'insert', {'course_id': course_id})
             conn.commit()
             return True
         except Error as e:
@@ -422,272 +1757,1336 @@ def create_exam_attempt(exam_id, roll_number):
                 INSERT INTO EXAM_ATTEMPT (exam_id, roll_number, score_obtained)
                 VALUES (%s, %s, NULL)
             """, (exam_id, roll_number))
+            record_change(cursor, 'exam_attempt', cursor.lastrowid, 'insert',
+                          {'exam_id': exam_id, 'roll_number': roll_number})
             conn.commit()
             return True
         except Error as e:
-            st.error(f"Error creating exam attempt: {e}")
-            conn.rollback()
-            return False
+            st.error(f"Error creating exam attempt: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+def create_exam_attempts_for_enrolled(exam_id):
+    """Create exam attempts for every enrolled student that lacks one.
+
+    Returns the number of attempts created, or None on error.
+    """
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO EXAM_ATTEMPT (exam_id, roll_number, score_obtained)
+                SELECT ex.exam_id, en.roll_number, NULL
+                FROM EXAM ex
+                JOIN ENROLLMENT en ON en.course_id = ex.course_id
+                LEFT JOIN EXAM_ATTEMPT ea
+                    ON ea.exam_id = ex.exam_id AND ea.roll_number = en.roll_number
+                WHERE ex.exam_id = %s AND ea.attempt_id IS NULL
+            """, (exam_id,))
+            created = cursor.rowcount
+            if created:
+                record_change(cursor, 'exam', exam_id, 'attempts_created', {'count': created})
+            conn.commit()
+            return created
+        except Error as e:
+            st.error(f"Error creating exam attempts: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+    return None
+
+# Admin Functions
+def add_student(username, password, roll_number, name, date_of_birth):
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            status = call_status_procedure(cursor, 'sp_add_student', (
+                username, hash_password(password), roll_number, name, date_of_birth
+            ))
+            if report_procedure_status(status):
+                conn.commit()
+                forget_credentials(username)
+                return True
+            # The procedure already rolled back to its savepoint
+            return False
+        except Error as e:
+            st.error(f"Error adding student: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+def add_teacher(username, password, name, specialization):
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            status = call_status_procedure(cursor, 'sp_add_teacher', (
+                username, hash_password(password), name, specialization
+            ))
+            if report_procedure_status(status):
+                conn.commit()
+                forget_credentials(username)
+                return True
+            # The procedure already rolled back to its savepoint
+            return False
+        except Error as e:
+            st.error(f"Error adding teacher: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+def add_course(course_code, course_name, teacher_id):
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            status = call_status_procedure(cursor, 'sp_add_course', (
+                course_code, course_name, teacher_id
+            ))
+            if report_procedure_status(status):
+                conn.commit()
+                return True
+            # The procedure already rolled back to its savepoint
+            return False
+        except Error as e:
+            st.error(f"Error adding course: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+def enroll_student(roll_number, course_id):
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            status = call_status_procedure(cursor, 'sp_enroll_student', (
+                roll_number, course_id
+            ))
+            if report_procedure_status(status):
+                conn.commit()
+                return True
+            # The procedure already rolled back to its savepoint
+            return False
+        except Error as e:
+            st.error(f"Error enrolling student: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+    return False
+
+def get_all_teachers():
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT t.teacher_id, t.name, t.specialization, 
+                       u.username, u.full_name
+                FROM TEACHER t
+                JOIN USERS u ON t.user_id = u.user_id
+                ORDER BY t.name
+            """)
+            teachers = cursor.fetchall()
+            return teachers
+        except Error as e:
+            st.error(f"Error fetching teachers: {e}")
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    return []
+
+ALL_STUDENTS_SCHEMA = pa.schema([
+    ('roll_number', pa.int32()),
+    ('name', pa.string()),
+    ('date_of_birth', pa.date32()),
+    ('username', pa.string()),
+    ('full_name', pa.string()),
+])
+
+def get_all_students():
+    """Get all students as a pyarrow Table"""
+    return fetch_table("""
+        SELECT s.roll_number, s.name, s.date_of_birth,
+               u.username, u.full_name
+        FROM STUDENT s
+        JOIN USERS u ON s.user_id = u.user_id
+        ORDER BY s.roll_number
+    """, schema=ALL_STUDENTS_SCHEMA, label="students")
+
+def get_all_courses():
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT c.*, t.name as teacher_name 
+                FROM COURSE c
+                LEFT JOIN TEACHER t ON c.teacher_id = t.teacher_id
+                ORDER BY c.course_code
+            """)
+            courses = cursor.fetchall()
+            return courses
+        except Error as e:
+            st.error(f"Error fetching courses: {e}")
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    return []
+
+ALL_RESULTS_SCHEMA = pa.schema([
+    ('roll_number', pa.int32()),
+    ('name', CATEGORY),
+    ('course_code', CATEGORY),
+    ('course_name', CATEGORY),
+    ('exam_title', CATEGORY),
+    ('score_obtained', pa.float32()),
+    ('total_marks', pa.int32()),
+    ('letter_grade', CATEGORY),
+    ('status', CATEGORY),
+])
+
+def get_all_results():
+    """Get all exam results as a pyarrow Table"""
+    return fetch_table("""
+        SELECT s.roll_number, s.name, c.course_code, c.course_name,
+               e.exam_title, ea.score_obtained, e.total_marks,
+               ea.letter_grade, ea.status
+        FROM EXAM_ATTEMPT ea
+        JOIN STUDENT s ON ea.roll_number = s.roll_number
+        JOIN EXAM e ON ea.exam_id = e.exam_id
+        JOIN COURSE c ON e.course_id = c.course_id
+        WHERE ea.letter_grade IS NOT NULL
+        ORDER BY s.roll_number, c.course_code
+    """, schema=ALL_RESULTS_SCHEMA, label="results")
+
+def get_enrolled_students(course_id):
+    """Get students enrolled in a specific course"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT s.roll_number, s.name
+                FROM ENROLLMENT e
+                JOIN STUDENT s ON e.roll_number = s.roll_number
+                WHERE e.course_id = %s
+                ORDER BY s.roll_number
+            """, (course_id,))
+            students = cursor.fetchall()
+            return students
+        except Error as e:
+            st.error(f"Error fetching enrolled students: {e}")
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    return []
+
+# Search Functions
+# Type-ahead search only ever loads the top matches for a typed prefix, using
+# index range scans, instead of every student or course on each rerun.
+SEARCH_LIMIT = 20
+MAX_INT_DIGITS = 10
+
+def like_prefix(text):
+    """LIKE pattern matching values that start with text"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def roll_number_prefix_ranges(prefix):
+    """Integer ranges holding every roll number whose digits start with prefix"""
+    if not prefix.isdigit() or int(prefix) == 0:
+        return []
+    ranges = []
+    for extra_digits in range(MAX_INT_DIGITS - len(prefix) + 1):
+        scale = 10 ** extra_digits
+        ranges.append((int(prefix) * scale, (int(prefix) + 1) * scale - 1))
+    return ranges
+
+def search_students(query, limit=SEARCH_LIMIT, course_id=None):
+    """Students whose roll number or name starts with query, optionally only those enrolled in a course"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            join, params = "", []
+            if course_id is not None:
+                join = "JOIN ENROLLMENT e ON e.roll_number = s.roll_number AND e.course_id = %s"
+                params.append(course_id)
+            conditions = []
+            if query:
+                conditions.append("s.name LIKE %s")
+                params.append(like_prefix(query))
+                for low, high in roll_number_prefix_ranges(query):
+                    conditions.append("s.roll_number BETWEEN %s AND %s")
+                    params.extend([low, high])
+            where = f"WHERE {' OR '.join(conditions)}" if conditions else ""
+            cursor.execute(f"""
+                SELECT s.roll_number, s.name
+                FROM STUDENT s
+                {join}
+                {where}
+                ORDER BY s.roll_number
+                LIMIT %s
+            """, (*params, limit))
+            return cursor.fetchall()
+        except Error as e:
+            st.error(f"Error searching students: {e}")
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    return []
+
+def search_courses(query, limit=SEARCH_LIMIT):
+    """Courses whose code or name starts with query"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            where, params = "", []
+            if query:
+                where = "WHERE course_code LIKE %s OR course_name LIKE %s"
+                params = [like_prefix(query), like_prefix(query)]
+            cursor.execute(f"""
+                SELECT course_id, course_code, course_name
+                FROM COURSE
+                {where}
+                ORDER BY course_code
+                LIMIT %s
+            """, (*params, limit))
+            return cursor.fetchall()
+        except Error as e:
+            st.error(f"Error searching courses: {e}")
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    return []
+
+def search_picker(label, search, format_option, key, placeholder="", **search_args):
+    """Type-ahead selectbox returning the chosen match, or None when nothing matches"""
+    query = st.text_input(f"Search {label}", key=f"{key}_query", placeholder=placeholder)
+    matches = search(query.strip(), **search_args)
+    if not matches:
+        st.caption(f"No matching {label.lower()}s")
+        return None
+    options = {format_option(match): match for match in matches}
+    selected = st.selectbox(f"Select {label}", list(options.keys()), key=f"{key}_select")
+    return options[selected]
+
+# Ranking Functions
+# Rank lists are computed with window functions and cached until the next
+# score update clears them, so repeated views of a published result set do
+# not re-run the ranking query.
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_rank_list(query, params, tenant):
+    """Run a ranking query; errors are raised so failures are never cached"""
+    conn = mysql.connector.connect(**get_tenant_configs()[tenant])
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_exam_rank_list(exam_id, top_n=None):
+    """Rank graded attempts of an exam by score with dense rank and percentile"""
+    try:
+        return fetch_rank_list("""
+            SELECT * FROM (
+                SELECT s.roll_number, s.name, ea.score_obtained, e.total_marks,
+                       ea.letter_grade, ea.status,
+                       DENSE_RANK() OVER (ORDER BY ea.score_obtained DESC) AS exam_rank,
+                       ROUND(100 * PERCENT_RANK() OVER (ORDER BY ea.score_obtained), 2) AS percentile
+                FROM EXAM_ATTEMPT ea
+                JOIN STUDENT s ON ea.roll_number = s.roll_number
+                JOIN EXAM e ON ea.exam_id = e.exam_id
+                WHERE ea.exam_id = %s AND ea.score_obtained IS NOT NULL
+            ) ranked
+            WHERE %s IS NULL OR exam_rank <= %s
+            ORDER BY exam_rank, roll_number
+        """, (exam_id, top_n, top_n), current_tenant())
+    except Error as e:
+        st.error(f"Error fetching exam rank list: {e}")
+        return []
+
+def get_course_rank_list(course_id, top_n=None):
+    """Rank students of a course by their overall percentage across its exams"""
+    try:
+        return fetch_rank_list("""
+            SELECT * FROM (
+                SELECT s.roll_number, s.name,
+                       SUM(ea.score_obtained) AS total_score,
+                       SUM(e.total_marks) AS total_marks,
+                       ROUND(100 * SUM(ea.score_obtained) / SUM(e.total_marks), 2) AS percentage,
+                       DENSE_RANK() OVER (
+                           ORDER BY SUM(ea.score_obtained) / SUM(e.total_marks) DESC
+                       ) AS course_rank,
+                       ROUND(100 * PERCENT_RANK() OVER (
+                           ORDER BY SUM(ea.score_obtained) / SUM(e.total_marks)
+                       ), 2) AS percentile
+                FROM EXAM_ATTEMPT ea
+                JOIN EXAM e ON ea.exam_id = e.exam_id
+                JOIN STUDENT s ON ea.roll_number = s.roll_number
+                WHERE e.course_id = %s AND ea.score_obtained IS NOT NULL
+                GROUP BY s.roll_number, s.name
+            ) ranked
+            WHERE %s IS NULL OR course_rank <= %s
+            ORDER BY course_rank, roll_number
+        """, (course_id, top_n, top_n), current_tenant())
+    except Error as e:
+        st.error(f"Error fetching course rank list: {e}")
+        return []
+
+# Results Analytics
+# All exam results are held in one shared, columnar pandas DataFrame with
+# categorical dimensions. It is loaded once per server process and then kept
+# current by reloading only the rows named in the change log, so slicing and
+# pivoting never goes back to MySQL.
+RESULTS_CUBE_QUERY = """
+    SELECT ea.attempt_id, ea.exam_id, s.roll_number, s.name, c.course_code, c.course_name,
+           e.exam_title, ea.score_obtained, e.total_marks, ea.letter_grade, ea.status
+    FROM EXAM_ATTEMPT ea
+    JOIN STUDENT s ON ea.roll_number = s.roll_number
+    JOIN EXAM e ON ea.exam_id = e.exam_id
+    JOIN COURSE c ON e.course_id = c.course_id
+    WHERE ea.letter_grade IS NOT NULL
+"""
+CUBE_DIMENSIONS = ['course_code', 'exam_title', 'letter_grade', 'status']
+CUBE_CATEGORICAL_COLUMNS = ['name', 'course_code', 'course_name', 'exam_title', 'letter_grade', 'status']
+CUBE_DTYPES = {
+    'attempt_id': 'int64',
+    'exam_id': 'int32',
+    'roll_number': 'int32',
+    'score_obtained': 'float32',
+    'total_marks': 'float32',
+    **{column: 'category' for column in CUBE_CATEGORICAL_COLUMNS},
+}
+CUBE_MAX_INCREMENTAL_CHANGES = 5000
+# Change ids below the last one applied that are read again on every refresh,
+# so a transaction that commits a lower id late is still picked up
+CUBE_CHANGE_OVERLAP = 200
+
+def fetch_results_frame(cursor, condition="", params=()):
+    """Load result rows into a DataFrame with compact numeric and categorical columns"""
+    cursor.execute(RESULTS_CUBE_QUERY + (f" AND ({condition})" if condition else ""), params)
+    frame = fetch_columns(cursor, CUBE_DTYPES)
+    frame['percentage'] = (frame['score_obtained'] / frame['total_marks'] * 100).round(2)
+    return frame
+
+def merge_categorical_frames(base, update):
+    """Concatenate two cube frames keeping categorical dtypes (union of categories)"""
+    for column in CUBE_CATEGORICAL_COLUMNS:
+        categories = base[column].cat.categories.union(update[column].cat.categories)
+        base[column] = base[column].cat.set_categories(categories)
+        update[column] = update[column].cat.set_categories(categories)
+    return pd.concat([base, update], ignore_index=True)
+
+@st.cache_resource
+def get_results_cube(tenant):
+    """Cube state shared by every session of this server process and tenant"""
+    return {'frame': None, 'change_id': 0, 'seen': set(), 'lock': threading.Lock()}
+
+@outside_unit_of_work()
+def refresh_results_cube():
+    """Bring the shared results cube up to date and return its DataFrame"""
+    cube = get_results_cube(current_tenant())
+    with cube['lock']:
+        changes = []
+        if cube['frame'] is not None:
+            changes = get_changes_after(
+                max(cube['change_id'] - CUBE_CHANGE_OVERLAP, 0),
+                limit=CUBE_CHANGE_OVERLAP + CUBE_MAX_INCREMENTAL_CHANGES + 1,
+                entities=['exam_attempt', 'exam', 'exam_result']
+            )
+            changes = [change for change in changes if change['change_id'] not in cube['seen']]
+            if not changes:
+                return cube['frame']
+        
+        conn = get_db_connection()
+        if not conn:
+            return cube['frame']
+        cursor = conn.cursor()
+        try:
+            if cube['frame'] is None or len(changes) > CUBE_MAX_INCREMENTAL_CHANGES:
+                # Changes committed by now are part of the reloaded frame
+                cursor.execute("""
+                    SELECT change_id FROM CHANGE_LOG ORDER BY change_id DESC LIMIT %s
+                """, (CUBE_CHANGE_OVERLAP,))
+                seen = [change_id for (change_id,) in cursor.fetchall()]
+                cube['frame'] = fetch_results_frame(cursor)
+                cube['change_id'] = seen[0] if seen else 0
+                cube['seen'] = set(seen)
+                return cube['frame']
+            
+            attempt_ids, exam_ids, attempt_ranges = set(), set(), []
+            for change in changes:
+                if change['entity'] == 'exam_attempt':
+                    attempt_ids.add(int(change['entity_key']))
+                elif change['entity'] == 'exam':
+                    exam_ids.add(int(change['entity_key']))
+                else:
+                    payload = change['payload']
+                    attempt_ranges.append((payload['first_attempt_id'], payload['last_attempt_id']))
+            
+            conditions, params = [], []
+            if attempt_ids:
+                conditions.append(f"ea.attempt_id IN ({', '.join(['%s'] * len(attempt_ids))})")
+                params.extend(attempt_ids)
+            if exam_ids:
+                conditions.append(f"ea.exam_id IN ({', '.join(['%s'] * len(exam_ids))})")
+                params.extend(exam_ids)
+            for first, last in attempt_ranges:
+                conditions.append("ea.attempt_id BETWEEN %s AND %s")
+                params.extend([first, last])
+            changed = fetch_results_frame(cursor, " OR ".join(conditions), params)
+            
+            frame = cube['frame']
+            stale = frame['attempt_id'].isin(attempt_ids) | frame['exam_id'].isin(exam_ids)
+            for first, last in attempt_ranges:
+                stale |= frame['attempt_id'].between(first, last)
+            cube['frame'] = merge_categorical_frames(frame[~stale].copy(), changed)
+            cube['change_id'] = max(cube['change_id'], changes[-1]['change_id'])
+            cube['seen'] = {
+                change_id for change_id in cube['seen'] | {change['change_id'] for change in changes}
+                if change_id > cube['change_id'] - CUBE_CHANGE_OVERLAP
+            }
+            return cube['frame']
+        except Error as e:
+            st.error(f"Error refreshing results analytics: {e}")
+            return cube['frame']
+        finally:
+            cursor.close()
+            conn.close()
+
+def query_results_cube(frame, filters=None, group_by=None, pivot_column=None, metric='count'):
+    """Filter the cube and aggregate it by dimensions.
+
+    metric is 'count', 'avg_percentage' or 'pass_rate'. With pivot_column the
+    result is a pivot table with that dimension across the columns.
+    """
+    if filters:
+        mask = np.ones(len(frame), dtype=bool)
+        for column, values in filters.items():
+            if values:
+                mask &= frame[column].isin(values).to_numpy()
+        frame = frame[mask]
+    
+    if metric == 'avg_percentage':
+        values = frame['percentage']
+    elif metric == 'pass_rate':
+        values = (frame['status'] == 'Pass').astype('float32') * 100
+    else:
+        values = pd.Series(1, index=frame.index, dtype='int32')
+    aggregate = 'sum' if metric == 'count' else 'mean'
+    
+    keys = list(group_by or [])
+    if pivot_column:
+        keys.append(pivot_column)
+    if not keys:
+        return pd.DataFrame({metric: [getattr(values, aggregate)()]})
+    
+    grouped = values.groupby([frame[key] for key in keys], observed=True).agg(aggregate).round(2)
+    if pivot_column and group_by:
+        return grouped.unstack(pivot_column)
+    return grouped.rename(metric).reset_index()
+
+# Academic Terms
+# Every exam belongs to an academic year such as "2025-26", starting in July.
+# A term that has ended can be archived: its attempts are written to a
+# compressed Parquet file and deleted from the live tables, so everyday queries
+# only cover terms still in use. Archived results stay readable, read-only.
+TERM_START_MONTH = 7
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+ARCHIVE_CHUNK_SIZE = 5000
+ARCHIVE_SCHEMA = pa.schema([
+    ('attempt_id', pa.int64()),
+    ('exam_id', pa.int32()),
+    ('term', CATEGORY),
+    ('roll_number', pa.int32()),
+    ('name', pa.string()),
+    ('course_code', CATEGORY),
+    ('course_name', CATEGORY),
+    ('exam_title', CATEGORY),
+    ('score_obtained', pa.float32()),
+    ('total_marks', pa.int32()),
+    ('letter_grade', CATEGORY),
+    ('status', CATEGORY),
+])
+
+def academic_term(day=None):
+    day = day or date.today()
+    start_year = day.year if day.month >= TERM_START_MONTH else day.year - 1
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+def archive_dir(term):
+    """Directory holding one Parquet file per archive run of a term"""
+    tenant = current_tenant()
+    base = ARCHIVE_DIR if tenant == DEFAULT_TENANT else os.path.join(ARCHIVE_DIR, tenant)
+    return os.path.join(base, f"exam_results_{term}")
+
+def get_term_summary():
+    """Live terms with their exam and attempt counts"""
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT e.term, COUNT(DISTINCT e.exam_id) AS exams, COUNT(ea.attempt_id) AS attempts
+                FROM EXAM e
+                LEFT JOIN EXAM_ATTEMPT ea ON ea.exam_id = e.exam_id
+                GROUP BY e.term
+                ORDER BY e.term
+            """)
+            return cursor.fetchall()
+        except Error as e:
+            st.error(f"Error fetching terms: {e}")
+            return []
         finally:
             cursor.close()
             conn.close()
-    return False
+    return []
 
-# Admin Functions
-def add_student(username, password, roll_number, name, date_of_birth):
+def get_archived_terms():
     conn = get_db_connection()
     if conn:
-        cursor = conn.cursor()
+        cursor = conn.cursor(dictionary=True)
         try:
-            # Check if username already exists
-            cursor.execute("SELECT user_id FROM USERS WHERE username = %s", (username,))
-            if cursor.fetchone():
-                st.error("Username already exists!")
-                return False
-                
-            # Check if roll number already exists
-            cursor.execute("SELECT roll_number FROM STUDENT WHERE roll_number = %s", (roll_number,))
-            if cursor.fetchone():
-                st.error("Roll number already exists!")
-                return False
-                
-            hashed_pass = hash_password(password)
-            cursor.execute("""
-                INSERT INTO USERS (username, password_hash, full_name, role)
-                VALUES (%s, %s, %s, 'student')
-            """, (username, hashed_pass, name))
-            user_id = cursor.lastrowid
-            
-            cursor.execute("""
-                INSERT INTO STUDENT (roll_number, user_id, name, date_of_birth)
-                VALUES (%s, %s, %s, %s)
-            """, (roll_number, user_id, name, date_of_birth))
-            conn.commit()
-            return True
+            cursor.execute("SELECT term, exams, attempts, archived_at FROM TERM_ARCHIVE ORDER BY term")
+            return cursor.fetchall()
         except Error as e:
-            st.error(f"Error adding student: {e}")
-            conn.rollback()
-            return False
+            st.error(f"Error fetching archived terms: {e}")
+            return []
         finally:
             cursor.close()
             conn.close()
-    return False
+    return []
 
-def add_teacher(username, password, name, specialization):
+@outside_unit_of_work()
+def archive_term(term, on_progress=None):
+    """Move an ended term's exams and attempts from the live tables to Parquet.
+
+    The export reads with shared locks and the delete runs in the same
+    transaction, so no attempt can change between being archived and being
+    removed. The file is renamed into place just before the commit and removed
+    again if the commit fails, leaving the term live. Returns a summary dict,
+    or None on error.
+    """
+    if term >= academic_term():
+        raise ValueError(f"Term {term} has not ended yet")
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor()
+        path = None
         try:
-            # Check if username already exists
-            cursor.execute("SELECT user_id FROM USERS WHERE username = %s", (username,))
-            if cursor.fetchone():
-                st.error("Username already exists!")
-                return False
-                
-            hashed_pass = hash_password(password)
             cursor.execute("""
-                INSERT INTO USERS (username, password_hash, full_name, role)
-                VALUES (%s, %s, %s, 'teacher')
-            """, (username, hashed_pass, name))
-            user_id = cursor.lastrowid
+                SELECT COUNT(*) FROM EXAM_ATTEMPT ea
+                JOIN EXAM e ON ea.exam_id = e.exam_id
+                WHERE e.term = %s
+            """, (term,))
+            total_rows = cursor.fetchone()[0]
+            
+            term_dir = archive_dir(term)
+            os.makedirs(term_dir, exist_ok=True)
+            # Dot-prefixed files are skipped when the directory is read
+            partial = os.path.join(term_dir, '.archiving.part')
+            started = time.perf_counter()
+            rows_done, first_attempt_id, last_attempt_id = 0, None, 0
+            with pq.ParquetWriter(partial, ARCHIVE_SCHEMA, compression='zstd') as writer:
+                while True:
+                    cursor.execute("""
+                        SELECT ea.attempt_id, ea.exam_id, e.term, s.roll_number, s.name,
+                               c.course_code, c.course_name, e.exam_title,
+                               ea.score_obtained, e.total_marks, ea.letter_grade, ea.status
+                        FROM EXAM_ATTEMPT ea
+                        JOIN EXAM e ON ea.exam_id = e.exam_id
+                        JOIN STUDENT s ON ea.roll_number = s.roll_number
+                        JOIN COURSE c ON e.course_id = c.course_id
+                        WHERE e.term = %s AND ea.attempt_id > %s
+                        ORDER BY ea.attempt_id
+                        LIMIT %s
+                        FOR SHARE OF ea, e
+                    """, (term, last_attempt_id, ARCHIVE_CHUNK_SIZE))
+                    chunk = fetch_arrow(cursor, ARCHIVE_SCHEMA)
+                    if not chunk.num_rows:
+                        break
+                    writer.write_table(chunk)
+                    if first_attempt_id is None:
+                        first_attempt_id = chunk.column('attempt_id')[0].as_py()
+                    last_attempt_id = chunk.column('attempt_id')[-1].as_py()
+                    rows_done += chunk.num_rows
+                    if on_progress:
+                        rows_per_sec = rows_done / (time.perf_counter() - started)
+                        on_progress(rows_done, total_rows, rows_per_sec, (total_rows - rows_done) / rows_per_sec)
             
+            # Attempts and grading modes go with their exams (ON DELETE CASCADE)
+            cursor.execute("SELECT exam_id FROM EXAM WHERE term = %s FOR UPDATE", (term,))
+            exam_ids = [exam_id for (exam_id,) in cursor.fetchall()]
+            cursor.execute("DELETE FROM EXAM WHERE term = %s", (term,))
+            for exam_id in exam_ids:
+                record_change(cursor, 'exam', exam_id, 'archive', {'term': term})
             cursor.execute("""
-                INSERT INTO TEACHER (name, user_id, specialization)
+                INSERT INTO TERM_ARCHIVE (term, exams, attempts)
                 VALUES (%s, %s, %s)
-            """, (name, user_id, specialization))
+                ON DUPLICATE KEY UPDATE 
+                    exams = exams + VALUES(exams), attempts = attempts + VALUES(attempts),
+                    archived_at = CURRENT_TIMESTAMP
+            """, (term, len(exam_ids), rows_done))
+            if rows_done:
+                path = os.path.join(term_dir, f"attempts_{first_attempt_id}_{last_attempt_id}.parquet")
+                os.replace(partial, path)
+            else:
+                os.remove(partial)
             conn.commit()
-            return True
+            on_commit(fetch_rank_list.clear)
+            return {'term': term, 'exams': len(exam_ids), 'attempts': rows_done, 'path': path}
         except Error as e:
-            st.error(f"Error adding teacher: {e}")
+            st.error(f"Error archiving term {term}: {e}")
             conn.rollback()
-            return False
+            if path:
+                os.remove(path)  # the attempts are still live
+            return None
         finally:
             cursor.close()
             conn.close()
-    return False
+    return None
 
-def add_course(course_code, course_name, teacher_id):
+def read_archived_results(term, roll_number=None, course_code=None):
+    """Read an archived term's results; filters are applied while scanning the file"""
+    filters = []
+    if roll_number is not None:
+        filters.append(('roll_number', '=', roll_number))
+    if course_code:
+        filters.append(('course_code', '=', course_code))
+    return pq.read_table(archive_dir(term), filters=filters or None)
+
+# Score Import
+# Scanner (OMR) exports are imported as a background job. The file is read in
+# chunks, parsed column-wise with pandas and written as a normalized CSV that
+# LOAD DATA LOCAL INFILE bulk-loads into the SCORE_IMPORT_ROW staging table
+# (batched INSERTs are used when the server refuses local files). The merge is
+# set-based and runs in one transaction: rows matching no exam of the course,
+# no enrolled student or no valid score are flagged, missing attempts are
+# created, all scores are written by one UPDATE and each exam is regraded once.
+# Flagged rows stay in the staging table as the import's unmatched report.
+IMPORT_DIR = os.getenv('IMPORT_DIR', 'imports')
+IMPORT_CHUNK_SIZE = 50000
+IMPORT_INSERT_BATCH_SIZE = 5000
+IMPORT_REF_LENGTH = 32
+IMPORT_FORMATS = {'csv': "CSV", 'fixed_width': "Fixed width"}
+IMPORT_COLUMNS = {'exam_id': 'exam_ref', 'roll_number': 'roll_ref', 'score': 'score_ref'}
+# Errors meaning the client or server does not allow LOAD DATA LOCAL INFILE
+LOCAL_INFILE_REFUSED = {1148, 2068, 3948}
+
+# Checked in order; a row keeps the first problem found
+IMPORT_CHECKS = [
+    ('invalid value', """
+        UPDATE SCORE_IMPORT_ROW r
+        SET r.problem = %(problem)s
+        WHERE r.import_id = %(import_id)s AND r.problem IS NULL
+          AND (r.exam_id IS NULL OR r.roll_number IS NULL OR r.score IS NULL)
+    """),
+    ('exam not in course', """
+        UPDATE SCORE_IMPORT_ROW r
+        LEFT JOIN EXAM e ON e.exam_id = r.exam_id AND e.course_id = %(course_id)s
+        SET r.problem = %(problem)s
+        WHERE r.import_id = %(import_id)s AND r.problem IS NULL AND e.exam_id IS NULL
+    """),
+    ('score out of range', """
+        UPDATE SCORE_IMPORT_ROW r
+        JOIN EXAM e ON e.exam_id = r.exam_id
+        SET r.problem = %(problem)s
+        WHERE r.import_id = %(import_id)s AND r.problem IS NULL
+          AND (r.score < 0 OR r.score > e.total_marks)
+    """),
+    ('student not enrolled', """
+        UPDATE SCORE_IMPORT_ROW r
+        LEFT JOIN ENROLLMENT en ON en.roll_number = r.roll_number AND en.course_id = %(course_id)s
+        SET r.problem = %(problem)s
+        WHERE r.import_id = %(import_id)s AND r.problem IS NULL AND en.roll_number IS NULL
+    """),
+    ('superseded by a later row', """
+        UPDATE SCORE_IMPORT_ROW r
+        JOIN (
+            SELECT exam_id, roll_number, MAX(row_no) AS last_row_no
+            FROM SCORE_IMPORT_ROW
+            WHERE import_id = %(import_id)s AND problem IS NULL
+            GROUP BY exam_id, roll_number
+            HAVING COUNT(*) > 1
+        ) d ON r.exam_id = d.exam_id AND r.roll_number = d.roll_number
+        SET r.problem = %(problem)s
+        WHERE r.import_id = %(import_id)s AND r.problem IS NULL AND r.row_no < d.last_row_no
+    """),
+]
+
+def parse_column_span(span):
+    """Turn a 1-based inclusive "start-end" span into a pandas colspec"""
+    match = re.fullmatch(r'\s*(\d+)\s*-\s*(\d+)\s*', span)
+    if not match or not 0 < int(match.group(1)) <= int(match.group(2)):
+        raise ValueError(f"Invalid column span {span!r}, expected e.g. 1-8")
+    return int(match.group(1)) - 1, int(match.group(2))
+
+def read_score_file(path, file_format, columns, skip_rows=0):
+    """Yield DataFrame chunks of a scanner export with raw string reference columns.
+
+    columns maps 'roll_number', 'score' and optionally 'exam_id' to a CSV
+    header name or, for fixed-width files, a "start-end" character span.
+    """
+    columns = {field: spec for field, spec in columns.items() if spec}
+    if file_format == 'csv':
+        reader = pd.read_csv(
+            path, usecols=list(columns.values()), dtype=str, keep_default_na=False,
+            skipinitialspace=True, skiprows=skip_rows, chunksize=IMPORT_CHUNK_SIZE,
+            encoding_errors='replace'
+        )
+        renames = {spec: IMPORT_COLUMNS[field] for field, spec in columns.items()}
+    else:
+        reader = pd.read_fwf(
+            path, colspecs=[parse_column_span(spec) for spec in columns.values()],
+            names=[IMPORT_COLUMNS[field] for field in columns], header=None, dtype=str,
+            keep_default_na=False, skiprows=skip_rows, chunksize=IMPORT_CHUNK_SIZE,
+            encoding_errors='replace'
+        )
+        renames = {}
+    for chunk in reader:
+        yield chunk.rename(columns=renames)
+
+def parse_import_integers(refs):
+    """Whole numbers within MySQL INT range; anything else becomes NA"""
+    values = pd.to_numeric(refs, errors='coerce')
+    valid = (values == values.round()) & values.between(-2**31, 2**31 - 1)
+    return values.where(valid).astype('Int64')
+
+def normalize_import_chunk(chunk, first_row_no, default_exam_id):
+    """Parse one chunk into the staging table's columns"""
+    refs = {}
+    for column in IMPORT_COLUMNS.values():
+        raw = chunk[column] if column in chunk else pd.Series(str(default_exam_id or ''), index=chunk.index)
+        refs[column] = raw.str.strip().str.replace(r'[\r\n]', ' ', regex=True).str.slice(0, IMPORT_REF_LENGTH)
+    scores = pd.to_numeric(refs['score_ref'], errors='coerce')
+    return pd.DataFrame({
+        'row_no': np.arange(first_row_no, first_row_no + len(chunk)),
+        **refs,
+        'exam_id': parse_import_integers(refs['exam_ref']),
+        'roll_number': parse_import_integers(refs['roll_ref']),
+        'score': scores.where(np.isfinite(scores)),
+    })
+
+def stage_import_rows(cursor, import_id, staging_path):
+    """Bulk-load a normalized CSV into SCORE_IMPORT_ROW"""
+    try:
+        cursor.execute("""
+            LOAD DATA LOCAL INFILE %s INTO TABLE SCORE_IMPORT_ROW
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            (row_no, exam_ref, roll_ref, score_ref, @exam_id, @roll_number, @score)
+            SET import_id = %s, exam_id = NULLIF(@exam_id, ''),
+                roll_number = NULLIF(@roll_number, ''), score = NULLIF(@score, '')
+        """, (staging_path, import_id))
+        return
+    except Error as e:
+        if e.errno not in LOCAL_INFILE_REFUSED:
+            raise
+    for chunk in pd.read_csv(staging_path, header=None, dtype=str, keep_default_na=False,
+                             chunksize=IMPORT_INSERT_BATCH_SIZE):
+        values = chunk.astype(object).where(chunk != '', None).itertuples(index=False, name=None)
+        cursor.executemany("""
+            INSERT INTO SCORE_IMPORT_ROW
+                (import_id, row_no, exam_ref, roll_ref, score_ref, exam_id, roll_number, score)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, [(import_id, *row) for row in values])
+
+def merge_import_rows(cursor, import_id, course_id):
+    """Apply an import's staged rows; returns (imported, created, exam_ids)"""
+    for problem, query in IMPORT_CHECKS:
+        cursor.execute(query, {'problem': problem, 'import_id': import_id, 'course_id': course_id})
+    
+    cursor.execute("""
+        INSERT INTO EXAM_ATTEMPT (exam_id, roll_number)
+        SELECT r.exam_id, r.roll_number
+        FROM SCORE_IMPORT_ROW r
+        WHERE r.import_id = %s AND r.problem IS NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM EXAM_ATTEMPT ea
+              WHERE ea.exam_id = r.exam_id AND ea.roll_number = r.roll_number
+          )
+    """, (import_id,))
+    created = cursor.rowcount
+    cursor.execute("""
+        UPDATE EXAM_ATTEMPT ea
+        JOIN SCORE_IMPORT_ROW r ON ea.exam_id = r.exam_id AND ea.roll_number = r.roll_number
+        SET ea.score_obtained = r.score, ea.version = ea.version + 1
+        WHERE r.import_id = %s AND r.problem IS NULL
+    """, (import_id,))
+    cursor.execute("""
+        SELECT r.exam_id, COALESCE(g.grading_mode, 'absolute'), COUNT(*)
+        FROM SCORE_IMPORT_ROW r
+        LEFT JOIN EXAM_GRADING g ON g.exam_id = r.exam_id
+        WHERE r.import_id = %s AND r.problem IS NULL
+        GROUP BY r.exam_id, g.grading_mode
+    """, (import_id,))
+    exams = cursor.fetchall()
+    for exam_id, mode, rows in exams:
+        regrade_exam(cursor, exam_id, mode)
+        record_change(cursor, 'exam', exam_id, 'import', {'import_id': import_id, 'rows': rows})
+    cursor.execute("DELETE FROM SCORE_IMPORT_ROW WHERE import_id = %s AND problem IS NULL", (import_id,))
+    return sum(rows for _, _, rows in exams), created, [exam_id for exam_id, _, _ in exams]
+
+@outside_unit_of_work()
+def start_score_import(course_id, uploaded_file, file_format, columns, default_exam_id=None, skip_rows=0):
+    """Save an uploaded scanner export and queue its import job"""
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor()
         try:
-            # Check if course code already exists
-            cursor.execute("SELECT course_id FROM COURSE WHERE course_code = %s", (course_code,))
-            if cursor.fetchone():
-                st.error("Course code already exists!")
-                return False
-                
             cursor.execute("""
-                INSERT INTO COURSE (course_code, course_name, teacher_id)
-                VALUES (%s, %s, %s)
-            """, (course_code, course_name, teacher_id))
+                INSERT INTO SCORE_IMPORT (course_id, file_name) VALUES (%s, %s)
+            """, (course_id, uploaded_file.name[:255]))
+            import_id = cursor.lastrowid
             conn.commit()
-            return True
         except Error as e:
-            st.error(f"Error adding course: {e}")
+            st.error(f"Error starting score import: {e}")
             conn.rollback()
-            return False
+            return None
         finally:
             cursor.close()
             conn.close()
-    return False
+        
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        path = os.path.abspath(os.path.join(IMPORT_DIR, f"{current_tenant()}_import_{import_id}"))
+        with open(path, 'wb') as f:
+            f.write(uploaded_file.getbuffer())
+        return submit_job(
+            'import_scores', import_id=import_id, course_id=course_id, path=path,
+            file_format=file_format, columns=columns, default_exam_id=default_exam_id, skip_rows=skip_rows
+        )
+    return None
 
-def enroll_student(roll_number, course_id):
-    conn = get_db_connection()
-    if conn:
+def import_scores(import_id, course_id, path, file_format, columns, default_exam_id=None, skip_rows=0,
+                  on_progress=None):
+    """Stage and merge a saved scanner export. Returns a summary dict, or None on error.
+
+    Runs on its own connection, which is allowed to read local files from
+    IMPORT_DIR for LOAD DATA LOCAL INFILE. The uploaded and staging files are
+    removed afterwards whether or not the import succeeded.
+    """
+    staging_path = path + '.staging.csv'
+    try:
+        with open(path, 'rb') as f:
+            total_rows = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+        total_rows = max(total_rows - skip_rows - (file_format == 'csv'), 0)
+        
+        # Header and skipped lines come before the first data row
+        first_row_no = skip_rows + (file_format == 'csv') + 1
+        started = time.perf_counter()
+        rows_done = 0
+        with open(staging_path, 'w', newline='') as staging:
+            for chunk in read_score_file(path, file_format, columns, skip_rows):
+                normalize_import_chunk(chunk, first_row_no + rows_done, default_exam_id).to_csv(
+                    staging, header=False, index=False
+                )
+                rows_done += len(chunk)
+                if on_progress:
+                    rows_per_sec = rows_done / (time.perf_counter() - started)
+                    on_progress(rows_done, max(total_rows, rows_done), rows_per_sec,
+                                max(total_rows - rows_done, 0) / rows_per_sec)
+        
+        try:
+            conn = mysql.connector.connect(
+                **get_tenant_config(), allow_local_infile_in_path=os.path.abspath(IMPORT_DIR)
+            )
+        except Error as e:
+            st.error(f"Error connecting to MySQL: {e}")
+            return None
         cursor = conn.cursor()
         try:
-            # Check if already enrolled
-            cursor.execute("""
-                SELECT enrollment_id FROM ENROLLMENT 
-                WHERE roll_number = %s AND course_id = %s
-            """, (roll_number, course_id))
-            if cursor.fetchone():
-                st.error("Student is already enrolled in this course!")
-                return False
-                
+            stage_import_rows(cursor, import_id, staging_path)
+            imported, created, exam_ids = merge_import_rows(cursor, import_id, course_id)
+            rows_per_sec = rows_done / (time.perf_counter() - started)
             cursor.execute("""
-                INSERT INTO ENROLLMENT (roll_number, course_id)
-                VALUES (%s, %s)
-            """, (roll_number, course_id))
+                UPDATE SCORE_IMPORT
+                SET total_rows = %s, imported_rows = %s, created_attempts = %s,
+                    unmatched_rows = %s, rows_per_sec = %s, finished_at = NOW()
+                WHERE import_id = %s
+            """, (rows_done, imported, created, rows_done - imported, rows_per_sec, import_id))
             conn.commit()
-            return True
+            on_commit(fetch_rank_list.clear)
+            if on_progress:
+                on_progress(rows_done, rows_done, rows_per_sec, 0)
+            return {'import_id': import_id, 'rows': rows_done, 'imported': imported,
+                    'created_attempts': created, 'unmatched': rows_done - imported, 'exams': exam_ids}
         except Error as e:
-            st.error(f"Error enrolling student: {e}")
+            st.error(f"Error importing scores: {e}")
             conn.rollback()
-            return False
+            return None
         finally:
             cursor.close()
             conn.close()
-    return False
+    finally:
+        for leftover in (path, staging_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
 
-def get_all_teachers():
+def get_score_imports(course_id, limit=10):
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor(dictionary=True)
         try:
             cursor.execute("""
-                SELECT t.teacher_id, t.name, t.specialization, 
-                       u.username, u.full_name
-                FROM TEACHER t
-                JOIN USERS u ON t.user_id = u.user_id
-                ORDER BY t.name
-            """)
-            teachers = cursor.fetchall()
-            return teachers
+                SELECT import_id, file_name, total_rows, imported_rows, created_attempts,
+                       unmatched_rows, rows_per_sec, created_at, finished_at
+                FROM SCORE_IMPORT
+                WHERE course_id = %s
+                ORDER BY import_id DESC
+                LIMIT %s
+            """, (course_id, limit))
+            return cursor.fetchall()
         except Error as e:
-            st.error(f"Error fetching teachers: {e}")
+            st.error(f"Error fetching score imports: {e}")
             return []
         finally:
             cursor.close()
             conn.close()
     return []
 
-def get_all_students():
+def get_unmatched_import_rows(import_id):
+    """Rows of an import that were not applied, with the reason, in file order"""
+    return fetch_frame("""
+        SELECT row_no, exam_ref, roll_ref, score_ref, problem
+        FROM SCORE_IMPORT_ROW
+        WHERE import_id = %s
+        ORDER BY row_no
+    """, (import_id,), dtypes={'row_no': 'int32', 'problem': 'category'}, label="unmatched rows")
+
+# Background Jobs
+# Long admin operations run in a process-wide thread pool instead of the
+# Streamlit session. Each job is persisted in the JOB table; active_key is set
+# while a job is queued or running so an identical job is not started twice.
+# The process that queued a job keeps its updated_at fresh until it ends, so
+# only jobs of a process that is gone (e.g. a restarted server) go stale.
+JOB_WORKERS = 2
+JOB_STALE_SECONDS = 600
+JOB_HEARTBEAT_SECONDS = 60
+
+@st.cache_resource
+def get_job_executor():
+    """Thread pool shared by every session of this server process"""
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+
+@st.cache_resource
+def get_owned_jobs():
+    """Ids of the jobs this process has queued or is running, by tenant"""
+    owned = {'jobs': collections.defaultdict(set), 'lock': threading.Lock()}
+    threading.Thread(target=send_job_heartbeats, args=(owned,), daemon=True, name='job-heartbeat').start()
+    return owned
+
+def send_job_heartbeats(owned):
+    """Touch the owned jobs every JOB_HEARTBEAT_SECONDS, also while they wait or report no progress"""
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with owned['lock']:
+            jobs = {tenant: sorted(job_ids) for tenant, job_ids in owned['jobs'].items() if job_ids}
+        for tenant, job_ids in jobs.items():
+            with tenant_scope(tenant):
+                conn = get_db_connection()
+                if not conn:
+                    continue
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f"""
+                        UPDATE JOB SET updated_at = NOW()
+                        WHERE job_id IN ({', '.join(['%s'] * len(job_ids))}) AND active_key IS NOT NULL
+                    """, job_ids)
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                finally:
+                    cursor.close()
+                    conn.close()
+
+def update_job(job_id, status=None, progress=None, message=None):
+    """Record a job's status or progress; False if it had already ended (or on error)"""
     conn = get_db_connection()
     if conn:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         try:
             cursor.execute("""
-                SELECT s.roll_number, s.name, s.date_of_birth,
-                       u.username, u.full_name
-                FROM STUDENT s
-                JOIN USERS u ON s.user_id = u.user_id
-                ORDER BY s.roll_number
-            """)
-            students = cursor.fetchall()
-            return students
-        except Error as e:
-            st.error(f"Error fetching students: {e}")
-            return []
+                UPDATE JOB
+                SET status = COALESCE(%s, status),
+                    progress = COALESCE(%s, progress),
+                    message = COALESCE(%s, message),
+                    started_at = IF(%s = 'running', NOW(), started_at),
+                    finished_at = IF(%s IN ('done', 'failed'), NOW(), finished_at),
+                    active_key = IF(%s IN ('done', 'failed'), NULL, active_key),
+                    updated_at = NOW()
+                WHERE job_id = %s AND status NOT IN ('done', 'failed')
+            """, (status, progress, message, status, status, status, job_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        except Error:
+            conn.rollback()
+            return False
         finally:
             cursor.close()
             conn.close()
-    return []
+    return False
 
-def get_all_courses():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
+def run_job(job_id, job_type, params, tenant=None):
+    """Execute a queued job in a worker thread and record its outcome"""
+    with tenant_scope(tenant):
         try:
-            cursor.execute("""
-                SELECT c.*, t.name as teacher_name 
-                FROM COURSE c
-                LEFT JOIN TEACHER t ON c.teacher_id = t.teacher_id
-                ORDER BY c.course_code
-            """)
-            courses = cursor.fetchall()
-            return courses
-        except Error as e:
-            st.error(f"Error fetching courses: {e}")
-            return []
+            if not update_job(job_id, status='running'):
+                return  # released as stale while it waited; not run twice
+            
+            def report_progress(done, total, rows_per_sec=None, eta_seconds=None):
+                message = f"{done}/{total}"
+                if rows_per_sec is not None:
+                    message += f" | {rows_per_sec:.0f} rows/sec | ETA {eta_seconds:.0f}s"
+                update_job(job_id, progress=done / total if total else 1.0, message=message)
+            
+            started = time.perf_counter()
+            try:
+                result = JOB_HANDLERS[job_type](**params, on_progress=report_progress)
+            except Exception as e:
+                update_job(job_id, status='failed', message=str(e)[:255])
+                return
+            elapsed = time.perf_counter() - started
+            if result:
+                update_job(job_id, status='done', progress=1.0, message=f"Finished in {elapsed:.1f}s")
+            else:
+                update_job(job_id, status='failed', message="Job reported failure")
         finally:
-            cursor.close()
-            conn.close()
-    return []
+            owned = get_owned_jobs()
+            with owned['lock']:
+                owned['jobs'][tenant].discard(job_id)
 
-def get_all_results():
-    """Get all exam results"""
+@outside_unit_of_work()
+def submit_job(job_type, **params):
+    """Queue a background job.
+
+    Returns (job_id, created); when an identical job is already queued or
+    running its id is returned with created False. Returns None on error.
+    """
+    params_json = json.dumps(params, sort_keys=True)
+    dedup_params = {name: params[name] for name in JOB_DEDUP_PARAMS.get(job_type, params)}
+    # Hashed so that long parameters (e.g. file paths) fit the unique column
+    dedup_hash = hashlib.sha256(json.dumps(dedup_params, sort_keys=True).encode()).hexdigest()
+    active_key = f"{job_type}:{dedup_hash}"
     conn = get_db_connection()
     if conn:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         try:
+            # Release jobs whose process stopped sending heartbeats (e.g. the server restarted)
             cursor.execute("""
-                SELECT s.roll_number, s.name, c.course_code, c.course_name,
-                       e.exam_title, ea.score_obtained, e.total_marks,
-                       er.letter_grade, er.status
-                FROM EXAM_RESULT er
-                JOIN EXAM_ATTEMPT ea ON er.attempt_id = ea.attempt_id
-                JOIN STUDENT s ON ea.roll_number = s.roll_number
-                JOIN EXAM e ON ea.exam_id = e.exam_id
-                JOIN COURSE c ON e.course_id = c.course_id
-                ORDER BY s.roll_number, c.course_code
-            """)
-            results = cursor.fetchall()
-            return results
+                UPDATE JOB SET status = 'failed', active_key = NULL, message = 'Stale job abandoned'
+                WHERE active_key = %s AND updated_at < NOW() - INTERVAL %s SECOND
+            """, (active_key, JOB_STALE_SECONDS))
+            try:
+                cursor.execute("""
+                    INSERT INTO JOB (job_type, params, active_key)
+                    VALUES (%s, %s, %s)
+                """, (job_type, params_json, active_key))
+                job_id, created = cursor.lastrowid, True
+            except mysql.connector.IntegrityError:
+                cursor.execute("SELECT job_id FROM JOB WHERE active_key = %s", (active_key,))
+                job_id, created = cursor.fetchone()[0], False
+            conn.commit()
         except Error as e:
-            st.error(f"Error fetching results: {e}")
-            return []
+            st.error(f"Error submitting job: {e}")
+            conn.rollback()
+            return None
         finally:
             cursor.close()
             conn.close()
-    return []
+        if created:
+            owned = get_owned_jobs()
+            with owned['lock']:
+                owned['jobs'][current_tenant()].add(job_id)
+            get_job_executor().submit(run_job, job_id, job_type, params, current_tenant())
+        return job_id, created
+    return None
 
-def get_enrolled_students(course_id):
-    """Get students enrolled in a specific course"""
+def get_recent_jobs(limit=10):
     conn = get_db_connection()
     if conn:
         cursor = conn.cursor(dictionary=True)
         try:
             cursor.execute("""
-                SELECT s.roll_number, s.name
-                FROM ENROLLMENT e
-                JOIN STUDENT s ON e.roll_number = s.roll_number
-                WHERE e.course_id = %s
-                ORDER BY s.roll_number
-            """, (course_id,))
-            students = cursor.fetchall()
-            return students
+                SELECT job_id, job_type, params, status, ROUND(progress * 100) AS progress_pct, message,
+                       created_at, TIMESTAMPDIFF(SECOND, started_at, COALESCE(finished_at, NOW())) AS duration_s
+                FROM JOB
+                ORDER BY job_id DESC
+                LIMIT %s
+            """, (limit,))
+            jobs = cursor.fetchall()
+            return jobs
         except Error as e:
-            st.error(f"Error fetching enrolled students: {e}")
+            st.error(f"Error fetching jobs: {e}")
             return []
         finally:
             cursor.close()
             conn.close()
     return []
 
+@st.fragment(run_every=3)
+def show_job_panel():
+    """Job list that refreshes itself without rerunning the whole page"""
+    # Fragment reruns skip the script's tenant scope, so set it here
+    with tenant_scope(session_tenant()):
+        jobs = get_recent_jobs()
+    if not jobs:
+        st.caption("No background jobs yet.")
+        return
+    for job in jobs:
+        if job['status'] in ('queued', 'running'):
+            st.progress(job['progress_pct'] / 100, text=f"#{job['job_id']} {job['job_type']} ({job['status']})")
+    st.dataframe(pd.DataFrame(jobs), use_container_width=True, hide_index=True)
+
+def report_submitted_job(submitted, label):
+    if submitted is None:
+        st.error(f"Failed to start {label}")
+    elif submitted[1]:
+        st.success(f"{label} started as job #{submitted[0]}")
+    else:
+        st.info(f"{label} is already running as job #{submitted[0]}")
+
+JOB_HANDLERS = {
+    'regrade': run_bulk_regrade,
+    'archive_term': archive_term,
+    'import_scores': import_scores,
+}
+
+# Parameters that identify a job for de-duplication (default: all of them)
+JOB_DEDUP_PARAMS = {
+    'import_scores': ('import_id',),
+    # One regrade at a time: they share the checkpoint row
+    'regrade': (),
+}
+
+# Cross-tenant Reporting
+# Admins of the home tenant can report across every institution. A report
+# query is fanned out to all tenants at once, each worker thread in its own
+# tenant scope with a connection from that tenant's pool, so the report takes
+# about as long as the slowest tenant rather than the sum of all of them.
+def fan_out(query, params=()):
+    """Run a read query in every tenant in parallel.
+
+    Returns {tenant: rows} and {tenant: error} for the tenants that failed.
+    """
+    def run(tenant):
+        with tenant_scope(tenant):
+            conn = open_db_connection()
+            if not conn:
+                raise Error(msg="Database connection failed")
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+    
+    tenants = get_tenants()
+    with ThreadPoolExecutor(max_workers=len(tenants), thread_name_prefix='fan_out') as executor:
+        futures = {tenant: executor.submit(run, tenant) for tenant in tenants}
+    results, errors = {}, {}
+    for tenant, future in futures.items():
+        try:
+            results[tenant] = future.result()
+        except Error as e:
+            errors[tenant] = e
+    return results, errors
+
+INSTITUTION_SUMMARY_QUERY = """
+    SELECT (SELECT COUNT(*) FROM STUDENT) AS students,
+           (SELECT COUNT(*) FROM TEACHER) AS teachers,
+           (SELECT COUNT(*) FROM COURSE) AS courses,
+           (SELECT COUNT(*) FROM EXAM) AS exams,
+           COUNT(*) AS graded_attempts,
+           ROUND(100 * AVG(status = 'Pass'), 1) AS pass_rate
+    FROM EXAM_ATTEMPT
+    WHERE letter_grade IS NOT NULL
+"""
+
+GRADE_DISTRIBUTION_QUERY = """
+    SELECT letter_grade, COUNT(*) AS attempts
+    FROM EXAM_ATTEMPT
+    WHERE letter_grade IS NOT NULL
+    GROUP BY letter_grade
+"""
+
+def get_institution_report():
+    """Per-tenant summary rows and a tenant x grade count pivot"""
+    summaries, errors = fan_out(INSTITUTION_SUMMARY_QUERY)
+    distributions, distribution_errors = fan_out(GRADE_DISTRIBUTION_QUERY)
+    errors.update(distribution_errors)
+    summary = pd.DataFrame([{'institution': tenant, **rows[0]} for tenant, rows in summaries.items()])
+    grades = pd.DataFrame([{'institution': tenant, **row} for tenant, rows in distributions.items() for row in rows])
+    if not grades.empty:
+        grades = grades.pivot_table(index='institution', columns='letter_grade', values='attempts', fill_value=0)
+    return summary, grades, errors
+
+# Concurrent Grading
+# Score edits are saved with compare-and-set on EXAM_ATTEMPT.version instead of
+# locks. Each editor keeps the version and score its edit started from; when
+# the attempt has been saved by someone else since, an untouched field follows
+# the new score and an edited one is shown as a conflict to keep or discard.
+def score_edit_base(attempt):
+    """(version, score) that this session's edit of an attempt started from"""
+    base_key = f"score_base_{attempt['attempt_id']}"
+    base = st.session_state.get(base_key)
+    if base and base[0] != attempt['version']:
+        edited = st.session_state.get(f"score_{attempt['attempt_id']}")
+        if edited is None or edited == float(base[1] or 0.0):
+            base = None
+            discard_score_edit(attempt['attempt_id'])
+    if base is None:
+        base = st.session_state[base_key] = (attempt['version'], attempt['score_obtained'])
+    return base
+
+def discard_score_edit(attempt_id):
+    for key in (f"score_base_{attempt_id}", f"score_{attempt_id}"):
+        st.session_state.pop(key, None)
+
 # Streamlit UI
 def main():
     st.set_page_config(page_title="Exam Management System", layout="wide")
     
-    # Initialize database
-    init_database()
+    # Initialize every tenant's database
+    for tenant in get_tenants():
+        try:
+            ensure_database(tenant)
+        except RuntimeError:
+            pass  # init_database has already shown the error
     
     # Session state
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
         st.session_state.user = None
         st.session_state.role = None
+        st.session_state.tenant = None
     
     # Login Page
     if not st.session_state.logged_in:
@@ -698,17 +3097,20 @@ def main():
         
         with col2:
             st.subheader("Login")
+            tenants = get_tenants()
+            tenant = st.selectbox("Institution", tenants) if len(tenants) > 1 else None
             role = st.selectbox("Select Role", ["student", "teacher", "admin"])
             username = st.text_input("Username")
             password = st.text_input("Password", type="password")
             
             if st.button("Login", use_container_width=True):
                 if username and password:
-                    user = authenticate(username, password, role)
+                    user = authenticate(username, password, role, tenant)
                     if user:
                         st.session_state.logged_in = True
                         st.session_state.user = user
                         st.session_state.role = role
+                        st.session_state.tenant = user['tenant']
                         st.rerun()
                     else:
                         st.error("Invalid credentials!")
@@ -729,6 +3131,7 @@ def main():
                 st.session_state.logged_in = False
                 st.session_state.user = None
                 st.session_state.role = None
+                st.session_state.tenant = None
                 st.rerun()
         
         st.markdown("---")
@@ -764,21 +3167,16 @@ def main():
             
             with tab2:
                 st.subheader("My Exam Attempts & Results")
-                attempts = get_student_exam_attempts(student['roll_number'])
-                if attempts:
-                    # Clean the data for display
-                    for attempt in attempts:
-                        if attempt['score_obtained'] is None:
-                            attempt['score_obtained'] = 'Not Graded'
-                        if attempt['letter_grade'] is None:
-                            attempt['letter_grade'] = 'N/A'
-                        if attempt['status'] is None:
-                            attempt['status'] = 'N/A'
-                    
-                    df = pd.DataFrame(attempts)
+                df = get_student_exam_attempts(student['roll_number'])
+                if len(df):
                     # Select only relevant columns for display
                     display_columns = ['exam_title', 'course_code', 'course_name', 'score_obtained', 'total_marks', 'letter_grade', 'status']
-                    display_df = df[display_columns]
+                    display_df = df[display_columns].copy()
+                    display_df['score_obtained'] = display_df['score_obtained'].astype(object).where(
+                        display_df['score_obtained'].notna(), 'Not Graded'
+                    )
+                    for column in ['letter_grade', 'status']:
+                        display_df[column] = display_df[column].cat.add_categories('N/A').fillna('N/A')
                     st.dataframe(display_df, use_container_width=True, hide_index=True)
                 else:
                     st.info("No exam attempts recorded yet.")
@@ -795,6 +3193,7 @@ def main():
                 st.session_state.logged_in = False
                 st.session_state.user = None
                 st.session_state.role = None
+                st.session_state.tenant = None
                 st.rerun()
         
         st.markdown("---")
@@ -816,7 +3215,7 @@ def main():
                     
                     st.markdown("---")
                     
-                    tab1, tab2, tab3 = st.tabs(["📝 Exams", "➕ Create Exam", "✏️ Add Attempt"])
+                    tab1, tab2, tab3, tab4 = st.tabs(["📝 Exams", "➕ Create Exam", "✏️ Add Attempt", "📥 Import Scores"])
                     
                     with tab1:
                         st.subheader("Course Exams")
@@ -826,11 +3225,30 @@ def main():
                             for exam in exams:
                                 with st.expander(f"{exam['exam_title']} - {exam['total_marks']} marks"):
                                     
+                                    current_mode = get_exam_grading_mode(exam['exam_id'])
+                                    mode_col, apply_col = st.columns([3, 1])
+                                    with mode_col:
+                                        new_mode = st.selectbox(
+                                            "Grading mode",
+                                            GRADING_MODES,
+                                            index=GRADING_MODES.index(current_mode),
+                                            key=f"mode_{exam['exam_id']}"
+                                        )
+                                    with apply_col:
+                                        if st.button("Apply", key=f"mode_btn_{exam['exam_id']}"):
+                                            if set_exam_grading_mode(exam['exam_id'], new_mode):
+                                                st.success("Grading mode applied!")
+                                                st.rerun()
+                                    
                                     st.markdown("#### Student Attempts & Results")
                                     attempts = get_exam_attempts(exam['exam_id'])
                                     
                                     if attempts:
+                                        edits = []
                                         for attempt in attempts:
+                                            attempt_id = attempt['attempt_id']
+                                            base_version, base_score = score_edit_base(attempt)
+                                            conflict = attempt['version'] != base_version
                                             col1, col2, col3 = st.columns([2, 2, 1])
                                             
                                             with col1:
@@ -842,22 +3260,61 @@ def main():
                                                     st.caption("⏳ Not graded yet")
                                             
                                             with col2:
-                                                current_score = attempt['score_obtained'] if attempt['score_obtained'] is not None else 0.0
+                                                current_score = base_score if base_score is not None else 0.0
                                                 new_score = st.number_input(
                                                     "Score",
                                                     min_value=0.0,
                                                     max_value=float(exam['total_marks']),
                                                     value=float(current_score),
-                                                    key=f"score_{attempt['attempt_id']}"
+                                                    key=f"score_{attempt_id}"
                                                 )
+                                                if conflict:
+                                                    st.warning(f"Saved as {attempt['score_obtained']} by someone else while you were editing")
+                                                if new_score != float(current_score):
+                                                    edits.append((attempt_id, new_score, base_version))
                                             
                                             with col3:
-                                                if st.button("Update", key=f"btn_{attempt['attempt_id']}"):
-                                                    if update_exam_attempt_and_result(attempt['attempt_id'], new_score, exam['total_marks']):
+                                                if conflict:
+                                                    if st.button("Keep mine", key=f"keep_{attempt_id}"):
+                                                        if update_exam_attempt_and_result(attempt_id, new_score, exam['total_marks'], attempt['version']):
+                                                            discard_score_edit(attempt_id)
+                                                            st.rerun()
+                                                    if st.button("Use theirs", key=f"theirs_{attempt_id}"):
+                                                        discard_score_edit(attempt_id)
+                                                        st.rerun()
+                                                elif st.button("Update", key=f"btn_{attempt_id}"):
+                                                    if update_exam_attempt_and_result(attempt_id, new_score, exam['total_marks'], base_version):
+                                                        discard_score_edit(attempt_id)
                                                         st.success("Score & Result updated!")
                                                         st.rerun()
+                                        
+                                        if st.button("Save all changes", key=f"save_all_{exam['exam_id']}", disabled=not edits):
+                                            conflicts = save_attempt_scores(exam['exam_id'], edits)
+                                            if conflicts is not None:
+                                                for attempt_id, _, _ in edits:
+                                                    if attempt_id not in conflicts:
+                                                        discard_score_edit(attempt_id)
+                                                if conflicts:
+                                                    st.warning(f"Saved {len(edits) - len(conflicts)} scores; {len(conflicts)} had been changed by someone else and were left for you to review.")
+                                                else:
+                                                    st.rerun()
                                     else:
                                         st.info("No attempts recorded yet.")
+                                    
+                                    if st.checkbox("Show rank list", key=f"rank_{exam['exam_id']}"):
+                                        rank_list = get_exam_rank_list(exam['exam_id'])
+                                        if rank_list:
+                                            st.dataframe(pd.DataFrame(rank_list), use_container_width=True, hide_index=True)
+                                        else:
+                                            st.info("No graded attempts to rank yet.")
+                            
+                            st.markdown("#### Course Rank List")
+                            top_n = st.number_input("Show top", min_value=1, value=10, step=1, key="course_top_n")
+                            course_rank_list = get_course_rank_list(course_id, int(top_n))
+                            if course_rank_list:
+                                st.dataframe(pd.DataFrame(course_rank_list), use_container_width=True, hide_index=True)
+                            else:
+                                st.info("No graded attempts to rank yet.")
                         else:
                             st.info("No exams created for this course yet.")
                     
@@ -880,10 +3337,7 @@ def main():
                         # Get course exams
                         exams = get_course_exams(course_id)
                         
-                        # Get enrolled students
-                        enrolled_students = get_enrolled_students(course_id)
-                        
-                        if exams and enrolled_students:
+                        if exams:
                             col1, col2 = st.columns(2)
                             
                             with col1:
@@ -892,21 +3346,91 @@ def main():
                                 selected_exam_id = exam_options[selected_exam]
                             
                             with col2:
-                                student_options = {f"{s['roll_number']} - {s['name']}": s['roll_number'] for s in enrolled_students}
-                                selected_student = st.selectbox("Select Student", list(student_options.keys()))
-                                selected_roll_number = student_options[selected_student]
+                                selected_student = search_picker(
+                                    "Student", search_students,
+                                    lambda s: f"{s['roll_number']} - {s['name']}",
+                                    key="attempt_student",
+                                    placeholder="Roll number or name prefix",
+                                    course_id=course_id
+                                )
                             
-                            if st.button("Add Exam Attempt"):
-                                if create_exam_attempt(selected_exam_id, selected_roll_number):
+                            if st.button("Add Exam Attempt", disabled=selected_student is None):
+                                if create_exam_attempt(selected_exam_id, selected_student['roll_number']):
                                     st.success("Exam attempt added successfully!")
                                     st.rerun()
                                 else:
                                     st.error("Failed to add exam attempt")
+
+                            if st.button("Add Attempts for All Enrolled Students"):
+                                created = create_exam_attempts_for_enrolled(selected_exam_id)
+                                if created is not None:
+                                    st.success(f"{created} exam attempt(s) added!")
+                                    if created:
+                                        st.rerun()
+                        else:
+                            st.warning("No exams available. Please create an exam first.")
+                    
+                    with tab4:
+                        st.subheader("Import Scanner Scores")
+                        st.caption("Rows are matched to this course's exams and enrolled students; "
+                                   "missing attempts are created and rows that cannot be applied are listed below.")
+                        
+                        exams = get_course_exams(course_id)
+                        
+                        if exams:
+                            exam_titles = {e['exam_id']: e['exam_title'] for e in exams}
+                            col1, col2 = st.columns(2)
+                            with col1:
+                                default_exam_id = st.selectbox(
+                                    "Exam (for files without an exam column)", list(exam_titles),
+                                    format_func=exam_titles.get, key="import_exam"
+                                )
+                            with col2:
+                                file_format = st.radio("File format", list(IMPORT_FORMATS),
+                                                       format_func=IMPORT_FORMATS.get, horizontal=True,
+                                                       key="import_format")
+                            
+                            col1, col2, col3, col4 = st.columns(4)
+                            if file_format == 'csv':
+                                roll_column = col1.text_input("Roll number column", "roll_number", key="import_roll")
+                                score_column = col2.text_input("Score column", "score", key="import_score")
+                                exam_column = col3.text_input("Exam ID column (optional)", key="import_exam_column")
+                            else:
+                                roll_column = col1.text_input("Roll number characters", "1-8", key="import_roll_span")
+                                score_column = col2.text_input("Score characters", "9-14", key="import_score_span")
+                                exam_column = col3.text_input("Exam ID characters (optional)", key="import_exam_span")
+                            skip_rows = col4.number_input("Lines to skip", min_value=0, value=0, key="import_skip")
+                            
+                            uploaded_file = st.file_uploader("Scanner export", type=["csv", "txt", "dat"],
+                                                             key="import_file")
+                            if st.button("Import Scores", disabled=uploaded_file is None):
+                                columns = {'roll_number': roll_column.strip(), 'score': score_column.strip(),
+                                           'exam_id': exam_column.strip()}
+                                report_submitted_job(
+                                    start_score_import(course_id, uploaded_file, file_format, columns,
+                                                       default_exam_id, int(skip_rows)),
+                                    "Score import"
+                                )
+                            
+                            show_job_panel()
+                            
+                            imports = get_score_imports(course_id)
+                            if imports:
+                                st.subheader("Recent Imports")
+                                st.dataframe(pd.DataFrame(imports), use_container_width=True, hide_index=True)
+                                
+                                unmatched = [i['import_id'] for i in imports if i['unmatched_rows']]
+                                if unmatched:
+                                    import_id = st.selectbox("Unmatched rows of import", unmatched,
+                                                             format_func=lambda i: f"#{i}", key="import_unmatched")
+                                    rows = get_unmatched_import_rows(import_id)
+                                    st.dataframe(rows, use_container_width=True, hide_index=True)
+                                    st.download_button(
+                                        "Download unmatched rows", rows.to_csv(index=False),
+                                        file_name=f"import_{import_id}_unmatched.csv", mime="text/csv"
+                                    )
                         else:
-                            if not exams:
-                                st.warning("No exams available. Please create an exam first.")
-                            if not enrolled_students:
-                                st.warning("No students enrolled in this course.")
+                            st.warning("No exams available. Please create an exam first.")
             else:
                 st.info("You are not assigned to any courses yet.")
     
@@ -922,11 +3446,17 @@ def main():
                 st.session_state.logged_in = False
                 st.session_state.user = None
                 st.session_state.role = None
+                st.session_state.tenant = None
                 st.rerun()
         
         st.markdown("---")
         
-        tabs = st.tabs(["➕ Add Data", "👥 View Students", "👨‍🏫 View Teachers", "📚 View Courses", "📊 View Results"])
+        tab_names = ["➕ Add Data", "👥 View Students", "👨‍🏫 View Teachers", "📚 View Courses", "📊 View Results", "🎚️ Grading Schemes"]
+        # Cross-institution reports are for the home tenant's admins only
+        show_institutions = len(get_tenants()) > 1 and current_tenant() == get_tenants()[0]
+        if show_institutions:
+            tab_names.append("🏫 Institutions")
+        tabs = st.tabs(tab_names)
         
         # Add Data Tab
         with tabs[0]:
@@ -1001,37 +3531,36 @@ def main():
             
             with add_tab[3]:
                 st.subheader("Enroll Student in Course")
-                students = get_all_students()
-                courses = get_all_courses()
+                col1, col2 = st.columns(2)
+                with col1:
+                    enroll_student_match = search_picker(
+                        "Student", search_students,
+                        lambda s: f"{s['roll_number']} - {s['name']}",
+                        key="enroll_student",
+                        placeholder="Roll number or name prefix"
+                    )
                 
-                if students and courses:
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        student_options = {f"{s['roll_number']} - {s['name']}": s['roll_number'] for s in students}
-                        selected_student = st.selectbox("Select Student", list(student_options.keys()))
-                        enroll_roll_number = student_options[selected_student]
-                    
-                    with col2:
-                        course_options = {f"{c['course_code']} - {c['course_name']}": c['course_id'] for c in courses}
-                        selected_course = st.selectbox("Select Course", list(course_options.keys()))
-                        enroll_course_id = course_options[selected_course]
-                    
-                    if st.button("Enroll Student"):
-                        if enroll_student(enroll_roll_number, enroll_course_id):
-                            st.success("Student enrolled successfully!")
-                            st.rerun()
-                        else:
-                            st.error("Failed to enroll student")
-                else:
-                    st.warning("Please add students and courses first.")
+                with col2:
+                    enroll_course_match = search_picker(
+                        "Course", search_courses,
+                        lambda c: f"{c['course_code']} - {c['course_name']}",
+                        key="enroll_course",
+                        placeholder="Course code or name prefix"
+                    )
+                
+                if st.button("Enroll Student", disabled=enroll_student_match is None or enroll_course_match is None):
+                    if enroll_student(enroll_student_match['roll_number'], enroll_course_match['course_id']):
+                        st.success("Student enrolled successfully!")
+                        st.rerun()
+                    else:
+                        st.error("Failed to enroll student")
         
         # View Students Tab
         with tabs[1]:
             st.subheader("All Students")
             students = get_all_students()
-            if students:
-                df = pd.DataFrame(students)
-                st.dataframe(df, use_container_width=True, hide_index=True)
+            if students.num_rows:
+                st.dataframe(students, use_container_width=True, hide_index=True)
             else:
                 st.info("No students found.")
         
@@ -1057,14 +3586,145 @@ def main():
         
         # View Results Tab
         with tabs[4]:
-            st.subheader("All Exam Results")
-            results = get_all_results()
+            results_tab, analytics_tab, archive_tab = st.tabs(["All Results", "Analytics", "Archive"])
             
-            if results:
-                df = pd.DataFrame(results)
-                st.dataframe(df, use_container_width=True, hide_index=True)
-            else:
-                st.info("No exam results available yet.")
+            with results_tab:
+                st.subheader("All Exam Results")
+                results = get_all_results()
+                
+                if results.num_rows:
+                    st.dataframe(results, use_container_width=True, hide_index=True)
+                else:
+                    st.info("No exam results available yet.")
+            
+            with analytics_tab:
+                st.subheader("Results Analytics")
+                cube = refresh_results_cube()
+                
+                if cube is not None and len(cube):
+                    filter_cols = st.columns(len(CUBE_DIMENSIONS))
+                    filters = {}
+                    for col, dimension in zip(filter_cols, CUBE_DIMENSIONS):
+                        with col:
+                            filters[dimension] = st.multiselect(
+                                dimension, list(cube[dimension].cat.categories), key=f"cube_filter_{dimension}"
+                            )
+                    
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        group_by = st.multiselect("Group by", CUBE_DIMENSIONS, default=['course_code'])
+                    with col2:
+                        pivot_column = st.selectbox("Pivot across", [None] + CUBE_DIMENSIONS)
+                    with col3:
+                        metric = st.selectbox("Metric", ['count', 'avg_percentage', 'pass_rate'])
+                    
+                    started = time.perf_counter()
+                    summary = query_results_cube(cube, filters, group_by, pivot_column, metric)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    st.dataframe(summary, use_container_width=True)
+                    st.caption(f"{len(cube)} results in memory | query took {elapsed_ms:.1f} ms")
+                else:
+                    st.info("No exam results available yet.")
+            
+            with archive_tab:
+                current_term = academic_term()
+                st.subheader("Academic Terms")
+                st.caption(f"Current term: {current_term}. Archiving moves a term's attempts out of "
+                           "the live tables into a read-only Parquet file.")
+                terms = get_term_summary()
+                if terms:
+                    st.dataframe(pd.DataFrame(terms), use_container_width=True, hide_index=True)
+                
+                ended_terms = [t['term'] for t in terms if t['term'] < current_term]
+                if ended_terms:
+                    term_to_archive = st.selectbox("Term to archive", ended_terms)
+                    if st.button("Archive Term"):
+                        report_submitted_job(submit_job('archive_term', term=term_to_archive),
+                                             f"Archiving {term_to_archive}")
+                
+                st.markdown("#### Archived Results")
+                archived_terms = get_archived_terms()
+                if archived_terms:
+                    st.dataframe(pd.DataFrame(archived_terms), use_container_width=True, hide_index=True)
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        archived_term = st.selectbox("Archived term", [t['term'] for t in archived_terms])
+                    with col2:
+                        archived_roll = st.number_input("Roll number (0 for all)", min_value=0, value=0, step=1)
+                    with col3:
+                        archived_course = st.text_input("Course code (blank for all)")
+                    try:
+                        archived = read_archived_results(
+                            archived_term, int(archived_roll) or None, archived_course.strip() or None
+                        )
+                        st.dataframe(archived, use_container_width=True, hide_index=True)
+                        st.caption(f"{archived.num_rows} archived results")
+                    except (OSError, pa.ArrowException) as e:
+                        st.error(f"Archive files for {archived_term} are not readable: {e}")
+                else:
+                    st.info("No terms archived yet.")
+        
+        # Grading Schemes Tab
+        with tabs[5]:
+            st.subheader("Grading Schemes")
+            courses = get_all_courses()
+            scheme_options = {"Default (all courses)": None}
+            scheme_options.update({f"{c['course_code']} - {c['course_name']}": c['course_id'] for c in courses})
+            selected_scheme = st.selectbox("Scheme for", list(scheme_options.keys()))
+            scheme_course_id = scheme_options[selected_scheme]
+            
+            scheme = get_grading_scheme(scheme_course_id)
+            bands_df = pd.DataFrame(scheme['bands'], columns=['min_percentage', 'letter_grade', 'is_pass'])
+            edited_bands = st.data_editor(
+                bands_df,
+                num_rows="dynamic",
+                use_container_width=True,
+                hide_index=True,
+                key=f"bands_{scheme_course_id}"
+            )
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Save Scheme"):
+                    bands = [tuple(row) for row in edited_bands.dropna().itertuples(index=False)]
+                    problem = grade_band_problem(bands)
+                    if not problem:
+                        if save_grading_scheme(scheme_course_id, bands):
+                            st.success("Grading scheme saved!")
+                            st.rerun()
+                    else:
+                        st.warning(problem)
+            with col2:
+                if scheme_course_id is not None and st.button("Use Default Scheme"):
+                    if delete_grading_scheme(scheme_course_id):
+                        st.success("Course now uses the default scheme")
+                        st.rerun()
+            
+            st.markdown("---")
+            st.subheader("Bulk Regrade")
+            st.caption("Recompute every stored grade after a scheme or total marks change. "
+                       "An interrupted run resumes from its last checkpoint.")
+            restart_regrade = st.checkbox("Start over instead of resuming")
+            if st.button("Regrade All Results"):
+                report_submitted_job(submit_job('regrade', restart=restart_regrade), "Bulk regrade")
+            
+            st.markdown("#### Background Jobs")
+            show_job_panel()
+        
+        # Institutions Tab
+        if show_institutions:
+            with tabs[6]:
+                st.subheader("All Institutions")
+                summary, grades, errors = get_institution_report()
+                for tenant, error in errors.items():
+                    st.error(f"{tenant}: {error}")
+                if not summary.empty:
+                    st.dataframe(summary, use_container_width=True, hide_index=True)
+                if not grades.empty:
+                    st.markdown("#### Grade Distribution")
+                    st.dataframe(grades, use_container_width=True)
+                    st.bar_chart(grades)
 
 if __name__ == "__main__":
-    main()
+    with tenant_scope(session_tenant()), unit_of_work():
+        main()